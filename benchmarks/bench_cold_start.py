@@ -0,0 +1,155 @@
+"""
+Cold start: import time of `main` (python -X importtime) and time until /health/ready, checked against a budget.
+
+    python -m benchmarks.bench_cold_start --mongomock --budget-import-ms 1500 --budget-ready-ms 3000
+
+Every run is a fresh interpreter. The report lists the slowest top-level
+packages by their own import time; the exit code is 1 when a median goes over
+its budget, so CI can run this as a check. --mongomock needs no server;
+without it the run stops (exit 2) when MongoDB doesn't answer a ping, or
+when a startup run doesn't finish.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(stderr: str):
+    """
+    -X importtime lines -> (cumulative µs of `main`, {top-level package: self µs}).
+    """
+    total = None
+    by_package = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        by_package[name.split(".")[0]] += int(self_us)
+        if name == "main":
+            total = int(cumulative_us)
+    return total, by_package
+
+def measure_imports(repeats: int):
+    totals, packages = [], defaultdict(list)
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        total, by_package = parse_importtime(result.stderr)
+        totals.append(total / 1000)
+        for package, self_us in by_package.items():
+            packages[package].append(self_us / 1000)
+    return totals, {package: statistics.median(ms) for package, ms in packages.items()}
+
+def check_mongo(url: str, timeout_ms: int = 3000):
+    """
+    Fails fast with a readable message instead of waiting out driver timeouts.
+    """
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(url, serverSelectionTimeoutMS=timeout_ms)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        print(f"MongoDB at {url} is unreachable ({type(e).__name__}); start it, pass --mongo-url, or use --mongomock", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        client.close()
+
+def measure_startup(args):
+    command = [sys.executable, "-m", "benchmarks.bench_cold_start", "--child", "--ready-timeout", str(args.ready_timeout)]
+    if args.mongomock:
+        command.append("--mongomock")
+    env = dict(os.environ)
+    if args.mongo_url:
+        env["DATABASE_URL"] = args.mongo_url
+    # Backstop for a server that goes away mid-run: warm-up retries would otherwise never end
+    timeout = args.ready_timeout + 60
+    try:
+        result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print(f"Startup run did not finish within {timeout:.0f} s", file=sys.stderr)
+        sys.exit(2)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+async def child(args) -> dict:
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    if args.mongomock:
+        import database
+        from mongomock_motor import AsyncMongoMockClient
+        database.db = AsyncMongoMockClient()["echosense_bench_cold_start"]
+
+    from utils.resources import resources
+    async with main.app.router.lifespan_context(main.app):
+        serving = time.perf_counter()
+        deadline = serving + args.ready_timeout
+        while not resources.ready() and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+        ready = time.perf_counter()
+        status = resources.status()
+    return {
+        "import_ms": round((imported - started) * 1000, 1),
+        "serving_ms": round((serving - started) * 1000, 1),
+        "ready_ms": round((ready - started) * 1000, 1) if resources.ready() else None,
+        "resources_ms": {
+            name: None if r["seconds"] is None else round(r["seconds"] * 1000, 1)
+            for name, r in status.items()
+        },
+    }
+
+def main(args) -> int:
+    if not args.mongomock:
+        from utils.config import settings
+        check_mongo(args.mongo_url or settings.MONGODB_URL)
+    import_totals, packages = measure_imports(args.repeats)
+    startups = [measure_startup(args) for _ in range(args.repeats)]
+
+    ready = [s["ready_ms"] for s in startups]
+    report = {
+        "repeats": args.repeats,
+        "import_main_ms": round(statistics.median(import_totals), 1),
+        "serving_ms": round(statistics.median(s["serving_ms"] for s in startups), 1),
+        "ready_ms": None if None in ready else round(statistics.median(ready), 1),
+        "resources_ms": startups[-1]["resources_ms"],
+        "slowest_imports_ms": {
+            package: round(ms, 1)
+            for package, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        },
+    }
+
+    failures = []
+    if args.budget_import_ms is not None and report["import_main_ms"] > args.budget_import_ms:
+        failures.append(f"import {report['import_main_ms']} ms > {args.budget_import_ms} ms")
+    if args.budget_ready_ms is not None and (report["ready_ms"] is None or report["ready_ms"] > args.budget_ready_ms):
+        failures.append(f"ready {report['ready_ms']} ms > {args.budget_ready_ms} ms")
+    report["budget_failures"] = failures
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=15, help="Slowest packages to list")
+    parser.add_argument("--budget-import-ms", type=float, help="Fail when importing main takes longer")
+    parser.add_argument("--budget-ready-ms", type=float, help="Fail when /health/ready takes longer")
+    parser.add_argument("--ready-timeout", type=float, default=30.0)
+    parser.add_argument("--mongo-url", help="Default: DATABASE_URL")
+    parser.add_argument("--mongomock", action="store_true", help="Offline run against an in-memory database")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(child(args))))
+    else:
+        sys.exit(main(args))
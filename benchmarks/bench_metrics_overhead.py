@@ -0,0 +1,59 @@
+"""
+Per-request cost of the metrics middleware and of one stage() timer.
+
+Drives a bare ASGI app directly (no server, no network) with and without
+MetricsMiddleware; the difference per call is the instrumentation overhead.
+
+    python -m benchmarks.bench_metrics_overhead --requests 200000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from utils.metrics import MetricsMiddleware, stage
+
+class _Route:
+    path = "/chat"
+
+async def bare_app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+async def _send(message):
+    pass
+
+async def time_app(app, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app({"type": "http", "method": "POST", "path": "/api/chat"}, _receive, _send)
+    return (time.perf_counter() - start) / requests
+
+def time_stage(iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with stage("bench"):
+            pass
+    return (time.perf_counter() - start) / iterations
+
+async def main(requests: int):
+    await time_app(bare_app, 1000)  # warm up
+    bare = await time_app(bare_app, requests)
+    instrumented = await time_app(MetricsMiddleware(bare_app), requests)
+    print(json.dumps({
+        "requests": requests,
+        "bare_us": round(bare * 1e6, 3),
+        "instrumented_us": round(instrumented * 1e6, 3),
+        "middleware_overhead_us": round((instrumented - bare) * 1e6, 3),
+        "stage_overhead_us": round(time_stage(requests) * 1e6, 3),
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,115 @@
+"""
+Mood analytics for one user over a year: the original Python loop over raw
+diary entries vs a $group/$dateTrunc pipeline over the entries vs the
+rollup-backed get_mood_analytics that GET /mood-board uses.
+
+    python -m benchmarks.bench_mood_analytics --mongo-url mongodb://127.0.0.1:27017 --entries 10000 100000
+
+Needs MongoDB 5.0+ for $dateTrunc. --mongomock runs offline, but mongomock has
+no $dateTrunc, so the pipeline variants are reported as unsupported there.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from services.mood_rollups import MOODS, day_key, get_mood_analytics, rebuild_rollups
+
+TEXT = "Today was a long day with work, errands and a walk in the evening. " * 4
+REPLY = "Thank you for sharing that with me. It sounds like you had a lot going on today. " * 6
+
+async def seed(db, user_id, entries: int, days: int) -> datetime:
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    batch = []
+    for _ in range(entries):
+        batch.append({
+            "user_id": user_id,
+            "text": TEXT,
+            "sentiment": rng.choice(MOODS),
+            "gemini_response": REPLY,
+            "timestamp": now - timedelta(seconds=rng.uniform(0, days * 86400)),
+        })
+        if len(batch) == 5000:
+            await db["diary_entries"].insert_many(batch)
+            batch = []
+    if batch:
+        await db["diary_entries"].insert_many(batch)
+    await db["diary_entries"].create_index([("user_id", 1), ("timestamp", -1), ("_id", -1)])
+    await db["mood_daily_rollups"].create_index([("user_id", 1), ("day", 1)], unique=True)
+    await rebuild_rollups(db, user_id)
+    return now - timedelta(days=days - 1)
+
+async def python_loop(db, user_id, start: datetime, granularity: str):
+    # What the mood board used to do: fetch whole documents, group by day in Python
+    summary = defaultdict(lambda: {mood: 0 for mood in MOODS})
+    async for entry in db["diary_entries"].find({"user_id": user_id, "timestamp": {"$gte": start}}):
+        key = day_key(entry["timestamp"]) if granularity == "day" else entry["timestamp"].strftime("%Y-%m")
+        summary[key][entry["sentiment"]] += 1
+    return summary
+
+async def entries_pipeline(db, user_id, start: datetime, granularity: str):
+    pipeline = [
+        {"$match": {"user_id": user_id, "timestamp": {"$gte": start}}},
+        {"$project": {"_id": 0, "timestamp": 1, "sentiment": 1}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$timestamp", "unit": granularity}},
+            **{mood: {"$sum": {"$cond": [{"$eq": ["$sentiment", mood]}, 1, 0]}} for mood in MOODS},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    return await db["diary_entries"].aggregate(pipeline).to_list(length=None)
+
+async def rollups(db, user_id, start: datetime, granularity: str):
+    return await get_mood_analytics(db, user_id, day_key(start), day_key(datetime.utcnow()), granularity)
+
+async def time_variant(fn, db, user_id, start, granularity, repeats: int):
+    try:
+        await fn(db, user_id, start, granularity)  # warm up
+    except (NotImplementedError, OperationFailure):
+        return "unsupported"
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await fn(db, user_id, start, granularity)
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2)
+
+async def main(args):
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    db = client["echosense_bench_analytics"]
+
+    results = []
+    try:
+        for entries in args.entries:
+            user_id = ObjectId()
+            start = await seed(db, user_id, entries, args.days)
+            for granularity in ("day", "month"):
+                row = {"entries": entries, "days": args.days, "granularity": granularity}
+                for name, fn in (("python_loop_ms", python_loop), ("entries_pipeline_ms", entries_pipeline), ("rollups_ms", rollups)):
+                    row[name] = await time_variant(fn, db, user_id, start, granularity, args.repeats)
+                results.append(row)
+    finally:
+        await client.drop_database("echosense_bench_analytics")
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[10000, 100000], help="Entries per user")
+    parser.add_argument("--days", type=int, default=365, help="Spread entries over this many days")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--mongo-url", default="mongodb://127.0.0.1:27017")
+    parser.add_argument("--mongomock", action="store_true", help="Offline run (pipeline variants unsupported)")
+    asyncio.run(main(parser.parse_args()))
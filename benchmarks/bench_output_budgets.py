@@ -0,0 +1,77 @@
+"""
+Reply latency and size with and without the prompt engine's output budgets.
+
+    python -m benchmarks.bench_output_budgets --fake --calls 20
+    GEMINI_API_KEY=... python -m benchmarks.bench_output_budgets --calls 10
+
+Per endpoint (chat, diary), the same mood-conditioned prompt is sent twice:
+`unbounded` without maxOutputTokens (what the diary path used to do), and
+`budgeted` with the endpoint's budget from services.prompts. Replies are
+streamed and timed to the last chunk, since generation time grows with the
+number of output tokens. --fake runs against benchmarks.fake_gemini_server
+(one word per token, --words long when unbounded); otherwise the real API
+configured by GEMINI_API_BASE / GEMINI_API_KEY is used.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from services.ai_client import GeminiClient
+from services.prompts import build_prompt, estimate_tokens
+
+MESSAGES = {
+    "chat": ("I can't sleep again, my head keeps going over the meeting tomorrow", "sad"),
+    "diary": ("Went for a long walk by the river after work, called my sister and cooked dinner. Felt calm for once.", "happy"),
+}
+
+async def run(client: GeminiClient, endpoint: str, budgeted: bool, calls: int) -> dict:
+    message, mood = MESSAGES[endpoint]
+    prompt = build_prompt(endpoint, message, mood)
+    seconds, output_tokens, truncated = [], [], 0
+    for _ in range(calls):
+        usage = {}
+        started = time.perf_counter()
+        reply = "".join([chunk async for chunk in client.stream(
+            prompt.text, max_output_tokens=prompt.max_output_tokens if budgeted else None,
+            temperature=prompt.temperature, usage=usage,
+        )])
+        seconds.append(time.perf_counter() - started)
+        output_tokens.append(usage.get("output_tokens") or estimate_tokens(reply))
+        truncated += usage.get("finish_reason") == "MAX_TOKENS"
+    return {
+        "endpoint": endpoint,
+        "variant": "budgeted" if budgeted else "unbounded",
+        "budget": prompt.max_output_tokens if budgeted else None,
+        "prompt_tokens": estimate_tokens(prompt.text),
+        "output_tokens_avg": round(statistics.mean(output_tokens), 1),
+        "truncated": truncated,
+        "p50_ms": round(statistics.median(seconds) * 1000, 1),
+        "max_ms": round(max(seconds) * 1000, 1),
+    }
+
+async def main(args):
+    kwargs = {"max_retries": 0}
+    if args.fake:
+        from benchmarks.fake_gemini_server import start_fake_gemini
+        server = start_fake_gemini(latency_ms=args.latency_ms, jitter_ms=0, chunk_delay_ms=args.chunk_delay_ms, words=args.words)
+        kwargs.update(base_url=server.base_url, api_key="fake")
+    client = GeminiClient(**kwargs)
+    try:
+        results = []
+        for endpoint in MESSAGES:
+            for budgeted in (False, True):
+                results.append(await run(client, endpoint, budgeted, args.calls))
+    finally:
+        await client.aclose()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--fake", action="store_true", help="Use the local fake Gemini server")
+    parser.add_argument("--words", type=int, default=600, help="Fake server: reply length without a budget")
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--chunk-delay-ms", type=float, default=20, help="Fake server: delay per 5-word SSE event")
+    asyncio.run(main(parser.parse_args()))
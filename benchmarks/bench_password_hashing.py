@@ -0,0 +1,65 @@
+"""
+Event-loop latency while logins run concurrently.
+
+Fires a burst of bcrypt verifications either inline on the event loop (the
+old behaviour) or through the hashing process pool, while a ticker task
+measures how late the loop wakes it up.
+
+    python -m benchmarks.bench_password_hashing --logins 32
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from utils.security import hash_password, verify_password, verify_password_async, shutdown_hash_pool
+
+TICK = 0.005
+
+async def _ticker(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+async def _verify_inline(password: str, hashed: str) -> bool:
+    return verify_password(password, hashed)
+
+async def run(mode: str, logins: int, hashed: str) -> dict:
+    lags = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    verify = verify_password_async if mode == "pool" else _verify_inline
+
+    start = time.perf_counter()
+    await asyncio.gather(*(verify("Password123", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+    lags.sort()
+    return {
+        "mode": mode,
+        "logins": logins,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(logins / elapsed, 1),
+        "loop_lag_p50_ms": round(statistics.median(lags), 2) if lags else None,
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 2) if lags else None,
+        "loop_lag_max_ms": round(lags[-1], 2) if lags else None,
+        "ticks": len(lags),
+    }
+
+async def main(logins: int):
+    hashed = hash_password("Password123")
+    # Warm the pool so worker start-up isn't counted
+    await verify_password_async("Password123", hashed)
+    results = [await run("inline", logins, hashed), await run("pool", logins, hashed)]
+    shutdown_hash_pool()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins))
@@ -0,0 +1,53 @@
+"""
+Sentiment scoring throughput: one-at-a-time vs analyze_sentiment_batch.
+
+    python -m benchmarks.bench_sentiment_batch --entries 20000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from services.sentiment_service import analyze_sentiment, analyze_sentiment_batch, shutdown_sentiment_pool
+
+SAMPLES = [
+    "I had a great day today! Feeling very productive.",
+    "Work was exhausting and I feel tired and a bit low.",
+    "Nothing special happened, just a regular Tuesday.",
+    "I'm so grateful for my friends, we laughed all evening.",
+    "Couldn't sleep again. Everything feels heavy and pointless.",
+    "Went for a walk, ate lunch, answered some emails.",
+]
+
+def make_entries(n: int) -> list:
+    rng = random.Random(42)
+    return [f"{rng.choice(SAMPLES)} {rng.choice(SAMPLES)}" for _ in range(n)]
+
+async def main(n: int):
+    texts = make_entries(n)
+
+    start = time.perf_counter()
+    sequential = [analyze_sentiment(t) for t in texts]
+    seq_elapsed = time.perf_counter() - start
+
+    # Warm the pool so worker start-up isn't counted
+    await analyze_sentiment_batch(texts[:1000])
+    start = time.perf_counter()
+    batched = await analyze_sentiment_batch(texts)
+    batch_elapsed = time.perf_counter() - start
+    await shutdown_sentiment_pool()
+
+    assert batched == sequential
+    print(json.dumps([
+        {"mode": "sequential", "entries": n, "elapsed_s": round(seq_elapsed, 3),
+         "entries_per_s": round(n / seq_elapsed, 1)},
+        {"mode": "batch", "entries": n, "elapsed_s": round(batch_elapsed, 3),
+         "entries_per_s": round(n / batch_elapsed, 1)},
+    ], indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.entries))
@@ -0,0 +1,67 @@
+"""
+Latency / throughput of the sentiment engines (VADER vs local transformer).
+
+For each engine: p50/p95 latency of single sequential requests, then
+throughput with many concurrent requests (the transformer engine coalesces
+these through the micro-batcher).
+
+    python -m benchmarks.bench_sentiment_engines --engines vader transformer
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from services import sentiment_service
+from benchmarks.bench_sentiment_batch import make_entries
+
+def _percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+async def bench_engine(name: str, requests: int, concurrency: int) -> dict:
+    await sentiment_service.shutdown_sentiment_pool()
+    sentiment_service._engine = (
+        sentiment_service.TransformerEngine() if name == "transformer" else sentiment_service.VaderEngine()
+    )
+    await sentiment_service.warm_up_sentiment()
+    texts = make_entries(requests)
+
+    latencies = []
+    for text in texts[:min(requests, 200)]:
+        start = time.perf_counter()
+        await sentiment_service.analyze_sentiment_async(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with semaphore:
+            return await sentiment_service.analyze_sentiment_async(text)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(t) for t in texts))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "engine": name,
+        "latency_p50_ms": round(statistics.median(latencies), 3),
+        "latency_p95_ms": round(_percentile(latencies, 0.95), 3),
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+    }
+
+async def main(engines: list, requests: int, concurrency: int):
+    results = [await bench_engine(name, requests, concurrency) for name in engines]
+    await sentiment_service.shutdown_sentiment_pool()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--engines", nargs="+", default=["vader", "transformer"], choices=["vader", "transformer"])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.engines, args.requests, args.concurrency))
@@ -0,0 +1,122 @@
+"""
+Response serialization cost per response: FastAPI's response_model path vs utils.serialization.fast_response.
+
+    python -m benchmarks.bench_serialization --iterations 5000
+
+Variants, timed from the handler's return value to the response body bytes:
+- validated: what FastAPI does today (validate into the model, then dump JSON in pydantic-core)
+- validated_encoder: the same with jsonable_encoder + json.dumps (older FastAPI releases)
+- fast: compiled serializer + orjson (stdlib json when orjson is missing)
+
+Each shape is also checked to produce the same JSON document in every variant.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from schemas import DiaryPage, DiaryResponse, MoodSummary, Token
+from utils.serialization import ORJSON_AVAILABLE, FastJSONResponse, serializer_for
+
+REPLY = "Thank you for sharing that with me. It sounds like you had a lot going on today. " * 3
+
+def _now() -> datetime:
+    # MongoDB stores milliseconds
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def diary_doc(i: int = 0) -> dict:
+    return {
+        "_id": ObjectId(),
+        "user_id": ObjectId(),
+        "text": f"Entry {i}: today was a long day with work, errands and a walk in the evening.",
+        "sentiment": "happy",
+        "gemini_response": REPLY,
+        "reply_status": "done",
+        "timestamp": _now() - timedelta(minutes=i),
+        "idempotency_key": "not-part-of-the-response",
+    }
+
+def mood_board(days: int) -> dict:
+    start = datetime.utcnow() - timedelta(days=days - 1)
+    buckets = [
+        {"start": (start + timedelta(days=d)).strftime("%Y-%m-%d"), "happy": d % 3, "sad": d % 2, "neutral": 1,
+         "total": d % 3 + d % 2 + 1, "avg_score": ((d % 3) - (d % 2)) / (d % 3 + d % 2 + 1)}
+        for d in range(days)
+    ]
+    return {
+        "happy": 6, "sad": 2, "neutral": 2, "period": "custom",
+        "summary": {b["start"]: {m: b[m] for m in ("happy", "sad", "neutral")} for b in buckets},
+        "dominant_mood": "happy", "quote": "Keep shining!",
+        "last_10_moods": ["happy", "sad", "neutral", "happy", "happy", "happy", "sad", "neutral", "happy", "happy"],
+        "granularity": "day", "start": buckets[0]["start"], "end": buckets[-1]["start"],
+        "buckets": buckets, "avg_score": 0.25,
+    }
+
+def token() -> dict:
+    return {
+        "access_token": "a" * 180, "token_type": "bearer", "refresh_token": "r" * 200, "expires_in": 1800,
+        "user": {"_id": ObjectId(), "username": "alice", "email": "alice@example.com",
+                 "hashed_password": "$2b$12$" + "x" * 53, "created_at": _now(), "preferences": {}},
+    }
+
+SHAPES = {
+    "token": (Token, token),
+    "diary_entry": (DiaryResponse, diary_doc),
+    "diary_page_20": (DiaryPage, lambda: {"items": [diary_doc(i) for i in range(20)], "next_cursor": "abc"}),
+    "mood_board_30d": (MoodSummary, lambda: mood_board(30)),
+    "mood_board_365d": (MoodSummary, lambda: mood_board(365)),
+}
+
+async def validated(field, content, dump_json: bool) -> bytes:
+    body = await serialize_response(field=field, response_content=content, dump_json=dump_json)
+    return body if dump_json else JSONResponse(body).body
+
+def fast(model, content) -> bytes:
+    return FastJSONResponse(serializer_for(model)(content)).body
+
+async def time_async(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def time_sync(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+async def main(iterations: int):
+    results = []
+    for name, (model, make) in SHAPES.items():
+        field = create_model_field(name=f"Response_{name}", type_=model, mode="serialization")
+        content = make()
+        outputs = {
+            "validated": await validated(field, content, True),
+            "validated_encoder": await validated(field, content, False),
+            "fast": fast(model, content),
+        }
+        documents = [json.loads(body) for body in outputs.values()]
+        row = {
+            "shape": name,
+            "bytes": len(outputs["fast"]),
+            "identical": all(doc == documents[0] for doc in documents),
+            "validated_us": round(await time_async(lambda: validated(field, content, True), iterations), 2),
+            "validated_encoder_us": round(await time_async(lambda: validated(field, content, False), iterations), 2),
+            "fast_us": round(time_sync(lambda: fast(model, content), iterations), 2),
+        }
+        row["speedup"] = round(row["validated_us"] / row["fast_us"], 2)
+        results.append(row)
+    print(json.dumps({"orjson": ORJSON_AVAILABLE, "iterations": iterations, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    asyncio.run(main(parser.parse_args().iterations))
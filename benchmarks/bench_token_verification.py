@@ -0,0 +1,39 @@
+"""
+Bearer token verification cost: python-jose vs PyJWT vs the verified-token cache.
+
+    python -m benchmarks.bench_token_verification --iterations 50000
+"""
+import argparse
+import json
+import time
+from datetime import timedelta
+
+from utils.tokens import TokenService, _JoseBackend, _PyJWTBackend
+
+KEYS = {"bench": "benchmark_secret_key_that_is_long_enough_for_hs256"}
+
+def time_verify(service: TokenService, tokens: list, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        assert service.verify(tokens[i % len(tokens)]) is not None
+    return (time.perf_counter() - start) / iterations
+
+def main(iterations: int, users: int):
+    results = {"iterations": iterations, "distinct_tokens": users}
+    for backend in (_JoseBackend(), _PyJWTBackend()):
+        issuer = TokenService(KEYS, "HS256", backend, max_entries=users)
+        tokens = [issuer.issue({"user_id": f"{i:024x}"}, timedelta(minutes=30)) for i in range(users)]
+        # Cache of size 0: every call decodes and checks the signature
+        uncached = TokenService(KEYS, "HS256", backend, max_entries=0)
+        results[f"{backend.name}_decode_us"] = round(time_verify(uncached, tokens, iterations) * 1e6, 2)
+        cached = TokenService(KEYS, "HS256", backend, max_entries=users)
+        time_verify(cached, tokens, users)  # warm
+        results[f"{backend.name}_cached_us"] = round(time_verify(cached, tokens, iterations) * 1e6, 2)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=1000, help="Distinct tokens cycled through")
+    args = parser.parse_args()
+    main(args.iterations, args.users)
@@ -0,0 +1,84 @@
+"""
+Chat-turn inserts under concurrency: one insert_one per request vs the write-behind buffer.
+
+    python -m benchmarks.bench_write_buffer --mongo-url mongodb://127.0.0.1:27017 --requests 2000 --concurrency 50 200
+
+Reports wall time, round trips (insert commands sent to MongoDB) and per-request
+latency of the insert step. --mongomock runs offline; its timings say little
+about a real server, the round-trip counts still hold.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from services.write_buffer import WriteBuffer, parse_write_concern
+
+REPLY = "Thank you for sharing that with me. It sounds like you had a lot going on today. " * 3
+
+def chat_turn(user_id, i: int) -> dict:
+    return {"user_message": f"message {i}", "bot_response": REPLY, "mood": "happy",
+            "user_id": user_id, "timestamp": datetime.utcnow()}
+
+async def run(insert, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    user_id = ObjectId()
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await insert(chat_turn(user_id, i))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    return time.perf_counter() - started, latencies
+
+async def main(args):
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    db = client["echosense_bench_write_buffer"]
+    concern = parse_write_concern(args.write_concern)
+    coll = db.get_collection("moods", write_concern=concern)
+
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            seconds, latencies = await run(coll.insert_one, args.requests, concurrency)
+            results.append({
+                "variant": "insert_one", "concurrency": concurrency, "round_trips": args.requests,
+                "seconds": round(seconds, 3), "p50_ms": round(statistics.median(latencies), 2),
+            })
+
+            for wait in (False, True):
+                buffer = WriteBuffer(args.flush_ms / 1000, args.max_batch, 100000, write_concerns={"moods": concern})
+                seconds, latencies = await run(lambda doc: buffer.insert(db, "moods", doc, wait=wait), args.requests, concurrency)
+                await buffer.close()
+                results.append({
+                    "variant": "buffer_wait" if wait else "buffer", "concurrency": concurrency,
+                    "round_trips": buffer.batches, "seconds": round(seconds, 3),
+                    "p50_ms": round(statistics.median(latencies), 2),
+                })
+    finally:
+        await client.drop_database("echosense_bench_write_buffer")
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--flush-ms", type=float, default=10)
+    parser.add_argument("--max-batch", type=int, default=200)
+    parser.add_argument("--write-concern", default="1")
+    parser.add_argument("--mongo-url", default="mongodb://127.0.0.1:27017")
+    parser.add_argument("--mongomock", action="store_true", help="Offline run (round trips only)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,124 @@
+"""
+Local stand-in for the Gemini REST API (generateContent / streamGenerateContent).
+
+Speaks the same JSON and SSE payloads as the real endpoint, so the production
+GeminiClient (pooling, retries, streaming) is exercised end to end without a
+network or an API key. Latency, streaming cadence and error rate are configurable.
+
+    python -m benchmarks.fake_gemini_server --port 8089 --latency-ms 300 --chunk-delay-ms 40
+    GEMINI_API_BASE=http://127.0.0.1:8089/v1beta uvicorn main:app
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+def _payload(text: str, finish_reason: Optional[str] = None, prompt_tokens: int = 0, output_tokens: int = 0) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}}
+    payload = {"candidates": [candidate]}
+    if finish_reason:
+        # Like the real API, the final payload carries the finish reason and token usage
+        candidate["finishReason"] = finish_reason
+        payload["usageMetadata"] = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+                                    "totalTokenCount": prompt_tokens + output_tokens}
+    return payload
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    # Overridden per server by start_fake_gemini()
+    latency = 0.2
+    jitter = 0.05
+    chunk_delay = 0.03
+    error_rate = 0.0
+    words = 40
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.requests += 1
+
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        prompt = body.get("contents", [{}])[0].get("parts", [{}])[0].get("text", "")
+        max_tokens = body.get("generationConfig", {}).get("maxOutputTokens") or self.words
+        words = ["I", "hear", "you."] + (prompt.split() or ["..."]) * self.words
+        reply = [w + " " for w in words[:min(self.words, max_tokens)]]
+        # One word per token; the cap only bites when the reply would have been longer
+        finish = "MAX_TOKENS" if max_tokens < self.words else "STOP"
+        usage = (finish, (len(prompt) + 3) // 4, len(reply))
+
+        if ":streamGenerateContent" in self.path:
+            self._stream(reply, usage)
+        else:
+            data = json.dumps(_payload("".join(reply).strip(), *usage)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    def _stream(self, reply, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # A handful of words per SSE event, like the real API
+        for i in range(0, len(reply), 5):
+            last = i + 5 >= len(reply)
+            payload = _payload("".join(reply[i:i + 5]), *usage) if last else _payload("".join(reply[i:i + 5]))
+            frame = f"data: {json.dumps(payload)}\r\n\r\n".encode()
+            self.wfile.write(f"{len(frame):X}\r\n".encode() + frame + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_fake_gemini(port: int = 0, latency_ms: float = 200, jitter_ms: float = 50,
+                      chunk_delay_ms: float = 30, error_rate: float = 0.0, words: int = 40) -> ThreadingHTTPServer:
+    """
+    Starts the fake server on a daemon thread; `server.base_url` is the GEMINI_API_BASE to use.
+    """
+    handler = type("ConfiguredFakeGeminiHandler", (FakeGeminiHandler,), {
+        "latency": latency_ms / 1000,
+        "jitter": jitter_ms / 1000,
+        "chunk_delay": chunk_delay_ms / 1000,
+        "error_rate": error_rate,
+        "words": words,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.requests = 0
+    server.base_url = f"http://127.0.0.1:{server.server_port}/v1beta"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--chunk-delay-ms", type=float, default=30)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--words", type=int, default=40)
+    args = parser.parse_args()
+
+    server = start_fake_gemini(args.port, args.latency_ms, args.jitter_ms, args.chunk_delay_ms, args.error_rate, args.words)
+    print(f"Fake Gemini listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
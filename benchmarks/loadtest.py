@@ -0,0 +1,223 @@
+"""
+Concurrent load test of the signup -> diary -> chat -> mood-board flow.
+
+Each virtual user signs up once, then loops diary -> chat -> mood-board until
+the run ends. Results (RPS and p50/p95/p99 per endpoint) are printed as JSON
+and can be saved and compared against a baseline to catch regressions:
+
+    python -m benchmarks.loadtest --users 50 --duration 30 --output baseline.json
+    python -m benchmarks.loadtest --users 50 --duration 30 --baseline baseline.json --max-regression 0.2
+
+By default the app runs in-process on mongomock, with the real Gemini client
+talking to benchmarks.fake_gemini_server; --mongo-url uses a real (e.g. local)
+mongod instead. In-process numbers include the load generator sharing the
+event loop, so compare them with each other, not with production. Against a
+running server:
+
+    python -m benchmarks.loadtest --base-url http://127.0.0.1:8000 --users 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+# Nothing from the app is imported at module level: in-process runs must set
+# GEMINI_API_BASE etc. before utils.config reads the environment.
+MESSAGES = [
+    "I had a great day today! Feeling very productive.",
+    "Work was exhausting and I feel tired and a bit low.",
+    "Nothing special happened, just a regular Tuesday.",
+    "I'm so grateful for my friends, we laughed all evening.",
+    "Couldn't sleep again. Everything feels heavy and pointless.",
+    "Went for a walk, ate lunch, answered some emails.",
+]
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(len(values) * pct)) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, name: str, request):
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        self.statuses[name][response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            values = [v * 1000 for v in self.latencies[name]]
+            endpoints[name] = {
+                "count": len(values),
+                "errors": self.errors[name],
+                "statuses": dict(self.statuses[name]),
+                "rps": round(len(values) / elapsed, 2),
+                "mean_ms": round(sum(values) / len(values), 2) if values else None,
+                "p50_ms": round(percentile(values, 0.50), 2) if values else None,
+                "p95_ms": round(percentile(values, 0.95), 2) if values else None,
+                "p99_ms": round(percentile(values, 0.99), 2) if values else None,
+                "max_ms": round(max(values), 2) if values else None,
+            }
+        total = sum(e["count"] for e in endpoints.values())
+        return {
+            "duration_s": round(elapsed, 2),
+            "total_requests": total,
+            "rps": round(total / elapsed, 2),
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "endpoints": endpoints,
+        }
+
+
+async def virtual_user(client: httpx.AsyncClient, recorder: Recorder, run_id: str, index: int,
+                       deadline: float, iterations: int, stream: bool):
+    rng = random.Random(index)
+    name = f"load_{run_id}_{index}"
+    response = await recorder.call("signup", client.post("/api/signup", json={
+        "username": name, "email": f"{name}@example.com", "password": "Password123",
+    }))
+    if response is None or response.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    done = 0
+    while time.perf_counter() < deadline and (not iterations or done < iterations):
+        await recorder.call("diary", client.post(
+            "/api/diary", json={"content": rng.choice(MESSAGES)}, headers=headers
+        ))
+        if stream:
+            await recorder.call("chat_stream", client.post(
+                "/api/chat/stream", json={"message": rng.choice(MESSAGES)}, headers=headers
+            ))
+        else:
+            await recorder.call("chat", client.post(
+                "/api/chat", json={"message": rng.choice(MESSAGES)}, headers=headers
+            ))
+        await recorder.call("mood_board", client.get(
+            "/api/mood-board", params={"period": "weekly"}, headers=headers
+        ))
+        done += 1
+
+async def run_load(client: httpx.AsyncClient, users: int, duration: float, iterations: int,
+                   ramp_up: float, stream: bool) -> dict:
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def delayed(i):
+        await asyncio.sleep(ramp_up * i / max(1, users))
+        await virtual_user(client, recorder, run_id, i, deadline, iterations, stream)
+
+    await asyncio.gather(*(delayed(i) for i in range(users)))
+    return recorder.report(time.perf_counter() - start)
+
+# -----------------------------
+# Targets
+# -----------------------------
+async def run_in_process(args) -> dict:
+    from benchmarks.fake_gemini_server import start_fake_gemini
+
+    fake = start_fake_gemini(latency_ms=args.ai_latency_ms, chunk_delay_ms=args.ai_chunk_delay_ms,
+                             error_rate=args.ai_error_rate)
+    # Settings are read at import time, so configure before the app is imported
+    os.environ["GEMINI_API_BASE"] = fake.base_url
+    os.environ["GEMINI_FAKE_MODEL"] = "false"
+    os.environ.setdefault("GEMINI_API_KEY", "loadtest")
+    # Virtual users loop far faster than anyone types; export rates to load-test the limiter itself
+    os.environ.setdefault("RATE_LIMIT_USER_PER_MINUTE", "0")
+    os.environ.setdefault("RATE_LIMIT_GLOBAL_PER_SECOND", "0")
+    if args.mongo_url:
+        os.environ["DATABASE_URL"] = args.mongo_url
+        os.environ["DATABASE_NAME"] = f"echosense_load_{uuid.uuid4().hex[:8]}"
+
+    import database
+    if not args.mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+        database.db = AsyncMongoMockClient()["echosense_load"]
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            result = await run_load(client, args.users, args.duration, args.iterations, args.ramp_up, args.stream)
+        if args.mongo_url:
+            await database.client.drop_database(os.environ["DATABASE_NAME"])
+    fake.shutdown()
+    result["fake_gemini_requests"] = fake.requests
+    return result
+
+async def run_remote(args) -> dict:
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        return await run_load(client, args.users, args.duration, args.iterations, args.ramp_up, args.stream)
+
+def compare(result: dict, baseline: dict, max_regression: float) -> list:
+    """
+    Endpoints whose p95 grew by more than max_regression (fraction) or that newly error.
+    """
+    problems = []
+    for name, current in result["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before or before.get("p95_ms") is None or current["p95_ms"] is None:
+            continue
+        limit = before["p95_ms"] * (1 + max_regression)
+        if current["p95_ms"] > limit:
+            problems.append(f"{name}: p95 {current['p95_ms']}ms > {limit:.2f}ms (baseline {before['p95_ms']}ms)")
+        if current["errors"] and not before.get("errors"):
+            problems.append(f"{name}: {current['errors']} errors (baseline had none)")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--iterations", type=int, default=0, help="Stop each user after N loops (0 = until duration)")
+    parser.add_argument("--ramp-up", type=float, default=2, help="Seconds over which users start")
+    parser.add_argument("--stream", action="store_true", help="Use /chat/stream instead of /chat")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--mongo-url", help="In-process: real mongod (e.g. mongodb://127.0.0.1:27017) instead of mongomock")
+    parser.add_argument("--ai-latency-ms", type=float, default=200)
+    parser.add_argument("--ai-chunk-delay-ms", type=float, default=30)
+    parser.add_argument("--ai-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    parser.add_argument("--baseline", help="Compare against a previous result and exit 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 growth vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    runner = run_remote if args.base_url else run_in_process
+    result = asyncio.run(runner(args))
+    result["config"] = {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}
+
+    problems = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(result, json.load(f), args.max_regression)
+        result["regressions"] = problems
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,174 @@
+"""
+Replays recorded audio through the live voice WebSocket and reports latency.
+
+Audio is sent in real time (or --speed x faster) in --chunk-ms frames, like a
+browser recorder would. Reported per run:
+  - first_partial_ms: first frame sent -> first partial transcript
+  - segment latency:  end of an utterance in the audio -> its `segment` event
+  - finalize_ms:      stop sent -> `final` event
+
+By default the app runs in-process (mongomock, fake recognizer, fake model), so
+no server, microphone or network is needed:
+
+    python -m benchmarks.replay_live_voice --wav journal.wav
+    python -m benchmarks.replay_live_voice --utterances 5 --recognizer google
+
+Against a running server (needs the `websockets` package):
+
+    python -m benchmarks.replay_live_voice --url ws://127.0.0.1:8000/api/voice/live --token <jwt>
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import statistics
+import threading
+import time
+from array import array
+
+SAMPLE_RATE = 16000
+
+def synthesize(utterances: int, speech_s: float = 1.2, pause_s: float = 0.8) -> bytes:
+    """
+    Tone bursts separated by silence: enough for the VAD, no microphone required.
+    """
+    samples = array("h")
+    for _ in range(utterances):
+        samples.extend(
+            int(6000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(int(speech_s * SAMPLE_RATE))
+        )
+        samples.extend([0] * int(pause_s * SAMPLE_RATE))
+    return samples.tobytes()
+
+def load_wav(path: str) -> bytes:
+    from services.speech_service import decode_to_pcm
+    with open(path, "rb") as f:
+        return decode_to_pcm(io.BytesIO(f.read()))
+
+def chunks_of(pcm: bytes, chunk_ms: int):
+    size = SAMPLE_RATE * 2 * chunk_ms // 1000
+    return [pcm[i:i + size] for i in range(0, len(pcm), size)]
+
+def summarize(events: list, sent_at: float, stop_at: float, chunk_ms: int, speed: float) -> dict:
+    partials = [t for t, e in events if e["type"] == "partial"]
+    segments = [(t, e) for t, e in events if e["type"] == "segment"]
+    final = next((t for t, e in events if e["type"] in ("final", "error")), None)
+    # Chunk n (holding audio up to (n + 1) * chunk_ms) is sent at sent_at + n * chunk_ms / speed
+    lags = [
+        (t - (sent_at + (math.ceil(e["end_ms"] / chunk_ms) - 1) * chunk_ms / 1000 / speed)) * 1000
+        for t, e in segments
+    ]
+    return {
+        "partials": len(partials),
+        "segments": len(segments),
+        "first_partial_ms": round((partials[0] - sent_at) * 1000, 1) if partials else None,
+        "segment_latency_p50_ms": round(statistics.median(lags), 1) if lags else None,
+        "segment_latency_max_ms": round(max(lags), 1) if lags else None,
+        "finalize_ms": round((final - stop_at) * 1000, 1) if final else None,
+        "final": next((e for _, e in events if e["type"] in ("final", "error")), None),
+    }
+
+# -----------------------------
+# In-process (TestClient)
+# -----------------------------
+def replay_in_process(pcm: bytes, chunk_ms: int, speed: float, diary: bool) -> dict:
+    from mongomock_motor import AsyncMongoMockClient
+    import database
+    mock = AsyncMongoMockClient()["echosense_replay"]
+    database.db = mock
+
+    from fastapi.testclient import TestClient
+    from main import app
+    from database import get_db
+
+    async def _db():
+        yield mock
+    app.dependency_overrides[get_db] = _db
+
+    with TestClient(app) as client:
+        res = client.post("/api/signup", json={
+            "username": "replay", "email": "replay@example.com", "password": "Password123"
+        })
+        token = res.json()["access_token"]
+        url = f"/api/voice/live?token={token}&diary={str(diary).lower()}"
+        with client.websocket_connect(url) as ws:
+            assert ws.receive_json()["type"] == "ready"
+            events = []
+
+            def receive():
+                while True:
+                    event = ws.receive_json()
+                    events.append((time.perf_counter(), event))
+                    if event["type"] in ("final", "error"):
+                        return
+
+            receiver = threading.Thread(target=receive, daemon=True)
+            receiver.start()
+            sent_at = time.perf_counter()
+            for i, chunk in enumerate(chunks_of(pcm, chunk_ms)):
+                _sleep_until(sent_at + i * chunk_ms / 1000 / speed)
+                ws.send_bytes(chunk)
+            stop_at = time.perf_counter()
+            ws.send_text(json.dumps({"type": "stop"}))
+            receiver.join(timeout=60)
+    return summarize(events, sent_at, stop_at, chunk_ms, speed)
+
+def _sleep_until(deadline: float):
+    delay = deadline - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+# -----------------------------
+# Remote server
+# -----------------------------
+async def replay_remote(url: str, token: str, pcm: bytes, chunk_ms: int, speed: float, diary: bool) -> dict:
+    import websockets
+
+    async with websockets.connect(f"{url}?token={token}&diary={str(diary).lower()}") as ws:
+        assert json.loads(await ws.recv())["type"] == "ready"
+        events = []
+
+        async def receive():
+            async for message in ws:
+                event = json.loads(message)
+                events.append((time.perf_counter(), event))
+                if event["type"] in ("final", "error"):
+                    return
+
+        receiver = asyncio.create_task(receive())
+        sent_at = time.perf_counter()
+        for i, chunk in enumerate(chunks_of(pcm, chunk_ms)):
+            await asyncio.sleep(max(0.0, sent_at + i * chunk_ms / 1000 / speed - time.perf_counter()))
+            await ws.send(chunk)
+        stop_at = time.perf_counter()
+        await ws.send(json.dumps({"type": "stop"}))
+        await asyncio.wait_for(receiver, timeout=60)
+    return summarize(events, sent_at, stop_at, chunk_ms, speed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--wav", help="Recording to replay (WAV/AIFF/FLAC); synthetic speech if omitted")
+    parser.add_argument("--utterances", type=int, default=4)
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up (1.0 = real time)")
+    parser.add_argument("--diary", action="store_true", help="Store the transcript as a diary entry")
+    parser.add_argument("--recognizer", default="fake", help="In-process recognizer (fake | google | sphinx)")
+    parser.add_argument("--url", help="ws:// URL of a running server instead of in-process")
+    parser.add_argument("--token", help="Access token for --url")
+    args = parser.parse_args()
+
+    if args.url:
+        pcm = load_wav(args.wav) if args.wav else synthesize(args.utterances)
+        result = asyncio.run(replay_remote(args.url, args.token, pcm, args.chunk_ms, args.speed, args.diary))
+    else:
+        # Settings are read at import time, so configure the in-process app first
+        os.environ.setdefault("VOICE_RECOGNIZER", args.recognizer)
+        os.environ.setdefault("GEMINI_FAKE_MODEL", "true")
+        pcm = load_wav(args.wav) if args.wav else synthesize(args.utterances)
+        result = replay_in_process(pcm, args.chunk_ms, args.speed, args.diary)
+
+    result["audio_s"] = round(len(pcm) / (SAMPLE_RATE * 2), 2)
+    print(json.dumps(result, indent=2))
@@ -1,12 +1,238 @@
 # backend/database.py
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from bson import ObjectId
+from datetime import datetime
 from utils.config import settings
+from utils.metrics import MongoCommandMetrics, MongoPoolMetrics
+import logging
 
-client = AsyncIOMotorClient(settings.MONGODB_URL)
-db = client[settings.DATABASE_NAME]
+logger = logging.getLogger(__name__)
+
+# Driver-level command latency and connection pool counters for /metrics
+mongo_pool_metrics = MongoPoolMetrics()
+
+# `client` and `db` are created on first use (module __getattr__ below), so
+# importing this module doesn't build a driver client. Assigning `database.db`
+# (as tests and benchmarks do) replaces the instance everywhere.
+def get_client() -> AsyncIOMotorClient:
+    if "client" not in globals():
+        globals()["client"] = AsyncIOMotorClient(
+            settings.MONGODB_URL,
+            maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+            minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+            event_listeners=[MongoCommandMetrics(), mongo_pool_metrics],
+        )
+    return globals()["client"]
+
+def get_database():
+    if "db" not in globals():
+        globals()["db"] = get_client()[settings.DATABASE_NAME]
+    return globals()["db"]
+
+def __getattr__(name):
+    if name == "client":
+        return get_client()
+    if name == "db":
+        return get_database()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 async def get_db():
     """
     FastAPI dependency to get the MongoDB database instance.
     """
-    yield db
+    yield get_database()
+
+async def ping(database=None):
+    """
+    Round trip to the server; raises when MongoDB is unreachable.
+    """
+    database = database if database is not None else get_database()
+    await database.command("ping")
+
+# -----------------------------
+# Index declarations
+# -----------------------------
+# collection -> list of (keys, options)
+INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("username", ASCENDING)], {"unique": True}),
+    ],
+    # History pages walk (user_id, [filter], timestamp, _id) in index order
+    "diary_entries": [
+        ([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("sentiment", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+         {"unique": True, "partialFilterExpression": {"idempotency_key": {"$exists": True}}}),
+        # Only entries still waiting for their AI reply, for the job sweeper
+        ([("reply_status", ASCENDING), ("timestamp", ASCENDING)],
+         {"partialFilterExpression": {"reply_status": "pending"}}),
+    ],
+    "moods": [
+        ([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("mood", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "voices": [
+        ([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "ai_reply_jobs": [
+        ([("status", ASCENDING), ("available_at", ASCENDING)], {}),
+    ],
+    "mood_daily_rollups": [
+        ([("user_id", ASCENDING), ("day", ASCENDING)], {"unique": True}),
+    ],
+    # One document per issued refresh token; dropped once the token has expired
+    "refresh_tokens": [
+        ([("session", ASCENDING)], {}),
+        ([("user_id", ASCENDING)], {}),
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+}
+
+def _index_name(keys) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+async def ensure_indexes(database=None) -> dict:
+    """
+    Creates any missing declared indexes and reports drift:
+    `created`, `mismatched` (same keys, different options), `extra` (not declared), `failed`.
+    """
+    database = database if database is not None else get_database()
+    report = {"created": [], "mismatched": [], "extra": [], "failed": []}
+
+    for coll_name, specs in INDEXES.items():
+        coll = database[coll_name]
+        existing = await coll.index_information()
+        existing_by_keys = {tuple(tuple(k) for k in info["key"]): (name, info) for name, info in existing.items()}
+        declared_keys = set()
+
+        for keys, options in specs:
+            key_tuple = tuple(tuple(k) for k in keys)
+            declared_keys.add(key_tuple)
+            label = f"{coll_name}.{_index_name(keys)}"
+
+            if key_tuple in existing_by_keys:
+                _, info = existing_by_keys[key_tuple]
+                if bool(info.get("unique", False)) != bool(options.get("unique", False)):
+                    report["mismatched"].append(label)
+                continue
+
+            try:
+                await coll.create_index(keys, **options)
+                report["created"].append(label)
+            except OperationFailure as e:
+                # e.g. duplicate data blocking a unique index; keep serving and surface it
+                report["failed"].append(f"{label}: {e}")
+
+        for key_tuple, (name, _) in existing_by_keys.items():
+            if name != "_id_" and key_tuple not in declared_keys:
+                report["extra"].append(f"{coll_name}.{name}")
+
+    if report["created"]:
+        logger.info(f"Created indexes: {report['created']}")
+    if report["mismatched"]:
+        logger.warning(f"Index options drifted from declaration: {report['mismatched']}")
+    if report["extra"]:
+        logger.info(f"Undeclared indexes present: {report['extra']}")
+    if report["failed"]:
+        logger.error(f"Index creation failed: {report['failed']}")
+    return report
+
+# -----------------------------
+# Query plan verification
+# -----------------------------
+def hot_queries():
+    """
+    The queries the API runs on every request, as (collection, filter, sort).
+    """
+    oid = ObjectId()
+    since = datetime.utcnow()
+    return [
+        ("users", {"email": "probe@example.com"}, None),
+        ("users", {"$or": [{"email": "probe@example.com"}, {"username": "probe"}]}, None),
+        ("users", {"_id": oid}, None),
+        ("diary_entries", {"user_id": oid, "timestamp": {"$gte": since}}, [("timestamp", DESCENDING)]),
+        ("moods", {"user_id": oid, "timestamp": {"$gte": since}}, [("timestamp", DESCENDING)]),
+        ("voices", {"user_id": oid, "timestamp": {"$gte": since}}, [("timestamp", DESCENDING)]),
+        ("diary_entries", {"user_id": oid, "sentiment": "sad", "timestamp": {"$lt": since}},
+         [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        ("moods", {"user_id": oid, "mood": "happy", "timestamp": {"$lt": since}},
+         [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        ("mood_daily_rollups", {"user_id": oid, "day": {"$gte": "1970-01-01"}}, [("day", DESCENDING)]),
+    ]
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            yield from _plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+async def verify_query_plans(database=None) -> list:
+    """
+    Runs explain() on each hot query and returns the ones whose winning plan is a COLLSCAN.
+    Backends without explain() (mongomock) fall back to checking that every filtered
+    field set is served by the leading fields of some index.
+    """
+    database = database if database is not None else get_database()
+    problems = []
+
+    for coll_name, query, sort in hot_queries():
+        coll = database[coll_name]
+        cursor = coll.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        label = f"{coll_name} {query}"
+
+        try:
+            explain = await cursor.explain()
+        except (AttributeError, NotImplementedError):
+            explain = None
+
+        if explain is not None:
+            winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+            if "COLLSCAN" in _plan_stages(winning):
+                problems.append(label)
+            continue
+
+        # Static fallback: each $or branch / the filter must hit an index prefix
+        index_prefixes = [
+            [field for field, _ in info["key"]]
+            for info in (await coll.index_information()).values()
+        ]
+        branches = query["$or"] if "$or" in query else [query]
+        for branch in branches:
+            fields = list(branch)
+            if not any(prefix[:len(fields)] == fields for prefix in index_prefixes):
+                problems.append(label)
+                break
+
+    if problems:
+        logger.error(f"Hot queries doing a COLLSCAN: {problems}")
+    return problems
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import sys
+
+    parser = argparse.ArgumentParser(description="Ensure MongoDB indexes and verify hot query plans")
+    parser.add_argument("--mongomock", action="store_true", help="Run against an in-memory mongomock database")
+    args = parser.parse_args()
+
+    async def _main() -> int:
+        target = get_database()
+        if args.mongomock:
+            from mongomock_motor import AsyncMongoMockClient
+            target = AsyncMongoMockClient()[settings.DATABASE_NAME]
+        print(await ensure_indexes(target))
+        problems = await verify_query_plans(target)
+        for p in problems:
+            print(f"COLLSCAN: {p}")
+        return 1 if problems else 0
+
+    sys.exit(asyncio.run(_main()))
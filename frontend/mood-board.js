@@ -18,7 +18,18 @@ let moodChart;
 // -----------------------------
 if (logoutBtn) {
     logoutBtn.addEventListener("click", () => {
+        // End the session server-side too, so the refresh token can't be used again
+        const refreshToken = localStorage.getItem("refresh_token");
+        if (refreshToken) {
+            fetch(`${API_URL}/logout`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ refresh_token: refreshToken }),
+                keepalive: true
+            }).catch(() => {});
+        }
         localStorage.removeItem("token");
+        localStorage.removeItem("refresh_token");
         localStorage.removeItem("username");
         window.location.href = "login.html";
     });
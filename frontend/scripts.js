@@ -5,18 +5,70 @@ const API_URL = window.location.hostname === "localhost" || window.location.host
 // -----------------------------
 // Check Login Token
 // -----------------------------
-const token = localStorage.getItem("token");
+let token = localStorage.getItem("token");
 if (!token && !window.location.href.includes("login") && !window.location.href.includes("signup")) {
     window.location.href = "login.html";
 }
 
+// Access tokens are short-lived: on a 401, trade the refresh token for a new
+// pair once and retry, instead of sending the user back to the login page.
+async function refreshSession() {
+    const refreshToken = localStorage.getItem("refresh_token");
+    if (!refreshToken) return false;
+    const res = await fetch(`${API_URL}/refresh`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh_token: refreshToken })
+    });
+    if (res.status !== 200) return false;
+    const data = await res.json();
+    token = data.access_token;
+    localStorage.setItem("token", token);
+    localStorage.setItem("refresh_token", data.refresh_token);
+    return true;
+}
+
+async function authFetch(url, options = {}) {
+    const send = () => fetch(url, {
+        ...options,
+        headers: { ...(options.headers || {}), "Authorization": `Bearer ${token}` }
+    });
+    let res = await send();
+    if (res.status === 401 && await refreshSession()) res = await send();
+    return res;
+}
+
+// Readable message for a failed request: the server's detail, plus when to
+// retry for rate limits (429) and load shedding (503).
+async function errorMessage(res) {
+    let detail = res.statusText || `HTTP ${res.status}`;
+    try {
+        const body = await res.json();
+        if (typeof body.detail === "string") detail = body.detail;
+        else if (body.message) detail = body.message;
+    } catch (e) { /* not JSON */ }
+    const retryAfter = res.headers.get("Retry-After");
+    return retryAfter ? `${detail} (try again in ${retryAfter}s)` : detail;
+}
+
 // -----------------------------
 // Logout Function
 // -----------------------------
 const logoutBtn = document.getElementById("logout-btn");
 if (logoutBtn) {
     logoutBtn.addEventListener("click", () => {
+        // End the session server-side too, so the refresh token can't be used again
+        const refreshToken = localStorage.getItem("refresh_token");
+        if (refreshToken) {
+            fetch(`${API_URL}/logout`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ refresh_token: refreshToken }),
+                keepalive: true
+            }).catch(() => {});
+        }
         localStorage.removeItem("token");
+        localStorage.removeItem("refresh_token");
         localStorage.removeItem("username");
         window.location.href = "login.html";
     });
@@ -25,43 +77,81 @@ if (logoutBtn) {
 // -----------------------------
 // Voice Recorder Utility
 // -----------------------------
+// Streams 16 kHz PCM to /voice/live while recording and shows the
+// transcript as it is recognized (partials replace each other, segments stick).
 async function recordVoice(micBtn, inputBox) {
     try {
         const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-        const mediaRecorder = new MediaRecorder(stream);
-        const chunks = [];
-
-        mediaRecorder.ondataavailable = e => chunks.push(e.data);
-        mediaRecorder.onstop = async () => {
-            const audioBlob = new Blob(chunks, { type: "audio/webm" });
-            const formData = new FormData();
-            formData.append("file", audioBlob, "audio.webm");
-
-            try {
-                const res = await fetch(`${API_URL}/speech-to-text`, {
-                    method: "POST",
-                    headers: { "Authorization": `Bearer ${token}` },
-                    body: formData,
-                });
-                const data = await res.json();
-                inputBox.value = data.text || "";
-            } catch (err) {
-                console.error("Voice-to-text error:", err);
-                alert("Error processing audio. Try again.");
-            }
+        const audioCtx = new AudioContext();
+        const source = audioCtx.createMediaStreamSource(stream);
+        const processor = audioCtx.createScriptProcessor(4096, 1, 1);
+        const ws = new WebSocket(`${API_URL.replace(/^http/, "ws")}/voice/live?token=${encodeURIComponent(token)}&sample_rate=16000`);
+        ws.binaryType = "arraybuffer";
 
-            micBtn.classList.remove("active");
+        const committed = [];
+        const show = partial => {
+            inputBox.value = [...committed, partial].filter(Boolean).join(" ");
+        };
+
+        ws.onmessage = e => {
+            const msg = JSON.parse(e.data);
+            if (msg.type === "partial") show(msg.text);
+            else if (msg.type === "segment") { committed.push(msg.text); show(""); }
+            else if (msg.type === "final") inputBox.value = msg.text;
+            else if (msg.type === "error") console.warn("Voice-to-text:", msg.detail);
+        };
+        ws.onerror = err => {
+            console.error("Voice-to-text error:", err);
+            alert("Error processing audio. Try again.");
         };
+        ws.onclose = () => micBtn.classList.remove("active");
 
-        mediaRecorder.start();
-        micBtn.classList.add("active");
-        setTimeout(() => mediaRecorder.stop(), 6000); // 6 seconds recording
+        const downsample = createDownsampler(audioCtx.sampleRate);
+        processor.onaudioprocess = e => {
+            if (ws.readyState === WebSocket.OPEN) {
+                ws.send(downsample(e.inputBuffer.getChannelData(0)));
+            }
+        };
+
+        ws.onopen = () => {
+            source.connect(processor);
+            processor.connect(audioCtx.destination);
+            micBtn.classList.add("active");
+            setTimeout(() => {
+                processor.disconnect();
+                source.disconnect();
+                stream.getTracks().forEach(t => t.stop());
+                audioCtx.close();
+                ws.send(JSON.stringify({ type: "stop" }));
+            }, 6000); // 6 seconds recording
+        };
     } catch (err) {
         console.error("Microphone access error:", err);
         alert("Cannot access microphone. Check permissions.");
     }
 }
 
+// The server expects 16 kHz 16-bit PCM and doesn't resample. The read position
+// carries over from one chunk to the next, so chunk boundaries don't click;
+// each output sample averages the input samples it covers (cheap anti-aliasing).
+function createDownsampler(inputRate) {
+    const ratio = inputRate / 16000;
+    let position = 0;
+    return samples => {
+        const out = new Int16Array(Math.max(0, Math.ceil((samples.length - position) / ratio)));
+        for (let i = 0; i < out.length; i++, position += ratio) {
+            const start = Math.floor(position);
+            const end = Math.min(samples.length, Math.max(start + 1, Math.floor(position + ratio)));
+            let sum = 0;
+            for (let j = start; j < end; j++) sum += samples[j];
+            const s = Math.max(-1, Math.min(1, sum / (end - start)));
+            out[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+        }
+        position -= samples.length;
+        return out.buffer;
+    };
+}
+
 // -----------------------------
 // Diary + Chat Elements
 // -----------------------------
@@ -88,14 +178,12 @@ if (saveDiary) saveDiary.addEventListener("click", async () => {
     diaryResponseDiv.innerHTML = "<p>Saving diary and analyzing mood...</p>";
 
     try {
-        const res = await fetch(`${API_URL}/diary`, {
+        const res = await authFetch(`${API_URL}/diary`, {
             method: "POST",
-            headers: {
-                "Content-Type": "application/json",
-                "Authorization": `Bearer ${token}`
-            },
+            headers: { "Content-Type": "application/json" },
             body: JSON.stringify({ content: message })
         });
+        if (!res.ok) throw new Error(await errorMessage(res));
         const data = await res.json();
 
         diaryResponseDiv.innerHTML = `
@@ -129,18 +217,44 @@ if (sendChat) sendChat.addEventListener("click", async () => {
     chatInput.value = "";
 
     try {
-        const res = await fetch(`${API_URL}/chat`, {
+        const res = await authFetch(`${API_URL}/chat/stream`, {
             method: "POST",
-            headers: {
-                "Content-Type": "application/json",
-                "Authorization": `Bearer ${token}`
-            },
+            headers: { "Content-Type": "application/json" },
             body: JSON.stringify({ message: message })
         });
+        if (!res.ok) {
+            const error = document.createElement("div");
+            error.className = "chat-message bot";
+            error.style.color = "red";
+            error.textContent = `Error: ${await errorMessage(res)}`;
+            chatBox.appendChild(error);
+            return;
+        }
 
-        const data = await res.json();
-        chatBox.innerHTML += `<div class="chat-message bot">${data.response}</div>`;
-        chatBox.scrollTop = chatBox.scrollHeight;
+        // Render tokens as they arrive over Server-Sent Events
+        const botDiv = document.createElement("div");
+        botDiv.className = "chat-message bot";
+        chatBox.appendChild(botDiv);
+
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            const frames = buffer.split("\n\n");
+            buffer = frames.pop();
+            for (const frame of frames) {
+                const dataLine = frame.split("\n").find(l => l.startsWith("data: "));
+                if (!dataLine) continue;
+                const payload = JSON.parse(dataLine.slice(6));
+                if (payload.delta) botDiv.textContent += payload.delta;
+                else if (payload.response) botDiv.textContent = payload.response;
+            }
+            chatBox.scrollTop = chatBox.scrollHeight;
+        }
     } catch (err) {
         console.error("Chat error:", err);
         chatBox.innerHTML += `<div class="chat-message bot" style="color:red;">Error: Could not reach server.</div>`;
@@ -167,9 +281,7 @@ async function loadMoodBoard() {
     if (!loadBtn) return;
     const period = periodSelect.value;
 
-    const res = await fetch(`${API_URL}/mood-board?period=${period}`, {
-        headers: { "Authorization": `Bearer ${token}` }
-    });
+    const res = await authFetch(`${API_URL}/mood-board?period=${period}`);
     const data = await res.json();
 
     const labels = Object.keys(data.summary);
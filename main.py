@@ -1,9 +1,29 @@
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from routers import chat, auth, voice, diary
 from starlette.middleware import Middleware
 from utils.config import settings
+from services.ai_client import close_ai_client, warm_up_ai_client
+from services.ai_cache import completion_cache
+from services.user_cache import user_cache
+from services.admission import ai_gate
+from services.gemini_service import ai_flights, ai_stream_flights
+from services.mood_rollups import mood_board_flights
+from services.conversation_memory import conversation_memory
+from database import get_database, ping, ensure_indexes, verify_query_plans, mongo_pool_metrics
+from utils.metrics import MetricsMiddleware, register_stats, collect_stats, render_metrics, thread_pool_stats
+from utils.security import hash_pool_stats, shutdown_hash_pool
+from utils.tokens import token_service
+from utils.resources import resources
+from services.sentiment_service import shutdown_sentiment_pool, warm_up_sentiment
+from services.ai_jobs import start_workers, stop_workers
+from services.speech_service import shutdown_speech_pool, speech_pool_stats, warm_up_speech
+from services.write_buffer import write_buffer, UnconfirmedWrite
+from contextlib import asynccontextmanager
 import logging
 
 # Configure logging
@@ -13,9 +33,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def warm_up_mongo():
+    database = get_database()
+    await ping(database)
+    if settings.DB_ENSURE_INDEXES:
+        await ensure_indexes(database)
+
+# Warmed by the lifespan; /health/ready waits for the required ones
+resources.register("mongo", warm_up_mongo)
+resources.register("sentiment", warm_up_sentiment)
+resources.register("ai_client", warm_up_ai_client)
+resources.register("speech", warm_up_speech, required=False)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_VERIFY_QUERY_PLANS:
+        # Strict mode: refuse to start rather than serve a hot query without its index
+        await warm_up_mongo()
+        problems = await verify_query_plans(get_database())
+        if problems:
+            raise RuntimeError(f"Hot queries would COLLSCAN: {problems}")
+    await resources.start(
+        background=settings.STARTUP_BACKGROUND_WARMUP,
+        retry_interval=settings.STARTUP_RETRY_INTERVAL,
+    )
+    start_workers(get_database(), settings.AI_JOB_WORKERS)
+    yield
+    # Let AI reply workers finish their current job, write out buffered inserts, then release pools
+    await resources.stop()
+    await stop_workers()
+    await write_buffer.close()
+    await close_ai_client()
+    shutdown_hash_pool()
+    await shutdown_sentiment_pool()
+    shutdown_speech_pool()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 # -----------------------------
@@ -37,6 +93,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so latency includes CORS and error handling
+app.add_middleware(MetricsMiddleware)
+
+register_stats("ai_cache", completion_cache.stats)
+register_stats("user_cache", user_cache.stats)
+register_stats("token_cache", token_service.stats)
+register_stats("ai_admission", ai_gate.stats)
+register_stats("coalesce_ai", ai_flights.stats)
+register_stats("coalesce_ai_stream", ai_stream_flights.stats)
+register_stats("coalesce_mood_board", mood_board_flights.stats)
+register_stats("conversation_memory", conversation_memory.stats)
+register_stats("password_hashing", hash_pool_stats)
+register_stats("mongo_pool", mongo_pool_metrics.stats)
+register_stats("thread_pool", thread_pool_stats)
+register_stats("speech_pool", speech_pool_stats)
+register_stats("startup", resources.stats)
+register_stats("write_buffer", write_buffer.stats)
+
 # -----------------------------
 # Routers
 # -----------------------------
@@ -53,6 +127,45 @@ async def root():
         "database": "Cloud MongoDB Atlas"
     }
 
+@app.get("/health/live")
+async def liveness():
+    """
+    The process is up and its event loop answers; never depends on other services.
+    """
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    200 once every required resource has warmed up, 503 (with per-resource state) until then.
+    """
+    ready = resources.ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming", "resources": resources.status()},
+    )
+
+@app.get("/metrics")
+async def metrics(format: str = "prometheus"):
+    """
+    Prometheus text exposition (request/stage/Mongo histograms plus cache and pool gauges).
+    ?format=json returns just the cache and pool stats.
+    """
+    if format == "json":
+        return collect_stats()
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.exception_handler(UnconfirmedWrite)
+async def unconfirmed_write_handler(request: Request, exc: UnconfirmedWrite):
+    # The document exists (on the primary) but isn't confirmed durable: retryable, and the
+    # id lets the client check GET /diary/{id} or retry with its Idempotency-Key instead of
+    # posting a duplicate
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "1"},
+        content={"message": "Stored, durability unconfirmed", "detail": str(exc), "id": str(exc.doc["_id"])},
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global Exception: {exc}", exc_info=True)
@@ -60,3 +173,5 @@ async def global_exception_handler(request: Request, exc: Exception):
         status_code=500,
         content={"message": "Internal Server Error", "detail": str(exc)},
     )
+
+resources.import_seconds = round(time.perf_counter() - _import_started, 4)
@@ -1,7 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from database import get_db
-from schemas import UserCreate, UserLogin, UserResponse, Token
-from utils.security import hash_password, verify_password, create_access_token
+from schemas import UserCreate, UserLogin, UserResponse, Token, UserPreferences, RefreshRequest, PasswordChangeRequest
+from routers.deps import get_current_user
+from services.user_cache import user_cache
+from services.refresh_sessions import issue_refresh_token, rotate_refresh_token, revoke_session, revoke_user_sessions
+from utils.security import hash_password_async, verify_password_async, create_access_token
+from utils.config import settings
+from utils.serialization import fast_response
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import re
 from datetime import datetime
@@ -35,33 +41,104 @@ async def signup(user: UserCreate, db: AsyncIOMotorDatabase = Depends(get_db)):
     user_dict = {
         "username": user.username,
         "email": user.email,
-        "password_hash": hash_password(user.password),
+        "password_hash": await hash_password_async(user.password),
         "created_at": datetime.utcnow()
     }
     
     result = await db["users"].insert_one(user_dict)
     user_dict["_id"] = result.inserted_id
 
-    token = create_access_token({"user_id": str(user_dict["_id"])})
-    return {
-        "access_token": token,
-        "token_type": "bearer",
-        "user": user_dict
-    }
+    return await _issue_tokens(db, user_dict)
 
 @router.post("/login", response_model=Token)
 async def login(user: UserLogin, db: AsyncIOMotorDatabase = Depends(get_db)):
     db_user = await db["users"].find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["password_hash"]):
+    if not db_user or not await verify_password_async(user.password, db_user["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    token = create_access_token({"user_id": str(db_user["_id"])})
-    return {
-        "access_token": token,
+    return await _issue_tokens(db, db_user)
+
+@router.post("/refresh", response_model=Token)
+async def refresh(body: RefreshRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
+    """
+    Trades a refresh token for a new access token (and a new refresh token)
+    without a password check, so short-lived access tokens don't send users
+    back through bcrypt. Each refresh token works once: presenting a spent
+    one revokes its whole session (see services/refresh_sessions.py).
+    """
+    rotated = await rotate_refresh_token(db, body.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user_id, refresh_token = rotated
+
+    user = await user_cache.get(user_id)
+    if user is None:
+        user = await db["users"].find_one({"_id": ObjectId(user_id)}, {"password_hash": 0})
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        await user_cache.set(user_id, user)
+    return await _issue_tokens(db, user, refresh_token)
+
+@router.post("/logout")
+async def logout(body: RefreshRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
+    """
+    Ends the session of the given refresh token; its access token runs out on its own.
+    """
+    await revoke_session(db, body.refresh_token)
+    return {"status": "logged_out"}
+
+@router.put("/password", response_model=Token)
+async def change_password(
+    body: PasswordChangeRequest,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Changes the password and signs out every session, returning fresh tokens for this one.
+    """
+    db_user = await db["users"].find_one({"_id": current_user["_id"]})
+    if not await verify_password_async(body.current_password, db_user["password_hash"]):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Current password is incorrect")
+    validate_password_strength(body.new_password)
+
+    await db["users"].update_one(
+        {"_id": current_user["_id"]},
+        {"$set": {"password_hash": await hash_password_async(body.new_password)}}
+    )
+    await user_cache.invalidate(current_user["_id"])
+    await revoke_user_sessions(db, current_user["_id"])
+    return await _issue_tokens(db, current_user)
+
+async def _issue_tokens(db, user: dict, refresh_token: str = None):
+    user_id = str(user["_id"])
+    return fast_response(Token, {
+        "access_token": create_access_token({"user_id": user_id}),
         "token_type": "bearer",
-        "user": db_user
-    }
+        "user": user,
+        "refresh_token": refresh_token or await issue_refresh_token(db, user_id),
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    })
+
+@router.put("/preferences", response_model=UserPreferences)
+async def update_preferences(
+    prefs: UserPreferences,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Updates per-user settings (e.g. opting out of the shared AI reply cache).
+    """
+    await db["users"].update_one(
+        {"_id": current_user["_id"]},
+        {"$set": prefs.model_dump()}
+    )
+    await user_cache.invalidate(current_user["_id"])
+    return prefs
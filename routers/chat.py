@@ -1,16 +1,17 @@
 # backend/chat.py
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from database import get_db
-from schemas import ChatCreate, ChatResponse, MoodSummary
-from datetime import datetime, timedelta
-from routers.deps import get_current_user
-from services.ai_service import get_gemini_response
+from schemas import ChatCreate, ChatResponse, ChatPage, MoodSummary
+from datetime import date, datetime, timedelta
+from typing import Optional
+from routers.deps import get_current_user_claims, admit_ai_request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 
 router = APIRouter()
 
-from services.sentiment_service import analyze_sentiment
+from services.sentiment_service import analyze_sentiment_async
 
 MOOD_QUOTES = {
     "happy": "Keep shining! Happiness looks great on you 😊",
@@ -18,75 +19,192 @@ MOOD_QUOTES = {
     "neutral": "Balance is the key to life. Take it easy 😐"
 }
 
-from services.gemini_service import generate_ai_response
+from services.gemini_service import generate_ai_response, stream_ai_response
 from schemas import ChatMessageRequest, ChatMessageResponse
+from utils.streaming import sse_event, shielded, SSE_HEADERS
+from services.ai_cache import cache_enabled_for, reply_scope
+from services.mood_rollups import get_mood_analytics, get_recent_moods, mood_board_flights, day_key, MOODS
+from services.conversation_memory import conversation_memory
+from services.prompts import context_budget
+from services.write_buffer import write_buffer
+from utils.pagination import history_filter, history_page
+from utils.serialization import fast_response
+from utils.config import settings
 
-@router.post("/chat")
-async def create_chat(
-    request: ChatMessageRequest,
-    diary: bool = False,
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
-):
-    user_message = request.message
-    mood = analyze_sentiment(user_message)
+CHAT_PROJECTION = {"user_message": 1, "bot_response": 1, "mood": 1, "timestamp": 1}
 
-    try:
-        bot_reply = await generate_ai_response(user_message)
-    except Exception:
-        bot_reply = "I'm having a little trouble connecting right now, but I'm here for you."
+PERIOD_DAYS = {"weekly": 7, "monthly": 30, "quarterly": 91, "yearly": 365}
+DEFAULT_GRANULARITY = {"weekly": "day", "monthly": "day", "quarterly": "week", "yearly": "month", "custom": "day"}
 
+async def save_chat_turn(db, user_id, user_message: str, mood: str, bot_reply: str, diary: bool = False):
+    """
+    Queues a chat turn for `moods` (and `diary_entries` when diary=True) and
+    appends it to the user's conversation memory.
+    """
     chat_entry = {
         "user_message": user_message,
         "bot_response": bot_reply,
         "mood": mood,
-        "user_id": current_user["_id"],
+        "user_id": user_id,
         "timestamp": datetime.utcnow()
     }
-    await db["moods"].insert_one(chat_entry)
+    # Written behind the response; the turn is in conversation memory already
+    await write_buffer.insert(db, "moods", chat_entry)
+    await conversation_memory.record_turn(db, user_id, chat_entry)
 
     if diary:
         diary_entry = {
             "text": user_message,
             "sentiment": mood,
             "gemini_response": bot_reply,
-            "user_id": current_user["_id"],
+            "user_id": user_id,
             "timestamp": datetime.utcnow()
         }
-        await db["diary_entries"].insert_one(diary_entry)
+        # The buffer updates the mood rollups once the entry is written
+        await write_buffer.insert(db, "diary_entries", diary_entry)
+
+async def _memory_context(db, user_id, user_message: str, mood: str) -> str:
+    """
+    The user's recent turns and conversation summary, fitted to what's left of
+    CHAT_CONTEXT_TOKENS; empty for a first message, which stays cacheable.
+    """
+    memory = await conversation_memory.get(db, user_id)
+    if memory.empty:
+        return ""
+    return memory.context(context_budget("chat", user_message, mood))
+
+@router.post("/chat")
+async def create_chat(
+    request: ChatMessageRequest,
+    diary: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(admit_ai_request)
+):
+    user_message = request.message
+    mood = await analyze_sentiment_async(user_message)
+    context = await _memory_context(db, current_user["_id"], user_message, mood)
+
+    try:
+        bot_reply = await generate_ai_response(
+            user_message, mood, use_cache=cache_enabled_for(current_user), context=context,
+            share_scope=reply_scope(current_user),
+        )
+    except HTTPException:
+        raise
+    except Exception:
+        bot_reply = "I'm having a little trouble connecting right now, but I'm here for you."
+
+    await save_chat_turn(db, current_user["_id"], user_message, mood, bot_reply, diary)
 
     return {"response": bot_reply}
 
+@router.post("/chat/stream")
+async def stream_chat(
+    request: ChatMessageRequest,
+    diary: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(admit_ai_request)
+):
+    """
+    Streams the AI reply as Server-Sent Events (`delta` frames, then one `done` frame).
+    The full reply is persisted once the stream ends; if the client disconnects
+    first, the turn is stored with the part of the reply generated so far.
+    """
+    user_message = request.message
+    mood = await analyze_sentiment_async(user_message)
+    user_id = current_user["_id"]
+    use_cache = cache_enabled_for(current_user)
+    share_scope = reply_scope(current_user)
+    context = await _memory_context(db, user_id, user_message, mood)
+
+    async def event_stream():
+        yield sse_event({"mood": mood}, event="mood")
+        parts = []
+        saved = False
+        try:
+            async for chunk in stream_ai_response(user_message, mood, use_cache=use_cache, context=context, share_scope=share_scope):
+                parts.append(chunk)
+                yield sse_event({"delta": chunk})
+
+            bot_reply = "".join(parts)
+            saved = True
+            await save_chat_turn(db, user_id, user_message, mood, bot_reply, diary)
+            yield sse_event({"response": bot_reply, "mood": mood}, event="done")
+        finally:
+            if not saved and parts:
+                # Client disconnected mid-reply: keep the turn with the part it was shown
+                await shielded(save_chat_turn(db, user_id, user_message, mood, "".join(parts), diary))
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/chat/history", response_model=ChatPage)
+async def chat_history(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    mood: Optional[str] = Query(None, pattern="^(happy|sad|neutral)$"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(get_current_user_claims)
+):
+    """
+    Past chat turns, newest first, cursor-paginated (see GET /diary).
+    """
+    query = history_filter(current_user["_id"], since, until, cursor, mood=mood)
+    return await history_page(request, response, db["moods"], query, CHAT_PROJECTION, limit, ChatPage)
+
 @router.get("/mood-board", response_model=MoodSummary)
 async def get_mood_board(
-    period: str = Query("weekly", pattern="^(weekly|monthly)$"), 
+    period: str = Query("weekly", pattern="^(weekly|monthly|quarterly|yearly|custom)$"), 
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: Optional[str] = Query(None, pattern="^(day|week|month)$"),
     db: AsyncIOMotorDatabase = Depends(get_db), 
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_claims)
 ):
-    now = datetime.utcnow()
-    days_back = 7 if period == "weekly" else 30
-    start_date = now - timedelta(days=days_back)
-
-    cursor = db["diary_entries"].find({
-        "user_id": current_user["_id"],
-        "timestamp": {"$gte": start_date}
-    }).sort("timestamp", -1)
-    entries = await cursor.to_list(length=100)
-
-    last_10_moods = [e["sentiment"] for e in entries[:10]]
-
-    summary = {}
-    for e in entries:
-        day = e["timestamp"].strftime("%Y-%m-%d")
-        if day not in summary:
-            summary[day] = {"happy": 0, "sad": 0, "neutral": 0}
-        mood_key = e["sentiment"].lower() if e["sentiment"].lower() in ["happy", "sad", "neutral"] else "neutral"
-        summary[day][mood_key] += 1
+    """
+    Mood counts and average mood score per day/week/month for the period
+    (period=custom takes start and end dates, inclusive). Identical concurrent
+    requests (several tabs, retries) share one computation, reused for a
+    moment afterwards.
+    """
+    start_day, end_day = _period_range(period, start, end)
+    granularity = granularity or DEFAULT_GRANULARITY[period]
+    user_id = current_user["_id"]
+    board = await mood_board_flights.do(
+        (user_id, period, start_day, end_day, granularity),
+        lambda: _build_mood_board(db, user_id, period, start_day, end_day, granularity),
+    )
+    return fast_response(MoodSummary, board)
+
+def _period_range(period: str, start: Optional[date], end: Optional[date]):
+    if period != "custom":
+        today = datetime.utcnow()
+        return day_key(today - timedelta(days=PERIOD_DAYS[period] - 1)), day_key(today)
+
+    if start is None or end is None:
+        raise HTTPException(status_code=400, detail="period=custom needs start and end dates")
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days + 1 > settings.MOOD_ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {settings.MOOD_ANALYTICS_MAX_DAYS} days")
+    return start.isoformat(), end.isoformat()
+
+async def _build_mood_board(db, user_id, period: str, start_day: str, end_day: str, granularity: str) -> dict:
+    # Counting happens on pre-aggregated daily rollups, never on the entries themselves
+    buckets = await get_mood_analytics(db, user_id, start_day, end_day, granularity)
+    last_10_moods = await get_recent_moods(db, user_id, start_day, end_day, 10)
+
+    summary = {b["start"]: {mood: b[mood] for mood in MOODS} for b in buckets}
+    total = sum(b["total"] for b in buckets)
+    score_sum = sum(b["happy"] - b["sad"] for b in buckets)
 
     # Aggregate counts for the last 10 entries as requested
-    happy_count = sum(1 for e in entries[:10] if e["sentiment"] == "happy")
-    sad_count = sum(1 for e in entries[:10] if e["sentiment"] == "sad")
-    neutral_count = sum(1 for e in entries[:10] if e["sentiment"] == "neutral")
+    happy_count = last_10_moods.count("happy")
+    sad_count = last_10_moods.count("sad")
+    neutral_count = last_10_moods.count("neutral")
     
     dominant = "neutral"
     if happy_count > sad_count and happy_count > neutral_count:
@@ -103,5 +221,10 @@ async def get_mood_board(
         "summary": summary,
         "dominant_mood": dominant,
         "quote": MOOD_QUOTES.get(dominant, "Stay balanced."),
-        "last_10_moods": last_10_moods
+        "last_10_moods": last_10_moods,
+        "granularity": granularity,
+        "start": start_day,
+        "end": end_day,
+        "buckets": buckets,
+        "avg_score": score_sum / total if total else None,
     }
@@ -2,15 +2,14 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from database import get_db
 from utils.security import decode_access_token
+from services.user_cache import user_cache
+from services.admission import rate_limiter, ai_gate
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncIOMotorDatabase = Depends(get_db)
-) -> dict:
+def _user_id_from_token(token: str) -> str:
     user_id = decode_access_token(token)
     if not user_id:
         raise HTTPException(
@@ -18,11 +17,40 @@ async def get_current_user(
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = await db["users"].find_one({"_id": ObjectId(user_id)})
+    return user_id
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+) -> dict:
+    user_id = _user_id_from_token(token)
+
+    user = await user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    user = await db["users"].find_one({"_id": ObjectId(user_id)}, {"password_hash": 0})
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    await user_cache.set(user_id, user)
     return user
+
+async def get_current_user_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    For handlers that only need the caller's id: trusts the verified token
+    claims and skips the user lookup entirely. Returns {"_id": ObjectId}.
+    """
+    user_id = _user_id_from_token(token)
+    return {"_id": ObjectId(user_id)}
+
+async def admit_ai_request(current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    get_current_user plus rate limiting and load shedding, for endpoints that
+    call the model: over-limit callers get 429, an overloaded service 503.
+    """
+    await rate_limiter.check(current_user["_id"])
+    ai_gate.admit()
+    return current_user
@@ -1,29 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from database import get_db
-from schemas import DiaryCreateRequest, DiaryResponse
-from routers.deps import get_current_user
-from services.sentiment_service import analyze_sentiment
+from schemas import DiaryCreateRequest, DiaryResponse, DiaryBulkRequest, DiaryBulkResponse, DiaryPage
+from routers.deps import get_current_user, get_current_user_claims, admit_ai_request
+from services.sentiment_service import analyze_sentiment_async, analyze_sentiment_batch
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from datetime import datetime
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
+from typing import Optional
+import asyncio
+import logging
+import math
+from datetime import datetime, timezone
+from collections import Counter
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
-from services.gemini_service import generate_ai_response
+from services.gemini_service import generate_ai_response, stream_ai_response
+from utils.streaming import sse_event, shielded, SSE_HEADERS
+from services.ai_cache import cache_enabled_for, reply_scope
+from services.mood_rollups import record_moods_bulk
+from services.write_buffer import write_buffer, UnconfirmedWrite
+from services.admission import rate_limiter
+from utils.config import settings
+from services.ai_jobs import enqueue_reply_job, wait_for_reply
+from utils.pagination import history_filter, history_page
+from utils.serialization import fast_response
+from utils.metrics import stage
+
+DIARY_PROJECTION = {"text": 1, "sentiment": 1, "gemini_response": 1, "reply_status": 1, "timestamp": 1, "user_id": 1}
+
+async def store_pending_entry(db, current_user: dict, content: str, sentiment: str, idempotency_key: Optional[str] = None) -> dict:
+    """
+    Stores a diary entry with reply_status "pending" and queues its AI reply.
+    """
+    diary_entry = {
+        "text": content,
+        "sentiment": sentiment,
+        "gemini_response": None,
+        "reply_status": "pending",
+        "user_id": current_user["_id"],
+        "timestamp": datetime.utcnow()
+    }
+    if idempotency_key:
+        diary_entry["idempotency_key"] = idempotency_key
+    try:
+        with stage("mongo_insert"):
+            await write_buffer.insert(db, "diary_entries", diary_entry, wait=True)
+    except DuplicateKeyError:
+        # A concurrent retry with the same key won the insert
+        return await db["diary_entries"].find_one(
+            {"user_id": current_user["_id"], "idempotency_key": idempotency_key}
+        )
+    except UnconfirmedWrite:
+        # Stored all the same: queue its reply before reporting the unconfirmed write
+        await enqueue_reply_job(db, diary_entry, use_cache=cache_enabled_for(current_user))
+        raise
+    await enqueue_reply_job(db, diary_entry, use_cache=cache_enabled_for(current_user))
+    return diary_entry
 
 @router.post("/diary", response_model=DiaryResponse)
 async def create_diary_entry(
     request: DiaryCreateRequest,
+    async_reply: bool = settings.DIARY_ASYNC_REPLIES,
+    idempotency_key: Optional[str] = Header(None),
     db: AsyncIOMotorDatabase = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(admit_ai_request)
 ):
     """
     Creates a new diary entry, runs sentiment analysis, gets AI response, and stores it in MongoDB.
+    With async_reply=true the entry is stored right away with reply_status "pending" and the
+    AI reply is filled in by a background worker (poll GET /diary/{id} or GET /diary/{id}/events).
+    An Idempotency-Key header makes retries return the original entry instead of a duplicate.
     """
-    sentiment = analyze_sentiment(request.content)
+    if idempotency_key:
+        existing = await db["diary_entries"].find_one(
+            {"user_id": current_user["_id"], "idempotency_key": idempotency_key}
+        )
+        if existing:
+            return fast_response(DiaryResponse, existing)
+
+    sentiment = await analyze_sentiment_async(request.content)
+
+    if async_reply:
+        entry = await store_pending_entry(db, current_user, request.content, sentiment, idempotency_key)
+        return fast_response(DiaryResponse, entry)
     
     # Get AI response for the diary entry
     try:
-        ai_reply = await generate_ai_response(request.content)
+        ai_reply = await generate_ai_response(
+            request.content, sentiment, use_cache=cache_enabled_for(current_user),
+            share_scope=reply_scope(current_user), endpoint="diary",
+        )
+    except HTTPException:
+        raise
     except Exception:
         ai_reply = "I'm here for you. How can I support you today?"
 
@@ -34,8 +106,196 @@ async def create_diary_entry(
         "user_id": current_user["_id"],
         "timestamp": datetime.utcnow()
     }
+    if idempotency_key:
+        diary_entry["idempotency_key"] = idempotency_key
     
-    result = await db["diary_entries"].insert_one(diary_entry)
-    diary_entry["_id"] = result.inserted_id
+    try:
+        with stage("mongo_insert"):
+            await write_buffer.insert(db, "diary_entries", diary_entry, wait=True)
+    except DuplicateKeyError:
+        existing = await db["diary_entries"].find_one(
+            {"user_id": current_user["_id"], "idempotency_key": idempotency_key}
+        )
+        return fast_response(DiaryResponse, existing)
     
-    return diary_entry
+    return fast_response(DiaryResponse, diary_entry)
+
+@router.post("/diary/stream")
+async def stream_diary_entry(
+    request: DiaryCreateRequest,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(admit_ai_request)
+):
+    """
+    Same as POST /diary, but streams the AI reply as Server-Sent Events.
+    The entry is stored once the reply is complete and returned in the final `done` frame.
+    If the client disconnects first, it is stored with the partial reply, or, when no reply
+    text had arrived yet, as "pending" with its reply queued like POST /diary?async_reply=true.
+    """
+    sentiment = await analyze_sentiment_async(request.content)
+    user_id = current_user["_id"]
+    use_cache = cache_enabled_for(current_user)
+    share_scope = reply_scope(current_user)
+
+    def make_entry(parts) -> dict:
+        return {
+            "text": request.content,
+            "sentiment": sentiment,
+            "gemini_response": "".join(parts),
+            "user_id": user_id,
+            "timestamp": datetime.utcnow()
+        }
+
+    async def event_stream():
+        parts = []
+        saved = False
+        try:
+            yield sse_event({"sentiment": sentiment}, event="sentiment")
+            async for chunk in stream_ai_response(request.content, sentiment, use_cache=use_cache, share_scope=share_scope, endpoint="diary"):
+                parts.append(chunk)
+                yield sse_event({"delta": chunk})
+
+            diary_entry = make_entry(parts)
+            saved = True
+            try:
+                with stage("mongo_insert"):
+                    await write_buffer.insert(db, "diary_entries", diary_entry, wait=True)
+            except UnconfirmedWrite:
+                # Stored on the primary; the reply is already on screen, so finish the stream
+                pass
+            yield sse_event(DiaryResponse(**diary_entry).model_dump(mode="json", by_alias=True), event="done")
+        finally:
+            if not saved:
+                # Client disconnected before the reply finished: the journal entry itself must not be lost
+                try:
+                    if parts:
+                        await shielded(write_buffer.insert(db, "diary_entries", make_entry(parts), wait=True))
+                    else:
+                        await shielded(store_pending_entry(db, current_user, request.content, sentiment))
+                except UnconfirmedWrite:
+                    pass
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/diary/bulk", response_model=DiaryBulkResponse)
+async def bulk_import_diary(
+    request: DiaryBulkRequest,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Imports many diary entries at once (e.g. from another journal app).
+    Sentiment is scored in one batch and entries are written with insert_many;
+    no AI replies are generated for imported entries. Entries that can't be
+    written are skipped and counted in `failed`; the rest are still imported.
+    An import costs one rate-limit token per DIARY_BULK_ENTRIES_PER_TOKEN entries.
+    """
+    if len(request.entries) > settings.DIARY_BULK_MAX_ENTRIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.DIARY_BULK_MAX_ENTRIES} entries per import"
+        )
+    if not request.entries:
+        return {"inserted": 0, "failed": 0, "sentiments": {}}
+    await rate_limiter.check(current_user["_id"], math.ceil(len(request.entries) / settings.DIARY_BULK_ENTRIES_PER_TOKEN))
+
+    sentiments = await analyze_sentiment_batch([e.content for e in request.entries])
+
+    now = datetime.utcnow()
+    docs = []
+    for item, sentiment in zip(request.entries, sentiments):
+        timestamp = item.timestamp or now
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        docs.append({
+            "text": item.content,
+            "sentiment": sentiment,
+            "gemini_response": None,
+            "user_id": current_user["_id"],
+            "timestamp": timestamp
+        })
+
+    failed = set()
+    try:
+        with stage("mongo_insert"):
+            await db["diary_entries"].insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # ordered=False: everything except the reported documents was written
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        logger.error(f"Diary import for {current_user['_id']}: {len(failed)} of {len(docs)} entries failed: {e.details}")
+    written = [d for i, d in enumerate(docs) if i not in failed]
+    await record_moods_bulk(db, current_user["_id"], [(d["timestamp"], d["sentiment"]) for d in written])
+
+    return {
+        "inserted": len(written),
+        "failed": len(failed),
+        "sentiments": dict(Counter(d["sentiment"] for d in written)),
+    }
+
+async def _get_own_entry(db, entry_id: str, user_id) -> dict:
+    try:
+        oid = ObjectId(entry_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+    entry = await db["diary_entries"].find_one({"_id": oid, "user_id": user_id})
+    if not entry:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+    return entry
+
+@router.get("/diary", response_model=DiaryPage)
+async def list_diary_entries(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    sentiment: Optional[str] = Query(None, pattern="^(happy|sad|neutral)$"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(get_current_user_claims)
+):
+    """
+    Diary history, newest first. Pass the returned next_cursor to get the next page;
+    send the page's ETag back as If-None-Match to get a 304 when nothing changed.
+    """
+    query = history_filter(current_user["_id"], since, until, cursor, sentiment=sentiment)
+    return await history_page(request, response, db["diary_entries"], query, DIARY_PROJECTION, limit, DiaryPage)
+
+@router.get("/diary/{entry_id}", response_model=DiaryResponse)
+async def get_diary_entry(
+    entry_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(get_current_user_claims)
+):
+    """
+    Returns one diary entry; poll this until reply_status is no longer "pending".
+    """
+    return fast_response(DiaryResponse, await _get_own_entry(db, entry_id, current_user["_id"]))
+
+@router.get("/diary/{entry_id}/events")
+async def diary_entry_events(
+    entry_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(get_current_user_claims)
+):
+    """
+    Server-Sent Events notification: sends one `done` frame with the entry once its
+    AI reply is ready (or a `timeout` frame after DIARY_REPLY_WAIT_SECONDS).
+    """
+    entry = await _get_own_entry(db, entry_id, current_user["_id"])
+    user_id = current_user["_id"]
+
+    async def event_stream():
+        current = entry
+        deadline = asyncio.get_running_loop().time() + settings.DIARY_REPLY_WAIT_SECONDS
+        while current.get("reply_status") == "pending":
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                yield sse_event({"reply_status": "pending"}, event="timeout")
+                return
+            # Woken instantly by an in-process worker; otherwise re-check Mongo every second
+            await wait_for_reply(entry_id, timeout=min(1.0, remaining))
+            current = await db["diary_entries"].find_one({"_id": current["_id"], "user_id": user_id})
+        yield sse_event(DiaryResponse(**current).model_dump(mode="json", by_alias=True), event="done")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
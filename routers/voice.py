@@ -1,12 +1,20 @@
 # backend/voice.py
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect, Query, status
 from database import get_db
-from routers.deps import get_current_user
+from routers.deps import get_current_user, get_current_user_claims, admit_ai_request, _user_id_from_token
+from routers.diary import store_pending_entry
+from schemas import DiaryResponse, VoicePage
+from utils.pagination import history_filter, history_page
+from utils.metrics import stage
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
-import speech_recognition as sr
-import tempfile
-import os
+from services.speech_service import transcribe_stream, upload_chunks, AudioTooLarge, UnsupportedAudio, LiveTranscriber, SAMPLE_RATE, sr
+from services.sentiment_service import analyze_sentiment_async
+from services.write_buffer import write_buffer, UnconfirmedWrite
+from bson import ObjectId
 from datetime import datetime
+import json
+import time
 
 router = APIRouter()
 
@@ -14,41 +22,182 @@ router = APIRouter()
 async def speech_to_text(
     file: UploadFile = File(...), 
     db: AsyncIOMotorDatabase = Depends(get_db), 
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_claims)
 ):
     """
-    Convert uploaded audio to text using Google Speech Recognition.
+    Convert uploaded audio to text.
+    The upload is read in chunks (size-limited), decoded off the event loop and
+    long recordings are split on silence so segments are recognized in parallel.
     """
-    if not file.filename.endswith((".wav", ".mp3", ".webm", ".ogg")):
+    if not file.filename.endswith((".wav", ".mp3", ".webm", ".ogg", ".flac", ".aiff")):
         raise HTTPException(status_code=400, detail="Invalid audio format")
 
-    tmp_path = None
+    return await _transcribe_and_save(upload_chunks(file), db, current_user["_id"])
+
+@router.get("/voices", response_model=VoicePage)
+async def list_voice_notes(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(get_current_user_claims)
+):
+    """
+    Transcribed voice notes, newest first, cursor-paginated (see GET /diary).
+    """
+    query = history_filter(current_user["_id"], since, until, cursor)
+    return await history_page(request, response, db["voices"], query, {"audio_text": 1, "timestamp": 1}, limit, VoicePage)
+
+@router.post("/speech-to-text/raw")
+async def speech_to_text_raw(
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: dict = Depends(get_current_user_claims)
+):
+    """
+    Same as /speech-to-text, but the audio is the raw request body (Content-Type: audio/wav etc.).
+    The body is consumed as it arrives, so nothing is spooled to disk and oversized
+    uploads are rejected as soon as they cross the limit.
+    """
+    if not request.headers.get("content-type", "").startswith("audio/"):
+        raise HTTPException(status_code=400, detail="Invalid audio format")
+    return await _transcribe_and_save(request.stream(), db, current_user["_id"])
+
+@router.websocket("/voice/live")
+async def live_voice(
+    websocket: WebSocket,
+    token: str = Query(...),
+    sample_rate: int = Query(SAMPLE_RATE),
+    diary: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Live voice journaling. Browsers can't set headers on a WebSocket, so the
+    access token comes as ?token=. The client sends binary frames of 16-bit
+    mono PCM at 16 kHz while recording, then {"type": "stop"}; `sample_rate` is
+    only checked (other rates are refused with close code 1003, not resampled).
+
+    Server messages (JSON):
+      {"type": "ready"}
+      {"type": "partial", "text"}   transcript of the utterance in progress
+      {"type": "segment", "index", "text", "start_ms", "end_ms", "recognition_ms"}
+      {"type": "final", "text", "voice_id", "finalize_ms", "diary"?}
+      {"type": "error", "detail"}
+    With ?diary=true the final transcript is stored as a diary entry whose AI
+    reply is generated in the background (see GET /diary/{id}/events); that
+    goes through the same rate limit and load shedding as POST /diary, and a
+    rejected session gets an error frame and close code 1013 (try again later).
+    """
+    try:
+        if diary:
+            user = await get_current_user(token, db)
+        else:
+            user = {"_id": ObjectId(_user_id_from_token(token))}
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    if sample_rate != SAMPLE_RATE:
+        await _close_with_error(websocket, f"Send 16-bit mono PCM at {SAMPLE_RATE} Hz", status.WS_1003_UNSUPPORTED_DATA)
+        return
+    if diary:
+        try:
+            await admit_ai_request(user)
+        except HTTPException as e:
+            await websocket.send_json({"type": "error", "detail": e.detail, "retry_after": int((e.headers or {}).get("Retry-After", 1))})
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+    transcriber = LiveTranscriber(websocket.send_json)
+    await websocket.send_json({"type": "ready"})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                await transcriber.feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if isinstance(control, dict) and control.get("type") == "stop":
+                    break
+
+        started = time.perf_counter()
+        text = await transcriber.finish()
+    except WebSocketDisconnect:
+        transcriber.cancel()
+        return
+    except AudioTooLarge as e:
+        transcriber.cancel()
+        await _close_with_error(websocket, str(e), status.WS_1009_MESSAGE_TOO_BIG)
+        return
+    except sr.UnknownValueError:
+        await _close_with_error(websocket, "Could not understand audio")
+        return
+    except sr.RequestError as e:
+        await _close_with_error(websocket, f"Speech recognition service error: {e}", status.WS_1011_INTERNAL_ERROR)
+        return
+
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
+        with stage("mongo_insert"):
+            voice_entry = await write_buffer.insert(db, "voices", {
+                "audio_text": text,
+                "user_id": user["_id"],
+                "timestamp": datetime.utcnow()
+            }, wait=True)
+    except UnconfirmedWrite as e:
+        # Stored on the primary; the transcript is already on screen, so carry on
+        voice_entry = e.doc
+    final = {
+        "type": "final",
+        "text": text,
+        "voice_id": str(voice_entry["_id"]),
+        "finalize_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    if diary:
+        sentiment = await analyze_sentiment_async(text)
+        entry = await store_pending_entry(db, user, text, sentiment)
+        final["diary"] = DiaryResponse(**entry).model_dump(mode="json", by_alias=True)
 
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(tmp_path) as source:
-            audio_data = recognizer.record(source)
-            text = recognizer.recognize_google(audio_data)
+    await websocket.send_json(final)
+    await websocket.close()
+
+async def _close_with_error(websocket: WebSocket, detail: str, code: int = status.WS_1000_NORMAL_CLOSURE):
+    await websocket.send_json({"type": "error", "detail": detail})
+    await websocket.close(code=code)
+
+async def _transcribe_and_save(chunks, db, user_id) -> dict:
+    try:
+        text = await transcribe_stream(chunks)
 
         # Save to MongoDB
         voice_entry = {
             "audio_text": text,
-            "user_id": current_user["_id"],
+            "user_id": user_id,
             "timestamp": datetime.utcnow()
         }
-        result = await db["voices"].insert_one(voice_entry)
+        with stage("mongo_insert"):
+            await write_buffer.insert(db, "voices", voice_entry, wait=True)
 
-        return {"text": text, "voice_id": str(result.inserted_id)}
+        return {"text": text, "voice_id": str(voice_entry["_id"])}
 
+    except AudioTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedAudio as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except sr.UnknownValueError:
         raise HTTPException(status_code=400, detail="Could not understand audio")
     except sr.RequestError as e:
         raise HTTPException(status_code=500, detail=f"Speech recognition service error: {e}")
+    except UnconfirmedWrite:
+        # Stored, durability unconfirmed: answered as a retryable 503 by main.py
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Speech recognition failed: {e}")
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
@@ -30,10 +30,22 @@ class UserLogin(BaseModel):
 class UserResponse(UserBase, MongoBaseModel):
     pass
 
+class UserPreferences(BaseModel):
+    ai_cache_enabled: bool = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # access token lifetime, seconds
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class PasswordChangeRequest(BaseModel):
+    current_password: str
+    new_password: str
 
 # -----------------------------
 # Chat Schemas (End-to-End)
@@ -53,6 +65,10 @@ class ChatResponse(MongoBaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     mood: Optional[str] = "neutral"
 
+class ChatPage(BaseModel):
+    items: List[ChatResponse]
+    next_cursor: Optional[str] = None
+
 # -----------------------------
 # Diary Schemas
 # -----------------------------
@@ -66,9 +82,45 @@ class DiaryResponse(MongoBaseModel):
     text: str
     sentiment: str
     gemini_response: Optional[str] = None
+    reply_status: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     user_id: PyObjectId
 
+class DiaryPage(BaseModel):
+    items: List[DiaryResponse]
+    next_cursor: Optional[str] = None
+
+class DiaryBulkItem(BaseModel):
+    content: str
+    timestamp: Optional[datetime] = None
+
+class DiaryBulkRequest(BaseModel):
+    entries: List[DiaryBulkItem]
+
+class DiaryBulkResponse(BaseModel):
+    inserted: int
+    failed: int = 0
+    sentiments: Dict[str, int]
+
+# -----------------------------
+# Voice Schemas
+# -----------------------------
+class VoiceResponse(MongoBaseModel):
+    audio_text: str
+    timestamp: datetime
+
+class VoicePage(BaseModel):
+    items: List[VoiceResponse]
+    next_cursor: Optional[str] = None
+
+class MoodBucket(BaseModel):
+    start: str  # first day of the bucket, YYYY-MM-DD
+    happy: int = 0
+    sad: int = 0
+    neutral: int = 0
+    total: int = 0
+    avg_score: Optional[float] = None  # happy +1, neutral 0, sad -1
+
 class MoodSummary(BaseModel):
     happy: int
     sad: int
@@ -78,4 +130,9 @@ class MoodSummary(BaseModel):
     dominant_mood: str
     quote: str
     last_10_moods: List[str]
+    granularity: str = "day"
+    start: Optional[str] = None
+    end: Optional[str] = None
+    buckets: List[MoodBucket] = []
+    avg_score: Optional[float] = None
 
@@ -0,0 +1,120 @@
+# backend/serve.py
+"""
+Production entry point: several uvicorn worker processes sharing one socket.
+
+    python serve.py                      # one worker per available CPU
+    python serve.py --workers 4 --port 8000
+
+The uvicorn supervisor replaces a worker that dies and does a rolling
+restart on SIGHUP. On SIGTERM/SIGINT each worker stops accepting
+connections, gives in-flight requests (AI calls, SSE streams, live voice
+sockets) up to SERVE_GRACEFUL_TIMEOUT seconds to finish, then runs the app's
+shutdown (AI reply workers finish their current job, pools close).
+
+Each worker is its own process with its own caches and pools, so totals are
+split before the workers start: see worker_env() and "Production serving"
+in README.md.
+"""
+import argparse
+import logging
+import math
+import os
+from typing import Dict, Optional
+
+from utils.config import settings
+
+logger = logging.getLogger("serve")
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """
+    CPUs granted by a container CPU limit (cgroup v2, then v1), or None when unlimited.
+    """
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+def available_cpus() -> int:
+    """
+    CPUs this process can actually run on: the affinity mask capped by the
+    container quota, not the host's core count.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+def worker_env(workers: int, cpus: int) -> Dict[str, str]:
+    """
+    Per-worker settings derived from service-wide totals. Variables already set
+    in the environment (or .env) are taken as per-worker values and left alone.
+    """
+    cpus_per_worker = max(1, cpus // workers)
+    env = {
+        "MONGO_MAX_POOL_SIZE": max(1, settings.MONGO_POOL_BUDGET // workers),
+        "AI_MAX_CONCURRENCY": math.ceil(settings.AI_MAX_CONCURRENCY / workers),
+        "AI_MAX_CONNECTIONS": math.ceil(settings.AI_MAX_CONNECTIONS / workers),
+        # Each worker runs its own job workers: split the total (0 = none in the API, stays 0)
+        "AI_JOB_WORKERS": math.ceil(settings.AI_JOB_WORKERS / workers),
+        "PASSWORD_HASH_WORKERS": cpus_per_worker,
+        "SENTIMENT_BATCH_WORKERS": cpus_per_worker,
+        "SENTIMENT_TORCH_THREADS": cpus_per_worker,
+    }
+    if not settings.RATE_LIMIT_MONGO:
+        # In-process buckets: each worker enforces its share of the global limit
+        env["RATE_LIMIT_GLOBAL_PER_SECOND"] = settings.RATE_LIMIT_GLOBAL_PER_SECOND / workers
+        env["RATE_LIMIT_GLOBAL_BURST"] = math.ceil(settings.RATE_LIMIT_GLOBAL_BURST / workers)
+    if workers > 1:
+        # Another worker may have recorded newer turns; don't trust a local copy for long
+        env["CHAT_MEMORY_TTL"] = min(settings.CHAT_MEMORY_TTL, 60)
+    return {name: str(value) for name, value in env.items() if name not in os.environ}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--workers", type=int, default=settings.SERVE_WORKERS, help="0 = one per available CPU")
+    parser.add_argument("--host", default=settings.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVE_PORT)
+    parser.add_argument("--graceful-timeout", type=float, default=settings.SERVE_GRACEFUL_TIMEOUT,
+                        help="Seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    cpus = available_cpus()
+    workers = args.workers if args.workers > 0 else cpus
+    overrides = worker_env(workers, cpus)
+    # Workers are spawned processes: they read these when they import utils.config
+    os.environ.update(overrides)
+    logger.info(f"Starting {workers} worker(s) on {cpus} CPU(s); per-worker settings: {overrides}")
+
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# services/admission.py
+"""
+Admission control for the AI-backed endpoints (chat, diary).
+
+Requests are answered early instead of piling up behind a slow model:
+
+- Rate limits: a token bucket per user plus one global bucket. Over either
+  limit is a 429 whose Retry-After is when the bucket refills a token.
+  Buckets live in process by default (each worker enforces the limit on its
+  own); with RATE_LIMIT_MONGO=true they live in `rate_limits` and are shared
+  by every worker, at the cost of one round trip per check.
+- Concurrency: at most AI_MAX_CONCURRENCY model calls run at once and the rest
+  wait in FIFO order. Once the oldest waiter has queued for longer than
+  AI_SHED_QUEUE_WAIT (or AI_MAX_QUEUE are waiting), new requests get a 503
+  with Retry-After before any work is done; a waiter that reaches
+  AI_QUEUE_TIMEOUT gives up the same way. Cache hits never take a slot.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+
+from utils.config import settings
+from utils.metrics import ADMISSION_REJECTED, AI_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+def _retry_after(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+# -----------------------------
+# Token buckets
+# -----------------------------
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1) -> float:
+        """
+        Takes `cost` tokens; returns 0 on success, else seconds until they are available.
+        A cost above the burst only needs a full bucket and leaves it in debt.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+
+class LocalBuckets:
+    """
+    In-process buckets keyed by name. The least recently used bucket is dropped
+    past max_keys; by then it has usually refilled anyway.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, cost: float = 1) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now, cost)
+
+
+class MongoBuckets:
+    """
+    Buckets shared across workers in the `rate_limits` collection. Refill and
+    take happen in one pipeline update, so concurrent workers can't both
+    spend the last token. A bucket document expires once it would be full again.
+    """
+
+    def __init__(self, rate: float, burst: float, collection: str = "rate_limits"):
+        self.rate = rate
+        self.burst = burst
+        self.collection = collection
+        self._index_ready = False
+
+    def _coll(self):
+        from database import db
+        return db[self.collection]
+
+    async def take(self, key: str, cost: float = 1) -> float:
+        coll = self._coll()
+        if not self._index_ready:
+            await coll.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+
+        now = time.time()
+        needed = min(cost, self.burst)
+        elapsed = {"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]}
+        refilled = {"$min": [self.burst, {"$add": [{"$ifNull": ["$tokens", self.burst]}, {"$multiply": [elapsed, self.rate]}]}]}
+        try:
+            doc = await coll.find_one_and_update(
+                {"_id": key},
+                [
+                    {"$set": {"tokens": refilled, "updated": now}},
+                    {"$set": {"allowed": {"$gte": ["$tokens", needed]}}},
+                    {"$set": {
+                        "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                        "expires_at": datetime.utcnow() + timedelta(seconds=(self.burst + cost) / self.rate + 60),
+                    }},
+                ],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception as e:
+            # Fail open: a rate limiter outage shouldn't take the API down with it
+            logger.warning(f"Shared rate limit check failed: {e}")
+            return 0.0
+        if doc["allowed"]:
+            return 0.0
+        return (needed - doc["tokens"]) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, per_user=None, global_bucket=None):
+        self.per_user = per_user
+        self.global_bucket = global_bucket
+
+    async def check(self, user_id, cost: float = 1):
+        """
+        Raises 429 (with Retry-After) when the user or the whole service is over its rate.
+        `cost` weighs a request that does the work of several (a bulk import).
+        """
+        # The user's own bucket first, so one noisy user doesn't drain the global one
+        if self.per_user is not None:
+            wait = await self.per_user.take(f"user:{user_id}", cost)
+            if wait:
+                ADMISSION_REJECTED.inc(("user_rate",))
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, please slow down",
+                    headers=_retry_after(wait),
+                )
+        if self.global_bucket is not None:
+            wait = await self.global_bucket.take("global", cost)
+            if wait:
+                ADMISSION_REJECTED.inc(("global_rate",))
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="The service is busy, please retry shortly",
+                    headers=_retry_after(wait),
+                )
+
+
+# -----------------------------
+# Concurrency gate
+# -----------------------------
+class AIGate:
+    def __init__(self, max_concurrency: int, max_queue: int, shed_wait: float, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.shed_wait = shed_wait
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # waiter -> enqueue time, oldest first
+        self._waiting = OrderedDict()
+        self.in_flight = 0
+
+    def queue_delay(self) -> float:
+        """
+        How long the oldest waiter has been queued (0 when nobody waits).
+        """
+        if not self._waiting:
+            return 0.0
+        return time.monotonic() - next(iter(self._waiting.values()))
+
+    def admit(self):
+        """
+        Sheds a new request up front when the queue is already full or slow.
+        """
+        if len(self._waiting) >= self.max_queue:
+            self._reject("queue_full", self.shed_wait)
+        delay = self.queue_delay()
+        if delay > self.shed_wait:
+            self._reject("queue_wait", delay)
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Holds one of the model-call slots for the duration of the block.
+        """
+        waiter = object()
+        started = time.monotonic()
+        self._waiting[waiter] = started
+        try:
+            # Not wait_for: on 3.11 it can drop a permit that was granted just as
+            # the waiter got cancelled. Semaphore.acquire hands such a permit on.
+            async with asyncio.timeout(self.queue_timeout):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            self._reject("queue_timeout", self.shed_wait)
+        finally:
+            del self._waiting[waiter]
+            AI_QUEUE_WAIT_SECONDS.observe(time.monotonic() - started)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _reject(self, reason: str, retry_after: float):
+        ADMISSION_REJECTED.inc((reason,))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The assistant is busy, please retry shortly",
+            headers=_retry_after(retry_after),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "capacity": self.max_concurrency,
+            "queued": len(self._waiting),
+            "queue_delay_seconds": round(self.queue_delay(), 4),
+        }
+
+
+def _buckets(rate: float, burst: float) -> Optional[object]:
+    if rate <= 0:
+        return None
+    if settings.RATE_LIMIT_MONGO:
+        return MongoBuckets(rate, burst)
+    return LocalBuckets(rate, burst)
+
+rate_limiter = RateLimiter(
+    per_user=_buckets(settings.RATE_LIMIT_USER_PER_MINUTE / 60, settings.RATE_LIMIT_USER_BURST),
+    global_bucket=_buckets(settings.RATE_LIMIT_GLOBAL_PER_SECOND, settings.RATE_LIMIT_GLOBAL_BURST),
+)
+ai_gate = AIGate(
+    settings.AI_MAX_CONCURRENCY,
+    settings.AI_MAX_QUEUE,
+    settings.AI_SHED_QUEUE_WAIT,
+    settings.AI_QUEUE_TIMEOUT,
+)
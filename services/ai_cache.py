@@ -0,0 +1,147 @@
+# services/ai_cache.py
+import hashlib
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+from utils.config import settings
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Key construction
+# -----------------------------
+def normalize_prompt(text: str) -> str:
+    """
+    Lowercases, collapses whitespace and drops trailing punctuation so that
+    "I feel tired!!" and "i feel  tired" share a cache entry.
+    """
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" .!?~")
+
+def cache_key(prompt: str, mood: str) -> str:
+    return hashlib.sha256(f"{mood}|{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# Cache tiers
+# -----------------------------
+class MongoTier:
+    """
+    Shared tier in the `ai_cache` collection; expired documents are removed
+    by a TTL index on `expires_at`.
+    """
+
+    def __init__(self, ttl: float, collection: str = "ai_cache"):
+        self.ttl = ttl
+        self.collection = collection
+        self._index_ready = False
+
+    def _coll(self):
+        from database import db
+        return db[self.collection]
+
+    async def get(self, key: str) -> Optional[str]:
+        doc = await self._coll().find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}}, {"response": 1}
+        )
+        return doc["response"] if doc else None
+
+    async def set(self, key: str, value: str):
+        coll = self._coll()
+        if not self._index_ready:
+            await coll.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+        await coll.update_one(
+            {"_id": key},
+            {"$set": {"response": value, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)}},
+            upsert=True,
+        )
+
+
+class CompletionCache:
+    """
+    Exact-match cache for AI completions keyed on (normalized prompt, mood).
+    Looks in the local LRU first, then the optional shared tier, and keeps
+    hit/miss counters for the metrics endpoint.
+    """
+
+    def __init__(self, local: LRUCache, shared: Optional[MongoTier] = None, max_prompt_chars: int = 200):
+        self.local = local
+        self.shared = shared
+        self.max_prompt_chars = max_prompt_chars
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def cacheable(self, prompt: str) -> bool:
+        # Long, personal entries almost never repeat; only short prompts are worth storing
+        return len(prompt) <= self.max_prompt_chars
+
+    async def get(self, prompt: str, mood: str) -> Optional[str]:
+        key = cache_key(prompt, mood)
+        value = await self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"AI cache shared tier read failed: {e}")
+                value = None
+            if value is not None:
+                self.hits += 1
+                self.shared_hits += 1
+                await self.local.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, prompt: str, mood: str, value: str):
+        key = cache_key(prompt, mood)
+        await self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value)
+            except Exception as e:
+                logger.warning(f"AI cache shared tier write failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.local.evictions,
+            "size": len(self.local),
+        }
+
+
+completion_cache = CompletionCache(
+    local=LRUCache(settings.AI_CACHE_MAX_ENTRIES, settings.AI_CACHE_TTL),
+    shared=MongoTier(settings.AI_CACHE_TTL) if settings.AI_CACHE_MONGO else None,
+    max_prompt_chars=settings.AI_CACHE_MAX_PROMPT_CHARS,
+)
+
+def cache_enabled_for(user: Optional[dict]) -> bool:
+    """
+    Global switch plus the per-user `ai_cache_enabled` preference (default on).
+    """
+    if not settings.AI_CACHE_ENABLED:
+        return False
+    return bool((user or {}).get("ai_cache_enabled", True))
+
+def reply_scope(user: Optional[dict]) -> Optional[str]:
+    """
+    Coalescing scope for a user's AI calls: None (shareable with anyone sending
+    the identical prompt) unless they opted out of shared replies.
+    """
+    if cache_enabled_for(user):
+        return None
+    return str(user["_id"])
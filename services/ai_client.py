@@ -0,0 +1,228 @@
+# services/ai_client.py
+import asyncio
+import json
+import logging
+import random
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from utils.config import settings
+from services.fake_model import FakeGenerativeModel
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Status codes worth another attempt (rate limited / transient upstream failure)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class AIClientError(Exception):
+    """Raised when the Gemini API cannot produce a reply after all retries."""
+
+
+def extract_text(data: dict) -> str:
+    """
+    Pulls the reply text out of a Gemini generateContent payload.
+    """
+    candidates = data.get("candidates", [])
+    if not candidates:
+        return ""
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(p.get("text", "") for p in parts)
+
+def extract_usage(data: dict) -> dict:
+    """
+    Token counts and finish reason of a Gemini payload (only the fields it reports).
+    """
+    usage = {}
+    metadata = data.get("usageMetadata") or {}
+    if "promptTokenCount" in metadata:
+        usage["prompt_tokens"] = metadata["promptTokenCount"]
+    if "candidatesTokenCount" in metadata:
+        usage["output_tokens"] = metadata["candidatesTokenCount"]
+    candidates = data.get("candidates") or [{}]
+    if candidates[0].get("finishReason"):
+        usage["finish_reason"] = candidates[0]["finishReason"]
+    return usage
+
+
+class GeminiClient:
+    """
+    Async Gemini REST client shared by every AI code path.
+
+    One pooled httpx connection (keep-alive, HTTP/2 when `h2` is installed) is
+    reused for all calls, a semaphore caps in-flight requests, and transient
+    failures are retried with jittered exponential backoff. Point
+    GEMINI_API_BASE at a local stub server to exercise it offline.
+    """
+
+    def __init__(
+        self,
+        api_key: str = settings.GEMINI_API_KEY,
+        model: str = settings.GEMINI_MODEL,
+        base_url: str = settings.GEMINI_API_BASE,
+        max_concurrency: int = settings.AI_MAX_CONCURRENCY,
+        max_connections: int = settings.AI_MAX_CONNECTIONS,
+        timeout: float = settings.AI_TIMEOUT,
+        connect_timeout: float = settings.AI_CONNECT_TIMEOUT,
+        max_retries: int = settings.AI_MAX_RETRIES,
+        retry_backoff: float = settings.AI_RETRY_BACKOFF,
+    ):
+        self.model = model
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers={"x-goog-api-key": api_key, "Content-Type": "application/json"},
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            http2=HTTP2_AVAILABLE,
+        )
+
+    def _payload(self, prompt: str, max_output_tokens: Optional[int], temperature: Optional[float]) -> dict:
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        generation_config = {}
+        if max_output_tokens is not None:
+            generation_config["maxOutputTokens"] = max_output_tokens
+        if temperature is not None:
+            generation_config["temperature"] = temperature
+        if generation_config:
+            payload["generationConfig"] = generation_config
+        return payload
+
+    async def _backoff(self, attempt: int):
+        # Full jitter: sleep somewhere in [0, base * 2^attempt]
+        await asyncio.sleep(random.uniform(0, self.retry_backoff * (2 ** attempt)))
+
+    async def generate(
+        self,
+        prompt: str,
+        max_output_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        usage: Optional[dict] = None,
+    ) -> str:
+        """
+        Returns the full reply text for a prompt. `usage`, when given, is filled
+        with the reported token counts and finish reason (see extract_usage).
+        """
+        url = f"/models/{self.model}:generateContent"
+        payload = self._payload(prompt, max_output_tokens, temperature)
+        last_error = None
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._http.post(url, json=payload)
+                    if response.status_code in RETRYABLE_STATUS:
+                        last_error = AIClientError(f"Gemini returned {response.status_code}")
+                    else:
+                        response.raise_for_status()
+                        data = response.json()
+                        if usage is not None:
+                            usage.update(extract_usage(data))
+                        return extract_text(data).strip()
+                except httpx.TransportError as e:
+                    last_error = e
+                except httpx.HTTPStatusError as e:
+                    raise AIClientError(str(e)) from e
+
+                if attempt < self.max_retries:
+                    logger.warning(f"Gemini attempt {attempt + 1} failed ({last_error}), retrying")
+                    await self._backoff(attempt)
+
+        raise AIClientError(f"Gemini request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def stream(
+        self,
+        prompt: str,
+        max_output_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        usage: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yields reply text chunks as Gemini produces them (SSE transport).
+        Retries only happen before the first chunk has been yielded.
+        `usage` is updated from each event; the last one carries the totals.
+        """
+        url = f"/models/{self.model}:streamGenerateContent"
+        payload = self._payload(prompt, max_output_tokens, temperature)
+        last_error = None
+        sent_any = False
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self._http.stream("POST", url, params={"alt": "sse"}, json=payload) as response:
+                        if response.status_code in RETRYABLE_STATUS:
+                            last_error = AIClientError(f"Gemini returned {response.status_code}")
+                        else:
+                            if response.status_code >= 400:
+                                await response.aread()
+                                response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = json.loads(line[5:])
+                                if usage is not None:
+                                    usage.update(extract_usage(data))
+                                text = extract_text(data)
+                                if text:
+                                    sent_any = True
+                                    yield text
+                            return
+                except httpx.TransportError as e:
+                    if sent_any:
+                        # A retry would replay the reply from the start
+                        raise AIClientError(f"Gemini stream broke off mid-reply: {e}") from e
+                    last_error = e
+                except httpx.HTTPStatusError as e:
+                    raise AIClientError(str(e)) from e
+
+                if attempt < self.max_retries:
+                    logger.warning(f"Gemini stream attempt {attempt + 1} failed ({last_error}), retrying")
+                    await self._backoff(attempt)
+
+        raise AIClientError(f"Gemini stream failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+# -----------------------------
+# Shared client instance
+# -----------------------------
+_client = None
+
+def get_ai_client():
+    """
+    Returns the process-wide AI client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        if settings.GEMINI_FAKE_MODEL:
+            _client = FakeGenerativeModel(chunk_delay=settings.GEMINI_FAKE_CHUNK_DELAY_MS / 1000)
+        else:
+            _client = GeminiClient()
+    return _client
+
+async def warm_up_ai_client():
+    """
+    Builds the client (TLS context, connection pool) off the event loop.
+    """
+    await asyncio.get_running_loop().run_in_executor(None, get_ai_client)
+
+async def close_ai_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
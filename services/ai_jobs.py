@@ -0,0 +1,238 @@
+# services/ai_jobs.py
+"""
+Mongo-backed job queue that fills in AI replies after a diary entry has
+already been stored (`reply_status: pending`).
+
+Jobs live in `ai_reply_jobs` with the diary entry id as `_id`, so enqueueing
+the same entry twice is a no-op. Workers claim jobs with an atomic
+find_one_and_update and a lease; a crashed worker's lease simply expires and
+the job is picked up again. Failed attempts are retried with backoff up to
+AI_JOB_MAX_ATTEMPTS, after which the entry gets the fallback reply.
+
+Storing the entry and enqueueing its job are two writes. If the process dies
+(or the enqueue fails) in between, the entry would stay pending forever, so
+the sweeper re-enqueues pending entries older than AI_JOB_SWEEP_INTERVAL;
+enqueueing is idempotent, so entries that do have a job are left alone.
+
+Workers run inside the API process (AI_JOB_WORKERS) and/or standalone:
+
+    python -m services.ai_jobs --workers 4
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from utils.config import settings
+from services.gemini_service import generate_ai_response, FALLBACK_REPLY
+
+logger = logging.getLogger(__name__)
+
+JOBS = "ai_reply_jobs"
+
+# Wakes idle in-process workers as soon as something is enqueued
+_wakeup = asyncio.Event()
+# entry_id -> [Event set when that entry's reply is written by this process, number of waiters]
+_waiters: Dict[str, list] = {}
+
+async def enqueue_reply_job(db, entry: dict, use_cache: bool):
+    """
+    Queues an AI reply for a stored diary entry. Idempotent per entry.
+    """
+    now = datetime.utcnow()
+    await db[JOBS].update_one(
+        {"_id": entry["_id"]},
+        {"$setOnInsert": {
+            "user_id": entry["user_id"],
+            "prompt": entry["text"],
+            "mood": entry["sentiment"],
+            "use_cache": use_cache,
+            "status": "queued",
+            "attempts": 0,
+            "available_at": now,
+            "created_at": now,
+        }},
+        upsert=True,
+    )
+    _wakeup.set()
+
+async def claim_job(db) -> Optional[dict]:
+    """
+    Atomically takes the oldest runnable job (queued, or running with an expired lease).
+    """
+    now = datetime.utcnow()
+    return await db[JOBS].find_one_and_update(
+        {"$or": [
+            {"status": "queued", "available_at": {"$lte": now}},
+            {"status": "running", "locked_until": {"$lt": now}},
+        ]},
+        {
+            "$set": {"status": "running", "locked_until": now + timedelta(seconds=settings.AI_JOB_LEASE_SECONDS)},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+async def _complete(db, job: dict, reply: str, status: str):
+    # Only a still-pending entry is updated, so a duplicate run can't overwrite a finished reply
+    await db["diary_entries"].update_one(
+        {"_id": job["_id"], "reply_status": "pending"},
+        {"$set": {"gemini_response": reply, "reply_status": status}},
+    )
+    await db[JOBS].update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": status, "finished_at": datetime.utcnow()}, "$unset": {"locked_until": ""}},
+    )
+    waiter = _waiters.pop(str(job["_id"]), None)
+    if waiter is not None:
+        waiter[0].set()
+
+async def process_job(db, job: dict):
+    try:
+        reply = await generate_ai_response(
+            job["prompt"], job["mood"], use_cache=job["use_cache"], fallback=False,
+            share_scope=None if job["use_cache"] else str(job["user_id"]), endpoint="diary",
+        )
+    except Exception as e:
+        if job["attempts"] >= settings.AI_JOB_MAX_ATTEMPTS:
+            logger.error(f"AI reply job {job['_id']} failed permanently: {e}")
+            await _complete(db, job, FALLBACK_REPLY, "failed")
+            return
+        delay = random.uniform(0, settings.AI_RETRY_BACKOFF * (2 ** job["attempts"]))
+        logger.warning(f"AI reply job {job['_id']} attempt {job['attempts']} failed ({e}), retrying in {delay:.1f}s")
+        await db[JOBS].update_one(
+            {"_id": job["_id"]},
+            {"$set": {
+                "status": "queued",
+                "available_at": datetime.utcnow() + timedelta(seconds=delay),
+                "last_error": str(e),
+            }, "$unset": {"locked_until": ""}},
+        )
+        return
+
+    await _complete(db, job, reply, "done")
+
+async def sweep_pending(db, older_than: float = settings.AI_JOB_SWEEP_INTERVAL, limit: int = 500) -> int:
+    """
+    Enqueues a job for every pending entry older than `older_than` seconds that
+    has none; returns how many were re-queued.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    entries = await db["diary_entries"].find(
+        {"reply_status": "pending", "timestamp": {"$lt": cutoff}},
+        {"user_id": 1, "text": 1, "sentiment": 1},
+    ).limit(limit).to_list(length=limit)
+    if not entries:
+        return 0
+
+    queued = {job["_id"] async for job in db[JOBS].find({"_id": {"$in": [e["_id"] for e in entries]}}, {"_id": 1})}
+    orphans = [entry for entry in entries if entry["_id"] not in queued]
+    for entry in orphans:
+        # The user's cache preference isn't stored with the entry: keep the reply private
+        await enqueue_reply_job(db, entry, use_cache=False)
+    if orphans:
+        logger.warning(f"Re-queued AI replies for {len(orphans)} pending diary entries without a job")
+    return len(orphans)
+
+async def run_sweeper(db, stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            await sweep_pending(db)
+        except Exception as e:
+            logger.error(f"AI reply sweeper failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.AI_JOB_SWEEP_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_worker(db, stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            job = await claim_job(db)
+        except Exception as e:
+            logger.error(f"AI reply worker could not claim a job: {e}")
+            job = None
+
+        if job is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.AI_JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        try:
+            await process_job(db, job)
+        except Exception as e:
+            # Lease expiry will hand the job to another attempt
+            logger.error(f"AI reply job {job['_id']} crashed: {e}")
+
+# -----------------------------
+# In-process worker pool
+# -----------------------------
+_stop = asyncio.Event()
+_tasks: List[asyncio.Task] = []
+
+def start_workers(db, count: int = settings.AI_JOB_WORKERS):
+    _stop.clear()
+    for _ in range(count):
+        _tasks.append(asyncio.create_task(run_worker(db, _stop)))
+    if count:
+        _tasks.append(asyncio.create_task(run_sweeper(db, _stop)))
+        logger.info(f"Started {count} AI reply workers")
+
+async def stop_workers():
+    """
+    Lets running jobs finish; anything still queued stays in Mongo for the next start.
+    """
+    _stop.set()
+    _wakeup.set()
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
+        _tasks.clear()
+
+async def wait_for_reply(entry_id: str, timeout: float) -> bool:
+    """
+    Waits until this process writes the reply for `entry_id` (or timeout).
+    Replies written by other processes are picked up by the caller re-reading Mongo.
+    """
+    waiter = _waiters.get(entry_id)
+    if waiter is None:
+        waiter = _waiters[entry_id] = [asyncio.Event(), 0]
+    waiter[1] += 1
+    try:
+        await asyncio.wait_for(waiter[0].wait(), timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        # The last waiter to leave cleans up, unless _complete already did
+        waiter[1] -= 1
+        if waiter[1] == 0 and _waiters.get(entry_id) is waiter:
+            del _waiters[entry_id]
+
+
+if __name__ == "__main__":
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(description="Run AI reply workers against the Mongo job queue")
+    parser.add_argument("--workers", type=int, default=max(1, settings.AI_JOB_WORKERS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    async def _main():
+        from database import db
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, _stop.set)
+        start_workers(db, args.workers)
+        await _stop.wait()
+        await stop_workers()
+
+    asyncio.run(_main())
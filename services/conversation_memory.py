@@ -0,0 +1,215 @@
+# services/conversation_memory.py
+"""
+Per-user chat memory: the last CHAT_MEMORY_TURNS turns verbatim plus a rolling
+summary of everything older, fitted into CHAT_CONTEXT_TOKENS when a prompt is built.
+
+Memories live in an in-process LRU (CHAT_MEMORY_TTL), so follow-up messages build
+their prompt without a database read. On a miss the memory is rebuilt from the
+persisted summary (`conversation_summaries`) plus a capped read of the newest
+`moods` turns recorded after it (the write buffer is flushed first, so turns
+still queued aren't missed). With several workers each keeps its own copy;
+the TTL bounds how long a worker can miss turns recorded by another one.
+"""
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+
+from services.prompts import ASSISTANT, build_prompt, complete, estimate_tokens
+from services.write_buffer import write_buffer
+from utils.cache import LRUCache
+from utils.config import settings
+from utils.pagination import PAGE_SORT
+
+logger = logging.getLogger(__name__)
+
+SUMMARIES = "conversation_summaries"
+TURN_PROJECTION = {"user_message": 1, "bot_response": 1, "mood": 1, "timestamp": 1}
+
+def _clip(text: str, chars: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= chars else text[:chars - 1].rstrip() + "…"
+
+def summary_line(turn: dict) -> str:
+    return f"- ({turn.get('mood', 'neutral')}) User: {_clip(turn['user_message'], 160)} | You: {_clip(turn['bot_response'], 120)}"
+
+def trim_summary(summary: str, max_tokens: int) -> str:
+    """
+    Keeps the newest part of the summary that fits max_tokens (drops whole lines first).
+    """
+    if max_tokens <= 0 or not summary:
+        return ""
+    lines = summary.splitlines()
+    while lines and estimate_tokens("\n".join(lines)) > max_tokens:
+        if len(lines) == 1:
+            return lines[0][-max_tokens * 4:]
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """
+    One user's recent turns (oldest first) and the summary of the turns before them.
+    """
+
+    def __init__(self, summary: str = "", summarized_through: Optional[datetime] = None,
+                 max_turns: int = settings.CHAT_MEMORY_TURNS,
+                 summary_max_tokens: int = settings.CHAT_SUMMARY_MAX_TOKENS):
+        self.turns = deque()
+        self.summary = summary
+        self.summarized_through = summarized_through
+        self.max_turns = max_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.version = 0
+
+    @property
+    def empty(self) -> bool:
+        return not self.turns and not self.summary
+
+    def add(self, turn: dict) -> List[dict]:
+        """
+        Appends a turn; turns pushed out of the window are folded into the
+        summary (one line each) and returned.
+        """
+        self.turns.append(turn)
+        folded = []
+        while len(self.turns) > self.max_turns:
+            folded.append(self.turns.popleft())
+        if folded:
+            lines = ([self.summary] if self.summary else []) + [summary_line(t) for t in folded]
+            self.summary = trim_summary("\n".join(lines), self.summary_max_tokens)
+            self.summarized_through = folded[-1]["timestamp"]
+            self.version += 1
+        return folded
+
+    def context(self, budget: int) -> str:
+        """
+        As much of the memory as fits `budget` tokens, for the chat prompt: newest
+        turns first, with up to half of the budget reserved for the summary.
+        """
+        remaining = budget
+        summary = trim_summary(self.summary, min(estimate_tokens(self.summary), remaining // 2))
+        remaining -= estimate_tokens(summary)
+
+        recent = []
+        for turn in reversed(self.turns):
+            lines = f"User: {turn['user_message']}\n{ASSISTANT}: {turn['bot_response']}"
+            cost = estimate_tokens(lines)
+            if cost > remaining:
+                break
+            recent.append(lines)
+            remaining -= cost
+
+        parts = []
+        if summary:
+            parts.append(f"Summary of earlier conversation:\n{summary}")
+        if recent:
+            parts.append("Previous conversation:\n" + "\n".join(reversed(recent)))
+        return "\n\n".join(parts)
+
+
+class ConversationStore:
+    """
+    LRU of ConversationMemory objects keyed by user id, backed by Mongo on a miss.
+    """
+
+    def __init__(self, cache: LRUCache, load_limit: int = settings.CHAT_MEMORY_LOAD_LIMIT,
+                 model_summaries: bool = settings.CHAT_SUMMARY_MODEL):
+        self.cache = cache
+        self.load_limit = load_limit
+        self.model_summaries = model_summaries
+        self.hits = 0
+        self.misses = 0
+        self.summaries_written = 0
+        self._tasks = set()
+
+    async def get(self, db, user_id) -> ConversationMemory:
+        key = str(user_id)
+        memory = await self.cache.get(key)
+        if memory is not None:
+            self.hits += 1
+            return memory
+        self.misses += 1
+        memory = await self._load(db, user_id)
+        await self.cache.set(key, memory)
+        return memory
+
+    async def _load(self, db, user_id) -> ConversationMemory:
+        if write_buffer.queued:
+            # Chat turns are written behind the response: make sure the recent ones are stored
+            await write_buffer.flush()
+        saved = await db[SUMMARIES].find_one({"_id": user_id}) or {}
+        memory = ConversationMemory(saved.get("summary", ""), saved.get("through"))
+
+        query = {"user_id": user_id}
+        if memory.summarized_through is not None:
+            query["timestamp"] = {"$gt": memory.summarized_through}
+        # Newest turns only; anything older than load_limit is not worth a scan
+        docs = await db["moods"].find(query, TURN_PROJECTION).sort(PAGE_SORT).limit(self.load_limit).to_list(length=self.load_limit)
+
+        folded = []
+        for doc in reversed(docs):
+            folded += memory.add(doc)
+        if folded:
+            await self._save_summary(db, user_id, memory)
+        return memory
+
+    async def record_turn(self, db, user_id, turn: dict):
+        """
+        Adds a just-stored turn to the cached memory. Without a cached memory there
+        is nothing to do: the next get() loads the turn from `moods`.
+        """
+        memory = await self.cache.get(str(user_id))
+        if memory is None or any(t.get("_id") == turn.get("_id") for t in memory.turns):
+            return
+        previous_summary = memory.summary
+        folded = memory.add(turn)
+        if not folded:
+            return
+        await self._save_summary(db, user_id, memory)
+        if self.model_summaries:
+            task = asyncio.create_task(self._summarize_with_model(db, user_id, memory, previous_summary, folded))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _save_summary(self, db, user_id, memory: ConversationMemory):
+        await db[SUMMARIES].update_one(
+            {"_id": user_id},
+            {"$set": {"summary": memory.summary, "through": memory.summarized_through, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        self.summaries_written += 1
+
+    async def _summarize_with_model(self, db, user_id, memory: ConversationMemory, previous: str, folded: List[dict]):
+        """
+        Off the request path: asks the model to merge the folded turns into the
+        previous summary. The line-based summary stays in place if this fails
+        or if another fold happened in the meantime.
+        """
+        version = memory.version
+        prompt = build_prompt(
+            "summary", "\n".join(summary_line(t) for t in folded),
+            context=f"Summary so far:\n{previous or '(empty)'}", max_output_tokens=memory.summary_max_tokens,
+        )
+        try:
+            summary = await complete(prompt)
+        except Exception as e:
+            logger.warning(f"Conversation summary update failed: {e}")
+            return
+        if summary and memory.version == version:
+            memory.summary = trim_summary(summary.strip(), memory.summary_max_tokens)
+            await self._save_summary(db, user_id, memory)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "summaries_written": self.summaries_written,
+            "size": len(self.cache),
+        }
+
+
+conversation_memory = ConversationStore(LRUCache(settings.CHAT_MEMORY_MAX_USERS, settings.CHAT_MEMORY_TTL))
@@ -0,0 +1,45 @@
+# services/fake_model.py
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for the Gemini client (same generate/stream interface).
+    Echoes the end of the prompt (where the user's message is) back in small
+    chunks, sleeping between them so time-to-first-byte can be measured
+    without a network connection. One chunk counts as one output token for
+    max_output_tokens and `usage`.
+    """
+
+    def __init__(self, chunks: Optional[List[str]] = None, chunk_delay: float = 0.05, echo_words: int = 30):
+        self.chunks = chunks
+        self.chunk_delay = chunk_delay
+        self.echo_words = echo_words
+
+    def _chunks_for(self, prompt: str, max_output_tokens: Optional[int], usage: Optional[dict]) -> List[str]:
+        chunks = self.chunks
+        if chunks is None:
+            chunks = [w + " " for w in f"I hear you. You said: {' '.join(prompt.split()[-self.echo_words:])}".split(" ")]
+        truncated = max_output_tokens is not None and len(chunks) > max_output_tokens
+        if truncated:
+            chunks = chunks[:max_output_tokens]
+        if usage is not None:
+            usage.update(prompt_tokens=(len(prompt) + 3) // 4, output_tokens=len(chunks),
+                         finish_reason="MAX_TOKENS" if truncated else "STOP")
+        return chunks
+
+    async def generate(self, prompt: str, max_output_tokens: Optional[int] = None, temperature: Optional[float] = None,
+                       usage: Optional[dict] = None) -> str:
+        chunks = self._chunks_for(prompt, max_output_tokens, usage)
+        await asyncio.sleep(self.chunk_delay * len(chunks))
+        return "".join(chunks)
+
+    async def stream(self, prompt: str, max_output_tokens: Optional[int] = None, temperature: Optional[float] = None,
+                     usage: Optional[dict] = None) -> AsyncIterator[str]:
+        for chunk in self._chunks_for(prompt, max_output_tokens, usage):
+            await asyncio.sleep(self.chunk_delay)
+            yield chunk
+
+    async def aclose(self):
+        pass
@@ -1,22 +1,99 @@
-import google.generativeai as genai
+from fastapi import HTTPException
+from services.admission import ai_gate
+from services.ai_cache import completion_cache
+from services.prompts import Prompt, build_prompt, complete, stream
+from utils.metrics import stage, STAGE_SECONDS
+from utils.singleflight import SingleFlight
 from utils.config import settings
-import os
-import anyio
+from typing import AsyncIterator, Optional
+import logging
+import time
 
-# Initialize Gemini SDK
-genai.configure(api_key=settings.GEMINI_API_KEY)
+logger = logging.getLogger(__name__)
 
-async def generate_ai_response(user_message: str) -> str:
+FALLBACK_REPLY = "I'm having trouble connecting to my brain right now. Please try again later."
+
+# Identical concurrent prompts (retries, several tabs) share one model call
+ai_flights = SingleFlight(settings.COALESCE_WINDOW, enabled=settings.COALESCE_ENABLED)
+ai_stream_flights = SingleFlight(settings.COALESCE_WINDOW, enabled=settings.COALESCE_ENABLED)
+
+async def generate_ai_response(user_message: str, mood: Optional[str] = None, use_cache: bool = False, fallback: bool = True, context: str = "", share_scope: Optional[str] = None, endpoint: str = "chat") -> str:
     """
-    Generates a response from Gemini AI based on the user's message.
+    Generates a response from Gemini AI to the user's message, using the mood-conditioned
+    prompt and output budget of `endpoint` ("chat" or "diary", see services.prompts).
+    With use_cache=True (and a detected mood) repeated prompts are served from the completion cache.
+    With fallback=False errors are raised instead of returning the apology text (used by retrying jobs).
+    `context` (e.g. the conversation memory) goes into the prompt; such replies are never cached.
+    Concurrent calls with the same prompt and `share_scope` (see reply_scope) share one reply.
     """
+    prompt = build_prompt(endpoint, user_message, mood, context)
+    use_cache = use_cache and not context
+    key = (share_scope, prompt.text, fallback)
+    return await ai_flights.do(key, lambda: _generate_reply(prompt, user_message, mood, use_cache, fallback))
+
+async def _generate_reply(prompt: Prompt, user_message: str, mood: Optional[str], use_cache: bool, fallback: bool) -> str:
+    use_cache = use_cache and mood is not None and completion_cache.cacheable(user_message)
+    if use_cache:
+        cached = await completion_cache.get(user_message, prompt.cache_scope)
+        if cached is not None:
+            return cached
+
     try:
-        model = genai.GenerativeModel('gemini-2.0-flash-001')
-        # Wrapping synchronous call in a thread to prevent blocking
-        response = await anyio.to_thread.run_sync(model.generate_content, user_message)
-        if response and response.text:
-            return response.text
+        async with ai_gate.slot():
+            with stage("ai"):
+                reply = await complete(prompt)
+        if reply:
+            if use_cache:
+                await completion_cache.set(user_message, prompt.cache_scope, reply)
+            return reply
         return "I'm sorry, I couldn't generate a response."
+    except HTTPException:
+        # Shed while queued for a slot: let the endpoint answer 503
+        raise
+    except Exception as e:
+        if not fallback:
+            raise
+        logger.error(f"Gemini AI Error: {e}")
+        return FALLBACK_REPLY
+
+async def stream_ai_response(user_message: str, mood: Optional[str] = None, use_cache: bool = False, context: str = "", share_scope: Optional[str] = None, endpoint: str = "chat") -> AsyncIterator[str]:
+    """
+    Yields text chunks from Gemini AI as soon as the model produces them (prompt and budget as in generate_ai_response).
+    A cache hit is sent as a single chunk; a completed miss is written back to the cache.
+    The response has already started, so a queue timeout yields the fallback text like any other error.
+    Concurrent streams of the same prompt and `share_scope` are fed by one model call.
+    """
+    prompt = build_prompt(endpoint, user_message, mood, context)
+    use_cache = use_cache and not context
+    key = (share_scope, prompt.text)
+    async for text in ai_stream_flights.stream(key, lambda: _stream_reply(prompt, user_message, mood, use_cache)):
+        yield text
+
+async def _stream_reply(prompt: Prompt, user_message: str, mood: Optional[str], use_cache: bool) -> AsyncIterator[str]:
+    use_cache = use_cache and mood is not None and completion_cache.cacheable(user_message)
+    if use_cache:
+        cached = await completion_cache.get(user_message, prompt.cache_scope)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    started = time.perf_counter()
+    try:
+        async with ai_gate.slot():
+            async for text in stream(prompt):
+                if not parts:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, ("ai_first_chunk",))
+                parts.append(text)
+                yield text
     except Exception as e:
-        print(f"Gemini AI Error: {e}")
-        return "I'm having trouble connecting to my brain right now. Please try again later."
+        logger.error(f"Gemini AI Stream Error: {e}")
+        if not parts:
+            yield FALLBACK_REPLY
+        return
+
+    STAGE_SECONDS.observe(time.perf_counter() - started, ("ai_stream",))
+    if not parts:
+        yield "I'm sorry, I couldn't generate a response."
+    elif use_cache:
+        await completion_cache.set(user_message, prompt.cache_scope, "".join(parts))
@@ -0,0 +1,208 @@
+# services/mood_rollups.py
+"""
+Per-user, per-day mood counters kept in `mood_daily_rollups`.
+
+Every diary insert bumps one rollup document with an `$inc` upsert, so the
+mood board reads at most one document per day instead of scanning entries.
+Longer-range analytics (quarters, years, custom ranges bucketed by day, week
+or month) sum these rollups per bucket. Existing data can be backfilled with:
+
+    python -m services.mood_rollups [--user <user_id>]
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+
+from utils.config import settings
+from utils.singleflight import SingleFlight
+
+MOODS = ("happy", "sad", "neutral")
+GRANULARITIES = ("day", "week", "month")
+RECENT_PER_DAY = 10
+ROLLUPS = "mood_daily_rollups"
+
+# Mood-board reads keyed by (user_id, params...); a user's new moods drop their entries
+mood_board_flights = SingleFlight(settings.COALESCE_WINDOW, enabled=settings.COALESCE_ENABLED)
+
+def forget_mood_board(user_id):
+    mood_board_flights.discard(lambda key: key[0] == user_id)
+
+def mood_key(sentiment: str) -> str:
+    sentiment = (sentiment or "").lower()
+    return sentiment if sentiment in MOODS else "neutral"
+
+def day_key(timestamp: datetime) -> str:
+    return timestamp.strftime("%Y-%m-%d")
+
+def _rollup_update(sentiments: List[Tuple[datetime, str]]) -> dict:
+    counts = defaultdict(int)
+    for _, sentiment in sentiments:
+        counts[mood_key(sentiment)] += 1
+    return {
+        "$inc": dict(counts),
+        # Newest sentiments of the day, capped, so "last 10 moods" needs no entry scan
+        "$push": {"recent": {
+            "$each": [{"t": t, "s": s} for t, s in sentiments],
+            "$sort": {"t": 1},
+            "$slice": -RECENT_PER_DAY,
+        }},
+    }
+
+async def record_mood(db, user_id, sentiment: str, timestamp: datetime):
+    """
+    Adds one diary entry's sentiment to its day's rollup document.
+    """
+    await db[ROLLUPS].update_one(
+        {"user_id": user_id, "day": day_key(timestamp)},
+        _rollup_update([(timestamp, sentiment)]),
+        upsert=True,
+    )
+    forget_mood_board(user_id)
+
+async def record_moods_bulk(db, user_id, entries: Iterable[Tuple[datetime, str]]):
+    """
+    Adds many (timestamp, sentiment) pairs with one upsert per touched day in a single bulk_write.
+    """
+    await record_moods_batch(db, [(user_id, timestamp, sentiment) for timestamp, sentiment in entries])
+
+async def record_moods_batch(db, entries: Iterable[Tuple[object, datetime, str]]):
+    """
+    Same for (user_id, timestamp, sentiment) triples from any number of users.
+    """
+    by_day = defaultdict(list)
+    for user_id, timestamp, sentiment in entries:
+        by_day[(user_id, day_key(timestamp))].append((timestamp, sentiment))
+    if not by_day:
+        return
+
+    await db[ROLLUPS].bulk_write([
+        UpdateOne({"user_id": user_id, "day": day}, _rollup_update(items), upsert=True)
+        for (user_id, day), items in by_day.items()
+    ], ordered=False)
+    for user_id in {user_id for user_id, _ in by_day}:
+        forget_mood_board(user_id)
+
+def bucket_start(day: str, granularity: str) -> str:
+    """
+    First day of the bucket holding `day`: itself, its week's Monday or its
+    month's 1st. A bucket may start before the requested range.
+    """
+    if granularity == "month":
+        return day[:8] + "01"
+    if granularity == "week":
+        d = datetime.strptime(day, "%Y-%m-%d")
+        return day_key(d - timedelta(days=d.weekday()))
+    return day
+
+async def get_mood_analytics(db, user_id, start_day: str, end_day: str, granularity: str = "day") -> List[dict]:
+    """
+    Mood buckets between two day keys (inclusive), oldest first:
+    [{"start": "YYYY-MM-DD", happy, sad, neutral, total, avg_score}], where
+    avg_score is the mean mood in [-1, 1] (happy +1, neutral 0, sad -1).
+    Weeks start on Monday. A range holds at most a year of daily rollups,
+    so they are summed here rather than in an aggregation pipeline.
+    """
+    cursor = db[ROLLUPS].find(
+        {"user_id": user_id, "day": {"$gte": start_day, "$lte": end_day}},
+        {"_id": 0, "day": 1, **{mood: 1 for mood in MOODS}},
+    ).sort("day", 1)
+    counts = {}
+    async for doc in cursor:
+        bucket = counts.setdefault(bucket_start(doc["day"], granularity), dict.fromkeys(MOODS, 0))
+        for mood in MOODS:
+            bucket[mood] += doc.get(mood, 0)
+
+    buckets = []
+    for start, bucket in counts.items():
+        total = sum(bucket.values())
+        buckets.append({
+            "start": start,
+            **bucket,
+            "total": total,
+            "avg_score": (bucket["happy"] - bucket["sad"]) / total if total else None,
+        })
+    return buckets
+
+async def get_recent_moods(db, user_id, start_day: str, end_day: str, limit: int = RECENT_PER_DAY) -> List[str]:
+    """
+    The user's newest `limit` sentiments in the range, newest first.
+    Each rollup keeps its day's last RECENT_PER_DAY, so `limit` days are always enough.
+    """
+    cursor = db[ROLLUPS].find(
+        {"user_id": user_id, "day": {"$gte": start_day, "$lte": end_day}},
+        {"_id": 0, "recent": 1},
+    ).sort("day", -1).limit(limit)
+    moods = []
+    async for doc in cursor:
+        moods.extend(item["s"] for item in reversed(doc.get("recent", [])))
+        if len(moods) >= limit:
+            break
+    return moods[:limit]
+
+async def rebuild_rollups(db, user_id: Optional[ObjectId] = None, batch_size: int = 1000) -> int:
+    """
+    Recomputes rollups from `diary_entries` (for one user or everyone).
+    Returns the number of rollup documents written.
+
+    Rollups are replaced in place, one upsert per (user, day), and only then
+    are the days that no longer have entries deleted, so the mood board never
+    reads an empty or half-written collection and a failure midway leaves
+    every rollup either old or rebuilt. Days first written while the rebuild
+    runs are not in the snapshot and are left alone.
+    """
+    match = {"user_id": user_id} if user_id is not None else {}
+    existing = {(doc["user_id"], doc["day"]): doc["_id"] async for doc in db[ROLLUPS].find(match, {"user_id": 1, "day": 1})}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+            },
+            "recent": {"$push": {"t": "$timestamp", "s": "$sentiment"}},
+        }},
+    ]
+
+    written, batch = 0, []
+    async for group in db["diary_entries"].aggregate(pipeline):
+        doc = {"user_id": group["_id"]["user_id"], "day": group["_id"]["day"]}
+        for mood in MOODS:
+            doc[mood] = 0
+        for item in group["recent"]:
+            doc[mood_key(item["s"])] += 1
+        doc["recent"] = group["recent"][-RECENT_PER_DAY:]
+        existing.pop((doc["user_id"], doc["day"]), None)
+        batch.append(ReplaceOne({"user_id": doc["user_id"], "day": doc["day"]}, doc, upsert=True))
+        if len(batch) >= batch_size:
+            await db[ROLLUPS].bulk_write(batch, ordered=False)
+            written, batch = written + len(batch), []
+    if batch:
+        await db[ROLLUPS].bulk_write(batch, ordered=False)
+        written += len(batch)
+
+    # Whatever is left of the snapshot has no diary entries any more
+    stale = list(existing.values())
+    for start in range(0, len(stale), batch_size):
+        await db[ROLLUPS].delete_many({"_id": {"$in": stale[start:start + batch_size]}})
+    mood_board_flights.discard(lambda key: user_id is None or key[0] == user_id)
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Rebuild mood_daily_rollups from diary_entries")
+    parser.add_argument("--user", help="Only rebuild this user id")
+    args = parser.parse_args()
+
+    async def _main():
+        from database import db
+        written = await rebuild_rollups(db, ObjectId(args.user) if args.user else None)
+        print(f"Wrote {written} rollup documents")
+
+    asyncio.run(_main())
@@ -0,0 +1,187 @@
+# services/prompts.py
+"""
+Prompt construction and output budgets for every model call.
+
+Chat and diary replies (direct, streamed or from the background job queue)
+and conversation summaries all build their prompt here:
+
+- a system preamble naming the task and conditioned on the detected mood;
+- optional context (the chat memory's summary and recent turns);
+- the user's text and the assistant cue.
+
+Each endpoint has an output budget sent as maxOutputTokens, and the preamble
+asks for about half of it in words, so replies end on their own before the
+cap instead of being cut off by it. A reply that still hits the cap is
+trimmed back to its last complete sentence (non-streamed calls only).
+
+`complete` and `stream` send a Prompt through the shared AI client and record,
+per call and endpoint: latency, prompt and output tokens (Gemini's
+usageMetadata, or an estimate when the backend doesn't report it) and whether
+the budget cut the reply short (ai_call_duration_seconds, ai_tokens_total,
+ai_calls_total on /metrics).
+
+The user's name is deliberately not part of the prompt: first-message replies
+are shared between users through the completion cache and request coalescing.
+"""
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+from services.ai_client import get_ai_client
+from utils.config import settings
+from utils.metrics import AI_CALL_SECONDS, AI_CALLS, AI_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Part of every completion cache key: bump it when the templates change so old replies aren't served
+PROMPT_VERSION = 1
+
+ASSISTANT = "Antigravity"
+
+MOOD_GUIDANCE = {
+    "happy": "They seem happy: share their good mood and encourage them to hold on to what went well.",
+    "sad": "They seem sad: acknowledge the feeling first and be gentle. Offer at most one small, practical step and don't rush to cheer them up.",
+    "neutral": "Their mood seems neutral: be warm and curious, and invite them to reflect a little further.",
+}
+
+ENDPOINTS = {
+    "chat": {
+        "task": "You are chatting with the user. Reply to their latest message.",
+        "message": "User: {message}",
+        "max_output_tokens": settings.AI_OUTPUT_TOKENS_CHAT,
+        "temperature": settings.AI_TEMPERATURE,
+    },
+    "diary": {
+        "task": "The user has just written a journal entry. Respond to it with empathy; add a wellness tip only if it fits.",
+        "message": "Journal entry:\n{message}",
+        "max_output_tokens": settings.AI_OUTPUT_TOKENS_DIARY,
+        "temperature": settings.AI_TEMPERATURE,
+    },
+    "summary": {
+        "task": (
+            "Update the running summary of a conversation between a user and a supportive journaling "
+            "assistant so it also covers the new turns. Keep names, feelings and open topics."
+        ),
+        "message": "New turns:\n{message}",
+        "max_output_tokens": settings.CHAT_SUMMARY_MAX_TOKENS,
+        "temperature": 0.2,
+    },
+}
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; close enough for budgeting without a tokenizer
+    return (len(text) + 3) // 4
+
+def end_at_sentence(text: str) -> str:
+    """
+    Drops a trailing unfinished sentence (keeps the text when there's no complete one).
+    """
+    end = max(text.rfind(mark) for mark in (". ", "! ", "? ", ".\n", "!\n", "?\n"))
+    if end > 0:
+        return text[:end + 1]
+    return text
+
+
+class Prompt:
+    """
+    A rendered prompt plus the generation settings it is sent with.
+    """
+
+    def __init__(self, endpoint: str, text: str, max_output_tokens: int, temperature: float, cache_scope: str):
+        self.endpoint = endpoint
+        self.text = text
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+        # Completion cache namespace: same message and mood on another endpoint is a different reply
+        self.cache_scope = cache_scope
+
+
+def _preamble(endpoint: str, mood: Optional[str], max_output_tokens: int) -> str:
+    spec = ENDPOINTS[endpoint]
+    lines = [spec["task"]]
+    if endpoint != "summary":
+        lines.insert(0, f"You are {ASSISTANT}, the supportive companion in the EchoSense journaling app.")
+    if mood in MOOD_GUIDANCE:
+        lines.append(MOOD_GUIDANCE[mood])
+    # Roughly half the budget in words (a token is ~3/4 of a word) leaves room to finish the last sentence
+    lines.append(f"Answer in at most {max(max_output_tokens // 2, 10)} words.")
+    return " ".join(lines)
+
+def build_prompt(endpoint: str, message: str, mood: Optional[str] = None, context: str = "",
+                 max_output_tokens: Optional[int] = None) -> Prompt:
+    """
+    The prompt for `endpoint` ("chat", "diary" or "summary"); `context` goes
+    between the preamble and the message.
+    """
+    spec = ENDPOINTS[endpoint]
+    max_output_tokens = max_output_tokens or spec["max_output_tokens"]
+    parts = [_preamble(endpoint, mood, max_output_tokens)]
+    if context:
+        parts.append(context)
+    parts.append(spec["message"].format(message=message))
+    if endpoint != "summary":
+        parts.append(f"{ASSISTANT} (AI assistant):")
+    return Prompt(
+        endpoint, "\n\n".join(parts), max_output_tokens, spec["temperature"],
+        cache_scope=f"{endpoint}:v{PROMPT_VERSION}:{mood}",
+    )
+
+def context_budget(endpoint: str, message: str, mood: Optional[str], total: int = settings.CHAT_CONTEXT_TOKENS) -> int:
+    """
+    Tokens left for context once the rest of the prompt is counted.
+    """
+    return max(0, total - estimate_tokens(build_prompt(endpoint, message, mood).text))
+
+
+# -----------------------------
+# Tracked model calls
+# -----------------------------
+def _record(prompt: Prompt, usage: dict, reply: str, seconds: float, outcome: str):
+    prompt_tokens = usage.get("prompt_tokens") or estimate_tokens(prompt.text)
+    output_tokens = usage.get("output_tokens") or estimate_tokens(reply)
+    AI_CALL_SECONDS.observe(seconds, (prompt.endpoint,))
+    AI_CALLS.inc((prompt.endpoint, outcome))
+    AI_TOKENS.inc((prompt.endpoint, "prompt"), prompt_tokens)
+    AI_TOKENS.inc((prompt.endpoint, "output"), output_tokens)
+    logger.debug(
+        f"AI {prompt.endpoint} call: {outcome}, {prompt_tokens} prompt + {output_tokens} output tokens "
+        f"(budget {prompt.max_output_tokens}) in {seconds:.3f}s"
+    )
+
+async def complete(prompt: Prompt) -> str:
+    """
+    The full reply for `prompt`, within its output budget.
+    """
+    usage = {}
+    reply = ""
+    outcome = "error"
+    started = time.perf_counter()
+    try:
+        reply = await get_ai_client().generate(
+            prompt.text, max_output_tokens=prompt.max_output_tokens, temperature=prompt.temperature, usage=usage,
+        )
+        outcome = "ok"
+        if usage.get("finish_reason") == "MAX_TOKENS":
+            outcome = "truncated"
+            reply = end_at_sentence(reply)
+        return reply
+    finally:
+        _record(prompt, usage, reply, time.perf_counter() - started, outcome)
+
+async def stream(prompt: Prompt) -> AsyncIterator[str]:
+    """
+    Yields the reply for `prompt` chunk by chunk, within its output budget.
+    """
+    usage = {}
+    parts = []
+    outcome = "error"
+    started = time.perf_counter()
+    try:
+        async for text in get_ai_client().stream(
+            prompt.text, max_output_tokens=prompt.max_output_tokens, temperature=prompt.temperature, usage=usage,
+        ):
+            parts.append(text)
+            yield text
+        outcome = "truncated" if usage.get("finish_reason") == "MAX_TOKENS" else "ok"
+    finally:
+        _record(prompt, usage, "".join(parts), time.perf_counter() - started, outcome)
@@ -0,0 +1,85 @@
+# services/refresh_sessions.py
+"""
+Server-side state for refresh tokens, so a session can end.
+
+Every refresh token carries a `jti` and the id of the session (`sid`) it
+belongs to; `refresh_tokens` holds one document per issued jti. Refreshing
+spends the presented token and issues the next one of the same session. A
+token presented a second time was copied -- the legitimate client already
+moved on to its successor -- so the whole session is revoked and both
+parties have to log in again.
+
+Logout revokes the session, a password change every session of the user.
+Access tokens stay stateless: they keep working until their short `exp`.
+Documents expire with their tokens (TTL index on `expires_at`).
+"""
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from utils.config import settings
+from utils.security import create_refresh_token
+from utils.tokens import token_service
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKENS = "refresh_tokens"
+
+async def issue_refresh_token(db, user_id: str, session: Optional[str] = None) -> str:
+    """
+    Refresh token for `user_id`, starting a new session unless one is given.
+    """
+    jti = uuid.uuid4().hex
+    session = session or uuid.uuid4().hex
+    await db[REFRESH_TOKENS].insert_one({
+        "_id": jti,
+        "user_id": ObjectId(user_id),
+        "session": session,
+        "used_at": None,
+        "expires_at": datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    })
+    return create_refresh_token({"user_id": user_id, "jti": jti, "sid": session})
+
+async def rotate_refresh_token(db, token: str) -> Optional[Tuple[str, str]]:
+    """
+    Spends `token`: (user_id, next refresh token), or None when it is invalid,
+    revoked or already spent (which also revokes its session).
+    """
+    claims = token_service.verify(token, token_type="refresh")
+    # Tokens from before sessions were tracked have no sid: they can't be revoked, so don't honour them
+    if claims is None or not claims.get("jti") or not claims.get("sid"):
+        return None
+
+    coll = db[REFRESH_TOKENS]
+    spent = await coll.find_one_and_update(
+        {"_id": claims["jti"], "used_at": None},
+        {"$set": {"used_at": datetime.utcnow()}},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if spent is None:
+        if await coll.find_one({"_id": claims["jti"]}, {"_id": 1}):
+            logger.warning(f"Refresh token reused for user {claims['user_id']}: revoking session {claims['sid']}")
+            await coll.delete_many({"session": claims["sid"]})
+        return None
+    return claims["user_id"], await issue_refresh_token(db, claims["user_id"], session=claims["sid"])
+
+async def revoke_session(db, token: str) -> bool:
+    """
+    Ends the session `token` belongs to (logout). False for an invalid token.
+    """
+    claims = token_service.verify(token, token_type="refresh")
+    if claims is None or not claims.get("sid"):
+        return False
+    await db[REFRESH_TOKENS].delete_many({"session": claims["sid"], "user_id": ObjectId(claims["user_id"])})
+    return True
+
+async def revoke_user_sessions(db, user_id) -> int:
+    """
+    Ends every session of a user, e.g. after a password change.
+    """
+    result = await db[REFRESH_TOKENS].delete_many({"user_id": ObjectId(user_id)})
+    return result.deleted_count
@@ -1,17 +1,312 @@
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+from utils.config import settings
+from utils.metrics import stage
+import asyncio
+import logging
+import multiprocessing
+import threading
 
-analyzer = SentimentIntensityAnalyzer()
+logger = logging.getLogger(__name__)
 
-def analyze_sentiment(text: str) -> str:
+_analyzer: Optional[SentimentIntensityAnalyzer] = None
+
+def get_analyzer() -> SentimentIntensityAnalyzer:
     """
-    Analyzes the sentiment of a given text and returns 'happy', 'sad', or 'neutral'.
+    The VADER analyzer, built (lexicon loaded) on first use.
     """
-    scores = analyzer.polarity_scores(text)
-    compound = scores['compound']
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
 
+def label_for(compound: float) -> str:
     if compound >= 0.05:
         return "happy"
     elif compound <= -0.05:
         return "sad"
     else:
         return "neutral"
+
+# -----------------------------
+# Engines
+# -----------------------------
+class VaderEngine:
+    """
+    Lexicon-based scorer; microseconds per text, no warm-up needed.
+    """
+    name = "vader"
+
+    def analyze_batch(self, texts: List[str]) -> List[str]:
+        analyzer = get_analyzer()
+        return [label_for(analyzer.polarity_scores(t)['compound']) for t in texts]
+
+    def warm_up(self):
+        self.analyze_batch(["warm up"])
+
+
+class TransformerEngine:
+    """
+    Local Hugging Face sequence classifier running on CPU.
+    Labels containing "pos"/"neg"/"neu" map to happy/sad/neutral; predictions
+    below the confidence threshold count as neutral (SST-2 style models have no neutral class).
+    """
+    name = "transformer"
+
+    def __init__(
+        self,
+        model_name: str = settings.SENTIMENT_MODEL,
+        cache_dir: Optional[str] = settings.SENTIMENT_MODEL_CACHE,
+        threads: int = settings.SENTIMENT_TORCH_THREADS,
+        neutral_threshold: float = settings.SENTIMENT_NEUTRAL_THRESHOLD,
+        local_files_only: bool = settings.SENTIMENT_MODEL_LOCAL_ONLY,
+    ):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        self._torch = torch
+        torch.set_num_threads(threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            model_name, cache_dir=cache_dir, local_files_only=local_files_only
+        )
+        self.model = AutoModelForSequenceClassification.from_pretrained(
+            model_name, cache_dir=cache_dir, local_files_only=local_files_only
+        )
+        self.model.eval()
+        self.neutral_threshold = neutral_threshold
+        self.labels = [
+            self._mood_for_label(self.model.config.id2label[i])
+            for i in range(self.model.config.num_labels)
+        ]
+
+    @staticmethod
+    def _mood_for_label(label: str) -> str:
+        label = label.lower()
+        if "pos" in label:
+            return "happy"
+        if "neg" in label:
+            return "sad"
+        return "neutral"
+
+    def analyze_batch(self, texts: List[str]) -> List[str]:
+        with self._torch.inference_mode():
+            encoded = self.tokenizer(
+                texts, padding=True, truncation=True, max_length=256, return_tensors="pt"
+            )
+            probs = self.model(**encoded).logits.softmax(dim=-1)
+        confidence, index = probs.max(dim=-1)
+        return [
+            self.labels[i] if c >= self.neutral_threshold else "neutral"
+            for c, i in zip(confidence.tolist(), index.tolist())
+        ]
+
+    def warm_up(self):
+        # First forward pass allocates buffers / picks kernels; do it before real traffic
+        self.analyze_batch(["I feel fine today.", "This was a long and difficult week for me."])
+
+
+_engine = None
+_engine_lock = threading.Lock()
+# The in-progress load_engine() call, shared by everyone waiting for the model
+_engine_loading: Optional[asyncio.Future] = None
+
+def get_engine():
+    """
+    Returns the configured engine (SENTIMENT_ENGINE=vader|transformer), loading it on first use.
+    Blocking (the transformer takes seconds to load): call load_engine() on the event loop.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if settings.SENTIMENT_ENGINE == "transformer":
+                    _engine = TransformerEngine()
+                else:
+                    _engine = VaderEngine()
+    return _engine
+
+async def load_engine():
+    """
+    get_engine() without blocking the event loop: the first caller loads the
+    engine on a worker thread and concurrent callers (requests arriving during
+    warm-up included) await that same load.
+    """
+    global _engine_loading
+    if _engine is not None:
+        return _engine
+    if _engine_loading is None:
+        _engine_loading = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(None, get_engine))
+        # A failed load is retried by the next caller
+        _engine_loading.add_done_callback(_forget_load)
+    return await asyncio.shield(_engine_loading)
+
+def _forget_load(future: asyncio.Future):
+    global _engine_loading
+    if _engine_loading is future:
+        _engine_loading = None
+
+# -----------------------------
+# Dynamic micro-batching
+# -----------------------------
+class MicroBatcher:
+    """
+    Collects concurrent single-text requests for up to `max_wait` seconds
+    (or `max_batch` texts) and scores them in one forward pass on a
+    dedicated inference thread.
+    """
+
+    def __init__(self, max_batch: int, max_wait: float):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        # The loop only keeps weak references to tasks: hold running batches until they finish
+        self._tasks = set()
+        # One inference thread: torch parallelises inside a batch already
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sentiment")
+
+    async def submit(self, text: str) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            labels = await loop.run_in_executor(
+                self._executor, get_engine().analyze_batch, [text for text, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), label in zip(batch, labels):
+            if not future.done():
+                future.set_result(label)
+
+    async def run_batch(self, texts: List[str]) -> List[str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, get_engine().analyze_batch, texts)
+
+    async def close(self):
+        """
+        Scores what's still queued, waits for running batches, then stops the inference thread.
+        """
+        self._flush()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_batcher: Optional[MicroBatcher] = None
+
+def _get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(settings.SENTIMENT_MAX_BATCH, settings.SENTIMENT_BATCH_WAIT_MS / 1000)
+    return _batcher
+
+# -----------------------------
+# Public API
+# -----------------------------
+def analyze_sentiment(text: str) -> str:
+    """
+    Analyzes the sentiment of a given text and returns 'happy', 'sad', or 'neutral'.
+    """
+    return get_engine().analyze_batch([text])[0]
+
+async def analyze_sentiment_async(text: str) -> str:
+    """
+    Request-path variant: VADER scores inline, the transformer engine goes through the micro-batcher.
+    """
+    with stage("sentiment"):
+        if (await load_engine()).name == "vader":
+            return analyze_sentiment(text)
+        return await _get_batcher().submit(text)
+
+async def warm_up_sentiment():
+    """
+    Loads the configured engine and runs one inference off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    engine = await load_engine()
+    await loop.run_in_executor(None, engine.warm_up)
+    logger.info(f"Sentiment engine '{engine.name}' warmed up")
+
+def _score_chunk(texts: List[str]) -> List[str]:
+    # Runs inside a pool worker, which builds its own analyzer on its first chunk
+    analyzer = get_analyzer()
+    return [label_for(analyzer.polarity_scores(t)['compound']) for t in texts]
+
+# -----------------------------
+# Batch scoring
+# -----------------------------
+_sentiment_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_sentiment_pool() -> ProcessPoolExecutor:
+    global _sentiment_pool
+    if _sentiment_pool is None:
+        _sentiment_pool = ProcessPoolExecutor(
+            max_workers=settings.SENTIMENT_BATCH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _sentiment_pool
+
+def _chunks(texts: List[str], size: int) -> List[List[str]]:
+    return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+async def analyze_sentiment_batch(texts: List[str]) -> List[str]:
+    """
+    Scores many texts at once, preserving order.
+    With VADER, small batches are scored inline and larger ones are spread
+    across a process pool; model engines run fixed-size batches on the
+    inference thread instead (one model copy, torch uses all cores).
+    """
+    with stage("sentiment_batch"):
+        return await _analyze_sentiment_batch(texts)
+
+async def _analyze_sentiment_batch(texts: List[str]) -> List[str]:
+    if (await load_engine()).name != "vader":
+        batcher = _get_batcher()
+        labels = []
+        for chunk in _chunks(texts, settings.SENTIMENT_MAX_BATCH):
+            labels.extend(await batcher.run_batch(chunk))
+        return labels
+
+    if len(texts) < settings.SENTIMENT_BATCH_PARALLEL_MIN:
+        return _score_chunk(texts)
+
+    loop = asyncio.get_running_loop()
+    pool = _get_sentiment_pool()
+    chunk_size = max(1, -(-len(texts) // (settings.SENTIMENT_BATCH_WORKERS * 4)))
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, _score_chunk, chunk)
+        for chunk in _chunks(texts, chunk_size)
+    ))
+    return [label for chunk in results for label in chunk]
+
+async def shutdown_sentiment_pool():
+    global _sentiment_pool, _batcher
+    if _sentiment_pool is not None:
+        _sentiment_pool.shutdown(wait=True, cancel_futures=True)
+        _sentiment_pool = None
+    if _batcher is not None:
+        await _batcher.close()
+        _batcher = None
@@ -0,0 +1,388 @@
+# services/speech_service.py
+import asyncio
+import io
+import logging
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+try:
+    import audioop  # C implementation; removed from the stdlib in Python 3.13
+except ImportError:
+    audioop = None
+
+from utils.config import settings
+from utils.metrics import stage
+from utils.resources import LazyModule
+
+# Imported on first use (or by the startup warm-up) rather than at app import
+sr = LazyModule("speech_recognition")
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit PCM
+FRAME_MS = 30
+FRAME_BYTES = SAMPLE_RATE * SAMPLE_WIDTH * FRAME_MS // 1000
+
+class AudioTooLarge(Exception):
+    pass
+
+class UnsupportedAudio(Exception):
+    pass
+
+# -----------------------------
+# Recognizer backends
+# -----------------------------
+class GoogleBackend:
+    name = "google"
+
+    def transcribe(self, audio: "sr.AudioData") -> str:
+        return sr.Recognizer().recognize_google(audio)
+
+class SphinxBackend:
+    """
+    Fully offline CMU Sphinx recognizer (needs `pocketsphinx`).
+    """
+    name = "sphinx"
+
+    def transcribe(self, audio: "sr.AudioData") -> str:
+        return sr.Recognizer().recognize_sphinx(audio)
+
+class FakeBackend:
+    """
+    Deterministic offline backend for tests: describes each segment instead of recognizing it.
+    """
+    name = "fake"
+
+    def transcribe(self, audio: "sr.AudioData") -> str:
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        return f"[speech {seconds:.1f}s]"
+
+BACKENDS = {b.name: b for b in (GoogleBackend, SphinxBackend, FakeBackend)}
+
+_backend = None
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS.get(settings.VOICE_RECOGNIZER, GoogleBackend)()
+    return _backend
+
+async def warm_up_speech():
+    """
+    Imports speech_recognition and builds the configured backend off the event loop.
+    """
+    await asyncio.get_running_loop().run_in_executor(None, lambda: (sr.Recognizer, get_backend()))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.VOICE_WORKERS, thread_name_prefix="speech")
+    return _executor
+
+def speech_pool_stats() -> dict:
+    if _executor is None:
+        return {"workers": 0, "queued": 0}
+    return {"workers": len(_executor._threads), "queued": _executor._work_queue.qsize()}
+
+def shutdown_speech_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+# -----------------------------
+# Ingestion
+# -----------------------------
+async def upload_chunks(upload, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+async def read_limited(chunks: AsyncIterator[bytes], max_bytes: int = settings.VOICE_MAX_UPLOAD_BYTES) -> io.BytesIO:
+    """
+    Collects streamed chunks into memory, failing as soon as max_bytes is exceeded.
+    """
+    buffer = io.BytesIO()
+    async for chunk in chunks:
+        if buffer.tell() + len(chunk) > max_bytes:
+            raise AudioTooLarge(f"Audio exceeds {max_bytes} bytes")
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+def decode_to_pcm(buffer: io.BytesIO) -> bytes:
+    """
+    Decodes WAV/AIFF/FLAC (or anything libsndfile reads, when `soundfile` is
+    installed) to mono 16 kHz 16-bit PCM.
+    """
+    try:
+        with sr.AudioFile(buffer) as source:
+            audio = sr.Recognizer().record(source)
+        return audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=SAMPLE_WIDTH)
+    except ValueError:
+        buffer.seek(0)
+
+    try:
+        import soundfile
+    except ImportError:
+        raise UnsupportedAudio("Unsupported audio encoding (use WAV, AIFF or FLAC)")
+    try:
+        data, rate = soundfile.read(buffer, dtype="int16", always_2d=True)
+    except Exception as e:
+        raise UnsupportedAudio(f"Unsupported audio encoding: {e}")
+    mono = data.mean(axis=1).astype("int16").tobytes()
+    return sr.AudioData(mono, rate, SAMPLE_WIDTH).get_raw_data(convert_rate=SAMPLE_RATE, convert_width=SAMPLE_WIDTH)
+
+# -----------------------------
+# Silence segmentation
+# -----------------------------
+def frame_rms(frame: bytes) -> float:
+    if audioop is not None:
+        return float(audioop.rms(frame, SAMPLE_WIDTH))
+    samples = array("h", frame)
+    if not samples:
+        return 0.0
+    return (sum(s * s for s in samples) / len(samples)) ** 0.5
+
+class SilenceSegmenter:
+    """
+    Frame-by-frame voice-activity detection: accumulates 30 ms frames and
+    closes a segment at a pause of at least min_silence_ms, or once it reaches
+    max_segment_seconds. Pure-silence segments are dropped.
+    """
+
+    def __init__(
+        self,
+        silence_threshold: float = settings.VOICE_SILENCE_RMS,
+        min_silence_ms: int = settings.VOICE_MIN_SILENCE_MS,
+        max_segment_seconds: float = settings.VOICE_MAX_SEGMENT_SECONDS,
+    ):
+        self.silence_threshold = silence_threshold
+        self.silence_frames_needed = max(1, min_silence_ms // FRAME_MS)
+        self.max_frames = max(1, int(max_segment_seconds * 1000 // FRAME_MS))
+        self._reset()
+
+    def _reset(self):
+        self.current = bytearray()
+        self.frames = 0
+        self.voiced = False
+        self.silent_run = 0
+
+    def push(self, frame: bytes) -> Optional[bytes]:
+        """
+        Adds one frame; returns the finished speech segment when this frame closes one.
+        """
+        is_silent = frame_rms(frame) < self.silence_threshold
+        self.current.extend(frame)
+        self.frames += 1
+        self.silent_run = self.silent_run + 1 if is_silent else 0
+        self.voiced = self.voiced or not is_silent
+
+        if (self.silent_run >= self.silence_frames_needed and self.voiced) or self.frames >= self.max_frames:
+            segment = bytes(self.current) if self.voiced else None
+            self._reset()
+            return segment
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        segment = bytes(self.current) if self.voiced else None
+        self._reset()
+        return segment
+
+
+def split_on_silence(
+    pcm: bytes,
+    silence_threshold: float = settings.VOICE_SILENCE_RMS,
+    min_silence_ms: int = settings.VOICE_MIN_SILENCE_MS,
+    max_segment_seconds: float = settings.VOICE_MAX_SEGMENT_SECONDS,
+) -> List[bytes]:
+    """
+    Cuts 16 kHz PCM into speech segments at pauses of at least min_silence_ms,
+    never letting a segment grow past max_segment_seconds.
+    """
+    segmenter = SilenceSegmenter(silence_threshold, min_silence_ms, max_segment_seconds)
+    segments = []
+    for offset in range(0, len(pcm), FRAME_BYTES):
+        segment = segmenter.push(pcm[offset:offset + FRAME_BYTES])
+        if segment:
+            segments.append(segment)
+    segment = segmenter.flush()
+    if segment:
+        segments.append(segment)
+    return segments
+
+# -----------------------------
+# Pipeline
+# -----------------------------
+def _transcribe_segment(pcm: bytes) -> Optional[str]:
+    try:
+        return get_backend().transcribe(sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH))
+    except sr.UnknownValueError:
+        return None
+
+async def transcribe_pcm(pcm: bytes) -> str:
+    """
+    Transcribes 16 kHz PCM by recognizing its speech segments in parallel.
+    Raises sr.UnknownValueError when no segment contained recognizable speech.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    segments = await loop.run_in_executor(executor, split_on_silence, pcm)
+    with stage("speech_recognition"):
+        texts = await asyncio.gather(*(
+            loop.run_in_executor(executor, _transcribe_segment, segment) for segment in segments
+        ))
+    texts = [t for t in texts if t]
+    if not texts:
+        raise sr.UnknownValueError()
+    return " ".join(texts)
+
+async def transcribe_stream(chunks: AsyncIterator[bytes]) -> str:
+    """
+    Streams audio into memory (size-limited), decodes it off the event loop
+    and transcribes it segment by segment. No temp files are written.
+    """
+    buffer = await read_limited(chunks)
+    loop = asyncio.get_running_loop()
+    with stage("speech_decode"):
+        pcm = await loop.run_in_executor(_get_executor(), decode_to_pcm, buffer)
+    return await transcribe_pcm(pcm)
+
+# -----------------------------
+# Live transcription
+# -----------------------------
+class LiveTranscriber:
+    """
+    Incremental transcription of a live PCM stream (16-bit mono, 16 kHz).
+    Clients resample before sending (the browser does it while recording), so
+    nothing is converted per chunk on the event loop.
+
+    Audio is fed as it is recorded; every utterance closed by the silence
+    segmenter is recognized in the speech pool and emitted as a `segment`
+    event (in order). While an utterance is still open, a `partial` event with
+    its transcript so far is emitted every partial_interval_ms of audio (at
+    most one partial recognition in flight; stale partials are dropped).
+    `finish()` flushes the last utterance and returns the full transcript.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[dict], Awaitable[None]],
+        partial_interval_ms: int = settings.VOICE_PARTIAL_INTERVAL_MS,
+        max_seconds: int = settings.VOICE_LIVE_MAX_SECONDS,
+        segmenter: Optional[SilenceSegmenter] = None,
+    ):
+        self._emit = emit
+        self.max_bytes = max_seconds * SAMPLE_RATE * SAMPLE_WIDTH
+        self._partial_frames = partial_interval_ms // FRAME_MS if partial_interval_ms > 0 else 0
+        self._segmenter = segmenter or SilenceSegmenter()
+        self._pending = bytearray()
+        self._received = 0  # bytes of 16 kHz audio accepted so far
+        self._frames_since_partial = 0
+        self._utterance_start = 0
+        self._generation = 0
+        self._segments: List[asyncio.Task] = []
+        self._partial: Optional[asyncio.Task] = None
+
+    async def feed(self, pcm: bytes):
+        if self._received + len(self._pending) + len(pcm) > self.max_bytes:
+            raise AudioTooLarge(f"Live session exceeds {self.max_bytes // (SAMPLE_RATE * SAMPLE_WIDTH)} seconds")
+        self._pending.extend(pcm)
+
+        usable = len(self._pending) - len(self._pending) % FRAME_BYTES
+        for offset in range(0, usable, FRAME_BYTES):
+            self._push_frame(bytes(self._pending[offset:offset + FRAME_BYTES]))
+        del self._pending[:usable]
+
+    def _push_frame(self, frame: bytes):
+        if self._segmenter.frames == 0:
+            self._utterance_start = self._received
+        self._received += len(frame)
+        segment = self._segmenter.push(frame)
+        if segment:
+            self._commit(segment)
+            return
+
+        self._frames_since_partial += 1
+        if (
+            self._partial_frames
+            and self._segmenter.voiced
+            and self._frames_since_partial >= self._partial_frames
+            and (self._partial is None or self._partial.done())
+        ):
+            self._frames_since_partial = 0
+            self._partial = asyncio.create_task(
+                self._run_partial(bytes(self._segmenter.current), self._generation)
+            )
+
+    def _commit(self, segment: bytes):
+        self._generation += 1
+        self._frames_since_partial = 0
+        previous = self._segments[-1] if self._segments else None
+        self._segments.append(asyncio.create_task(self._run_segment(
+            len(self._segments), segment, _ms(self._utterance_start), _ms(self._received), previous
+        )))
+
+    async def _recognize(self, pcm: bytes) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        with stage("speech_recognition"):
+            return await loop.run_in_executor(_get_executor(), _transcribe_segment, pcm)
+
+    async def _run_partial(self, pcm: bytes, generation: int):
+        try:
+            text = await self._recognize(pcm)
+        except sr.RequestError as e:
+            logger.warning(f"Partial transcript skipped: {e}")
+            return
+        # A segment committed meanwhile supersedes this partial
+        if text and generation == self._generation:
+            await self._emit({"type": "partial", "text": text})
+
+    async def _run_segment(self, index: int, pcm: bytes, start_ms: int, end_ms: int, previous) -> Optional[str]:
+        started = time.perf_counter()
+        text = await self._recognize(pcm)
+        if previous is not None:
+            await asyncio.wait([previous])  # emit segments in order
+        if text:
+            await self._emit({
+                "type": "segment",
+                "index": index,
+                "text": text,
+                "start_ms": start_ms,
+                "end_ms": end_ms,
+                "recognition_ms": round((time.perf_counter() - started) * 1000, 1),
+            })
+        return text
+
+    async def finish(self) -> str:
+        """
+        Closes the open utterance and waits for every segment.
+        Raises sr.UnknownValueError when nothing recognizable was said.
+        """
+        if self._pending:
+            self._push_frame(bytes(self._pending))
+            self._pending.clear()
+        segment = self._segmenter.flush()
+        if segment:
+            self._commit(segment)
+        if self._partial is not None:
+            self._partial.cancel()
+
+        texts = [t for t in await asyncio.gather(*self._segments) if t]
+        if not texts:
+            raise sr.UnknownValueError()
+        return " ".join(texts)
+
+    def cancel(self):
+        for task in self._segments + ([self._partial] if self._partial else []):
+            task.cancel()
+
+def _ms(pcm_bytes: int) -> int:
+    return pcm_bytes * 1000 // (SAMPLE_RATE * SAMPLE_WIDTH)
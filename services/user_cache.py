@@ -0,0 +1,78 @@
+# services/user_cache.py
+import logging
+from typing import Optional
+
+from utils.config import settings
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """
+    Short-TTL cache of authenticated user documents keyed by user id, so
+    get_current_user does not hit `users` on every request.
+
+    An optional shared tier (any object with async get/set/delete) can sit
+    behind the local LRU when several workers need a common view; without it
+    the TTL bounds how stale another worker's copy can be.
+    """
+
+    def __init__(self, local: LRUCache, shared=None):
+        self.local = local
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        user = await self.local.get(user_id)
+        if user is None and self.shared is not None:
+            try:
+                user = await self.shared.get(user_id)
+            except Exception as e:
+                logger.warning(f"User cache shared tier read failed: {e}")
+            if user is not None:
+                await self.local.set(user_id, user)
+
+        if user is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Hand out a copy so handlers can't mutate the cached document
+        return dict(user)
+
+    async def set(self, user_id: str, user: dict):
+        await self.local.set(user_id, dict(user))
+        if self.shared is not None:
+            try:
+                await self.shared.set(user_id, dict(user))
+            except Exception as e:
+                logger.warning(f"User cache shared tier write failed: {e}")
+
+    async def invalidate(self, user_id):
+        """
+        Drops a user after any write to their document.
+        """
+        user_id = str(user_id)
+        self.invalidations += 1
+        await self.local.delete(user_id)
+        if self.shared is not None:
+            try:
+                await self.shared.delete(user_id)
+            except Exception as e:
+                logger.warning(f"User cache shared tier delete failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.local.evictions,
+            "size": len(self.local),
+        }
+
+
+user_cache = UserCache(LRUCache(settings.USER_CACHE_MAX_ENTRIES, settings.USER_CACHE_TTL))
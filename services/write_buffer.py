@@ -0,0 +1,284 @@
+# services/write_buffer.py
+"""
+Write-behind buffer for chat, diary and voice inserts.
+
+Inserts into the same collection are grouped into one insert_many per
+WRITE_BUFFER_FLUSH_MS (or as soon as WRITE_BUFFER_MAX_BATCH documents are
+waiting), so at high chat volume many requests share one round trip. Every
+document gets its `_id` when it is queued, which means:
+
+- callers can return or reference the id right away;
+- a batch retried after a network error can't insert twice: the retry
+  skips the ids an earlier attempt already stored.
+
+Two ways to queue:
+
+- `insert(db, coll, doc)` returns immediately; the document is written with the
+  next batch. Used for chat turns, where the reply is already on screen.
+- `insert(db, coll, doc, wait=True)` returns once the batch holding the
+  document is written and re-raises that document's own error (e.g.
+  DuplicateKeyError for a reused Idempotency-Key). Used where the response
+  promises the entry exists (diary, voice): concurrent requests still share
+  the round trip.
+
+Write concern follows the data: chat turns use WRITE_CONCERN_CHAT (w=1 by
+default), journal data (diary entries, voice notes) WRITE_CONCERN_JOURNAL
+(w="majority"). When the write concern isn't confirmed, the documents are
+still on the primary: they count as stored with durability unconfirmed,
+after-write hooks run for them, and waiting callers get UnconfirmedWrite
+(carrying the stored document) instead of a plain failure.
+
+Diary inserts bump the mood rollups for the whole written batch in one
+bulk_write. Past WRITE_BUFFER_MAX_PENDING queued documents, new inserts wait
+for a flush (counted as backpressure). close() flushes everything on shutdown.
+
+Fire-and-forget inserts (chat turns) trade durability for latency. A turn
+is lost if the process dies before its batch is written, i.e. within
+WRITE_BUFFER_FLUSH_MS plus one insert round trip of the reply; a graceful
+shutdown flushes first. A turn is also lost if its batch still fails after
+WRITE_BUFFER_RETRIES retries. Such turns are logged and counted in `dropped`.
+WRITE_BUFFER_ENABLED=false writes every turn before the response instead.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError, WriteConcernError
+
+from services.mood_rollups import record_moods_batch
+from utils.config import settings
+from utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+def _document_error(error: dict) -> PyMongoError:
+    if error.get("code") == 11000:
+        return DuplicateKeyError(error.get("errmsg", ""), error.get("code"), error)
+    return PyMongoError(error.get("errmsg", ""))
+
+class UnconfirmedWrite(WriteConcernError):
+    """
+    `doc` was stored on the primary, but the write concern wasn't confirmed
+    (e.g. a majority acknowledgement timed out): it may still be rolled back.
+    """
+
+    def __init__(self, error: dict, doc: dict):
+        super().__init__(error.get("errmsg", ""), error.get("code"), error)
+        self.doc = doc
+
+def parse_write_concern(raw: str) -> WriteConcern:
+    """
+    "1", "majority", "majority,j" -> WriteConcern.
+    """
+    w, _, journal = raw.partition(",")
+    w = int(w) if w.strip().isdigit() else w.strip()
+    return WriteConcern(w=w, j=True) if journal.strip() == "j" else WriteConcern(w=w)
+
+
+class WriteBuffer:
+    def __init__(
+        self,
+        flush_interval: float,
+        max_batch: int,
+        max_pending: int,
+        retries: int = 3,
+        write_concerns: Optional[Dict[str, WriteConcern]] = None,
+        after_write: Optional[Dict[str, Callable[[object, List[dict]], Awaitable]]] = None,
+        enabled: bool = True,
+    ):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.retries = retries
+        self.write_concerns = write_concerns or {}
+        self.after_write = after_write or {}
+        self.enabled = enabled
+        # collection -> [(doc, future or None, queued_at)], plus the db they go to
+        self._pending: Dict[str, list] = defaultdict(list)
+        self._dbs: Dict[str, object] = {}
+        self._timer = None
+        self._tasks = set()
+        self._flushed = asyncio.Event()
+        self.queued = 0  # queued or being written
+        self.batches = 0
+        self.written = 0
+        self.write_errors = 0
+        self.write_concern_errors = 0
+        self.dropped = 0
+        self.retried = 0
+        self.backpressure_waits = 0
+        self.last_flush_seconds = 0.0
+
+    async def insert(self, db, collection: str, doc: dict, wait: bool = False) -> dict:
+        """
+        Queues `doc` (assigning its `_id`) and returns it; with wait=True only once it's stored.
+        """
+        doc.setdefault("_id", ObjectId())
+        if not self.enabled:
+            self.queued += 1
+            await self._write(db, collection, [(doc, None, time.monotonic())], raise_errors=True)
+            return doc
+
+        if self.queued >= self.max_pending:
+            self.backpressure_waits += 1
+            self._flush()
+            while self.queued >= self.max_pending:
+                await self._flushed.wait()
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future() if wait else None
+        self._pending[collection].append((doc, future, time.monotonic()))
+        self._dbs[collection] = db
+        self.queued += 1
+        if len(self._pending[collection]) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._flush)
+
+        if future is not None:
+            await future
+        return doc
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for collection, items in self._pending.items():
+            for start in range(0, len(items), self.max_batch):
+                task = asyncio.ensure_future(self._write(self._dbs[collection], collection, items[start:start + self.max_batch]))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        self._pending.clear()
+
+    async def _insert_many(self, coll, docs: List[dict]) -> Dict[int, Exception]:
+        """
+        insert_many with retries; returns the failed documents' errors by batch index.
+        """
+        remaining = list(range(len(docs)))
+        for attempt in range(self.retries + 1):
+            try:
+                if attempt > 0:
+                    # The failed attempt may have written part of the batch: only retry what's missing
+                    ids = [docs[i]["_id"] for i in remaining]
+                    stored = {d["_id"] async for d in coll.find({"_id": {"$in": ids}}, {"_id": 1})}
+                    remaining = [i for i in remaining if docs[i]["_id"] not in stored]
+                    if not remaining:
+                        return {}
+                with stage("mongo_insert_batch"):
+                    await coll.insert_many([docs[i] for i in remaining], ordered=False)
+                return {}
+            except BulkWriteError as e:
+                # Per-document errors are final; the rest of the batch was written
+                failed = {remaining[error["index"]]: _document_error(error) for error in e.details.get("writeErrors", [])}
+                concern_errors = e.details.get("writeConcernErrors") or []
+                if concern_errors:
+                    # Stored on the primary but not acknowledged as the write concern asks
+                    unconfirmed = [i for i in remaining if i not in failed]
+                    self.write_concern_errors += len(unconfirmed)
+                    logger.error(f"Buffered insert into {coll.name}: write concern not confirmed for "
+                                 f"{len(unconfirmed)} stored documents: {concern_errors[0].get('errmsg')}")
+                    failed.update((i, UnconfirmedWrite(concern_errors[0], docs[i])) for i in unconfirmed)
+                return failed
+            except PyMongoError as e:
+                if attempt == self.retries:
+                    return {i: e for i in remaining}
+                self.retried += 1
+                logger.warning(f"Buffered insert into {coll.name} failed, retrying: {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+    async def _write(self, db, collection: str, batch: list, raise_errors: bool = False):
+        started = time.perf_counter()
+        coll = db.get_collection(collection, write_concern=self.write_concerns.get(collection))
+        docs = [doc for doc, _, _ in batch]
+        failed: Dict[int, Exception] = {}
+        try:
+            failed = await self._insert_many(coll, docs)
+        except Exception as e:
+            failed = {i: e for i in range(len(docs))}
+        finally:
+            lost = sum(not isinstance(error, UnconfirmedWrite) for error in failed.values())
+            self.batches += 1
+            self.written += len(docs) - lost
+            self.write_errors += lost
+            self.queued -= len(batch)
+            self.last_flush_seconds = time.perf_counter() - started
+            self._flushed.set()
+            self._flushed = asyncio.Event()
+
+        written = [doc for i, doc in enumerate(docs) if i not in failed or isinstance(failed[i], UnconfirmedWrite)]
+        if written and collection in self.after_write:
+            try:
+                await self.after_write[collection](db, written)
+            except Exception as e:
+                logger.error(f"After-write hook for {collection} failed: {e}")
+
+        for i, (doc, future, _) in enumerate(batch):
+            error = failed.get(i)
+            if error is not None and raise_errors:
+                raise error
+            if future is None:
+                if error is not None and not isinstance(error, UnconfirmedWrite):
+                    self.dropped += 1
+                    logger.error(f"Dropped buffered insert into {collection} ({doc['_id']}): {error}")
+                continue
+            if not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(doc)
+
+    async def flush(self):
+        """
+        Writes everything queued so far and waits until it (and any batch
+        already being written) is done, e.g. before reading the collections.
+        """
+        self._flush()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def close(self):
+        """
+        Writes everything still queued; called on shutdown.
+        """
+        await self.flush()
+
+    def oldest_pending_age(self) -> float:
+        queued_at = [items[0][2] for items in self._pending.values() if items]
+        return time.monotonic() - min(queued_at) if queued_at else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queued,
+            "oldest_pending_seconds": round(self.oldest_pending_age(), 4),
+            "batches": self.batches,
+            "written": self.written,
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+            "write_errors": self.write_errors,
+            "write_concern_errors": self.write_concern_errors,
+            "dropped": self.dropped,
+            "retried": self.retried,
+            "backpressure_waits": self.backpressure_waits,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
+
+
+async def _record_diary_moods(db, entries: List[dict]):
+    await record_moods_batch(db, [(e["user_id"], e["timestamp"], e["sentiment"]) for e in entries])
+
+write_buffer = WriteBuffer(
+    flush_interval=settings.WRITE_BUFFER_FLUSH_MS / 1000,
+    max_batch=settings.WRITE_BUFFER_MAX_BATCH,
+    max_pending=settings.WRITE_BUFFER_MAX_PENDING,
+    retries=settings.WRITE_BUFFER_RETRIES,
+    write_concerns={
+        "moods": parse_write_concern(settings.WRITE_CONCERN_CHAT),
+        "diary_entries": parse_write_concern(settings.WRITE_CONCERN_JOURNAL),
+        "voices": parse_write_concern(settings.WRITE_CONCERN_JOURNAL),
+    },
+    after_write={"diary_entries": _record_diary_moods},
+    enabled=settings.WRITE_BUFFER_ENABLED,
+)
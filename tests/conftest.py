@@ -0,0 +1,53 @@
+import os
+from itertools import count
+
+import pytest
+
+# Settings are read at import time: keep the suite offline and fast
+os.environ.setdefault("GEMINI_FAKE_MODEL", "true")
+os.environ.setdefault("GEMINI_FAKE_CHUNK_DELAY_MS", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("STARTUP_BACKGROUND_WARMUP", "false")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def mongo():
+    from mongomock_motor import AsyncMongoMockClient
+    import database
+
+    # The app resolves its database lazily; point it at mongomock before main is imported
+    database.db = AsyncMongoMockClient()["echosense_test"]
+    return database.db
+
+
+@pytest.fixture(scope="session")
+def client(mongo):
+    from fastapi.testclient import TestClient
+    from database import get_db
+    from main import app
+
+    async def test_db():
+        yield mongo
+
+    app.dependency_overrides[get_db] = test_db
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+_users = count()
+
+@pytest.fixture
+def auth_headers(client):
+    """
+    Signs up a fresh user and returns their Authorization header.
+    """
+    name = f"user{next(_users)}"
+    response = client.post("/api/signup", json={"username": name, "email": f"{name}@example.com", "password": "Password123"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
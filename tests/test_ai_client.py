@@ -0,0 +1,73 @@
+import httpx
+import pytest
+
+from services.ai_client import AIClientError, GeminiClient
+
+pytestmark = pytest.mark.anyio
+
+
+def sse(text: str) -> bytes:
+    return f'data: {{"candidates": [{{"content": {{"parts": [{{"text": "{text}"}}]}}}}]}}\r\n\r\n'.encode()
+
+
+class BrokenBody(httpx.AsyncByteStream):
+    """Sends one SSE event, then the connection drops."""
+
+    async def __aiter__(self):
+        yield sse("Hello ")
+        raise httpx.ReadError("connection reset")
+
+
+def client_with(handler) -> GeminiClient:
+    client = GeminiClient(api_key="test", base_url="http://gemini.test", max_retries=2, retry_backoff=0)
+    client._http = httpx.AsyncClient(base_url="http://gemini.test", transport=httpx.MockTransport(handler))
+    return client
+
+
+async def collect(client: GeminiClient, chunks: list):
+    async for text in client.stream("hi"):
+        chunks.append(text)
+
+
+async def test_stream_failing_mid_reply_is_not_replayed():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, stream=BrokenBody())
+
+    client = client_with(handler)
+    chunks = []
+    with pytest.raises(AIClientError):
+        await collect(client, chunks)
+    assert chunks == ["Hello "]
+    assert len(requests) == 1
+
+
+async def test_stream_retries_before_first_chunk():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, content=sse("Hello ") + sse("there"))
+
+    client = client_with(handler)
+    chunks = []
+    await collect(client, chunks)
+    assert chunks == ["Hello ", "there"]
+    assert len(requests) == 2
+
+
+async def test_stream_gives_up_after_retries():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        raise httpx.ConnectError("refused")
+
+    client = client_with(handler)
+    with pytest.raises(AIClientError):
+        await collect(client, [])
+    assert len(requests) == 3
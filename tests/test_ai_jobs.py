@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from services import ai_jobs
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["echosense_test"]
+
+
+async def pending_entry(db) -> dict:
+    entry = {"_id": ObjectId(), "user_id": ObjectId(), "text": "Long day, but a good one.", "sentiment": "happy",
+             "gemini_response": None, "reply_status": "pending", "timestamp": datetime.utcnow()}
+    await db["diary_entries"].insert_one(entry)
+    await ai_jobs.enqueue_reply_job(db, entry, use_cache=False)
+    return entry
+
+
+async def test_job_fills_in_the_reply_and_wakes_the_waiter(db):
+    entry = await pending_entry(db)
+    waiting = asyncio.create_task(ai_jobs.wait_for_reply(str(entry["_id"]), timeout=5))
+    await asyncio.sleep(0)
+
+    job = await ai_jobs.claim_job(db)
+    assert job["_id"] == entry["_id"]
+    await ai_jobs.process_job(db, job)
+
+    assert await asyncio.wait_for(waiting, 1) is True
+    stored = await db["diary_entries"].find_one({"_id": entry["_id"]})
+    assert stored["reply_status"] == "done"
+    assert stored["gemini_response"]
+    assert (await db[ai_jobs.JOBS].find_one({"_id": entry["_id"]}))["status"] == "done"
+
+
+async def test_claimed_job_is_not_handed_out_twice(db):
+    await pending_entry(db)
+    assert await ai_jobs.claim_job(db) is not None
+    assert await ai_jobs.claim_job(db) is None
+
+
+async def test_waiter_timing_out_does_not_strand_another_waiter(db):
+    entry = await pending_entry(db)
+    entry_id = str(entry["_id"])
+    patient = asyncio.create_task(ai_jobs.wait_for_reply(entry_id, timeout=5))
+    assert await ai_jobs.wait_for_reply(entry_id, timeout=0.01) is False
+
+    await ai_jobs.process_job(db, await ai_jobs.claim_job(db))
+    assert await asyncio.wait_for(patient, 1) is True
+    assert entry_id not in ai_jobs._waiters
+
+
+async def test_last_waiter_cleans_up(db):
+    assert await ai_jobs.wait_for_reply("nobody-writes-this", timeout=0.01) is False
+    assert "nobody-writes-this" not in ai_jobs._waiters
+
+
+async def test_sweeper_requeues_pending_entries_without_a_job(db):
+    await pending_entry(db)
+    orphan = {"_id": ObjectId(), "user_id": ObjectId(), "text": "Enqueue was lost.", "sentiment": "sad",
+              "gemini_response": None, "reply_status": "pending", "timestamp": datetime.utcnow() - timedelta(minutes=5)}
+    fresh = dict(orphan, _id=ObjectId(), timestamp=datetime.utcnow())
+    await db["diary_entries"].insert_many([orphan, fresh])
+
+    assert await ai_jobs.sweep_pending(db, older_than=60) == 1
+    assert await db[ai_jobs.JOBS].count_documents({}) == 2
+    assert await db[ai_jobs.JOBS].find_one({"_id": orphan["_id"]}) is not None
+    # Idempotent: the re-queued entry now has its job
+    assert await ai_jobs.sweep_pending(db, older_than=60) == 0
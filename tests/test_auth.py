@@ -0,0 +1,67 @@
+from itertools import count
+
+_users = count()
+
+
+def signup(client, password="Password123"):
+    name = f"auth{next(_users)}"
+    response = client.post("/api/signup", json={"username": name, "email": f"{name}@example.com", "password": password})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def refresh(client, token):
+    return client.post("/api/refresh", json={"refresh_token": token})
+
+
+def bearer(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def test_refresh_rotates_the_token(client):
+    first = signup(client)
+    second = refresh(client, first["refresh_token"])
+
+    assert second.status_code == 200
+    assert second.json()["refresh_token"] != first["refresh_token"]
+    assert refresh(client, second.json()["refresh_token"]).status_code == 200
+
+
+def test_reusing_a_spent_token_revokes_the_session(client):
+    first = signup(client)
+    successor = refresh(client, first["refresh_token"]).json()["refresh_token"]
+
+    assert refresh(client, first["refresh_token"]).status_code == 401
+    # The thief and the legitimate client are both out
+    assert refresh(client, successor).status_code == 401
+
+
+def test_access_token_is_not_a_refresh_token(client):
+    tokens = signup(client)
+    assert refresh(client, tokens["access_token"]).status_code == 401
+    assert client.get("/api/diary", headers={"Authorization": f"Bearer {tokens['refresh_token']}"}).status_code == 401
+
+
+def test_logout_ends_only_that_session(client):
+    signup(client)
+    tokens = signup(client)
+    other = client.post("/api/login", json={"email": tokens["user"]["email"], "password": "Password123"}).json()
+
+    assert client.post("/api/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
+    assert refresh(client, other["refresh_token"]).status_code == 200
+
+
+def test_password_change_revokes_every_session(client):
+    tokens = signup(client)
+    other = client.post("/api/login", json={"email": tokens["user"]["email"], "password": "Password123"}).json()
+
+    wrong = client.put("/api/password", json={"current_password": "nope", "new_password": "Password456"}, headers=bearer(tokens))
+    assert wrong.status_code == 401
+
+    changed = client.put("/api/password", json={"current_password": "Password123", "new_password": "Password456"}, headers=bearer(tokens))
+    assert changed.status_code == 200
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
+    assert refresh(client, other["refresh_token"]).status_code == 401
+    assert refresh(client, changed.json()["refresh_token"]).status_code == 200
+    assert client.post("/api/login", json={"email": tokens["user"]["email"], "password": "Password456"}).status_code == 200
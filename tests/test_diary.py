@@ -0,0 +1,19 @@
+from services.write_buffer import UnconfirmedWrite, write_buffer
+
+
+def test_unconfirmed_write_is_a_retryable_503_with_the_id(client, auth_headers, mongo, monkeypatch):
+    real_insert = write_buffer.insert
+
+    async def insert_unconfirmed(db, collection, doc, wait=False):
+        await real_insert(db, collection, doc, wait=True)
+        raise UnconfirmedWrite({"code": 64, "errmsg": "waiting for replication timed out"}, doc)
+
+    monkeypatch.setattr(write_buffer, "insert", insert_unconfirmed)
+    response = client.post("/api/diary?async_reply=false", json={"content": "Quiet evening."}, headers=auth_headers)
+    monkeypatch.undo()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    entry = client.get(f"/api/diary/{response.json()['id']}", headers=auth_headers)
+    assert entry.status_code == 200
+    assert entry.json()["text"] == "Quiet evening."
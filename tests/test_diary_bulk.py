@@ -0,0 +1,53 @@
+from pymongo.errors import BulkWriteError
+
+
+
+def entries(*texts):
+    return {"entries": [{"content": t, "timestamp": "2026-03-0%dT10:00:00" % (i + 1)} for i, t in enumerate(texts)]}
+
+
+def test_bulk_import_scores_and_counts_entries(client, auth_headers):
+    response = client.post("/api/diary/bulk", json=entries("What a wonderful day!", "I feel awful and sad."), headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == {"inserted": 2, "failed": 0, "sentiments": {"happy": 1, "sad": 1}}
+
+
+def test_partial_failure_imports_the_rest_and_updates_rollups(client, auth_headers, mongo, monkeypatch):
+    coll = type(mongo["diary_entries"])
+    real_insert_many = coll.insert_many
+
+    async def insert_all_but_second(self, docs, ordered=True, **kwargs):
+        await real_insert_many(self, [d for i, d in enumerate(docs) if i != 1], ordered=ordered)
+        raise BulkWriteError({"writeErrors": [{"index": 1, "code": 2, "errmsg": "document failed validation"}],
+                              "writeConcernErrors": [], "nInserted": len(docs) - 1})
+
+    monkeypatch.setattr(coll, "insert_many", insert_all_but_second)
+    response = client.post("/api/diary/bulk", json=entries("Great!", "Terrible.", "Lovely walk, happy."), headers=auth_headers)
+    monkeypatch.undo()
+
+    assert response.status_code == 200
+    assert response.json() == {"inserted": 2, "failed": 1, "sentiments": {"happy": 2}}
+
+    board = client.get("/api/mood-board?period=custom&start=2026-03-01&end=2026-03-03", headers=auth_headers).json()
+    assert [b["total"] for b in board["buckets"] if b["total"]] == [1, 1]
+    assert sum(b["sad"] for b in board["buckets"]) == 0
+
+
+def test_bulk_import_limit(client, auth_headers):
+    from utils.config import settings
+    too_many = {"entries": [{"content": "x"}] * (settings.DIARY_BULK_MAX_ENTRIES + 1)}
+    assert client.post("/api/diary/bulk", json=too_many, headers=auth_headers).status_code == 413
+
+
+def test_bulk_import_is_rate_limited_by_entry_count(client, auth_headers, monkeypatch):
+    from services.admission import LocalBuckets, rate_limiter
+    from utils.config import settings
+    monkeypatch.setattr(rate_limiter, "per_user", LocalBuckets(rate=0.01, burst=3))
+    monkeypatch.setattr(settings, "DIARY_BULK_ENTRIES_PER_TOKEN", 2)
+
+    # 4 entries cost 2 of the 3 tokens, so the next import of 4 is over the limit
+    assert client.post("/api/diary/bulk", json=entries("a", "b", "c", "d"), headers=auth_headers).status_code == 200
+    response = client.post("/api/diary/bulk", json=entries("a", "b", "c", "d"), headers=auth_headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "100"
+    assert client.post("/api/diary/bulk", json=entries("a"), headers=auth_headers).status_code == 200
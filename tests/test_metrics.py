@@ -0,0 +1,60 @@
+import pytest
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils.metrics import REQUEST_SECONDS, route_label
+
+
+@pytest.fixture(scope="module")
+def labels():
+    """
+    GET path -> route label, from an app with nested, repeated and mounted routers.
+    """
+    router = APIRouter()
+
+    @router.get("/diary/{entry_id}")
+    async def entry(entry_id: str, request: Request):
+        return route_label(request.scope)
+
+    @router.get("/files/{name:path}")
+    async def files(name: str, request: Request):
+        return route_label(request.scope)
+
+    outer = APIRouter()
+    outer.include_router(router, prefix="/inner")
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    app.include_router(router, prefix="/api/v2")
+    app.include_router(outer, prefix="/nested")
+    sub = FastAPI()
+    sub.include_router(router, prefix="/v1")
+    app.mount("/sub", sub)
+
+    client = TestClient(app)
+    return lambda path: client.get(path).json()
+
+
+@pytest.mark.parametrize("path, label", [
+    ("/api/diary/65f0c0ffee", "/api/diary/{entry_id}"),
+    ("/api/v2/diary/65f0c0ffee", "/api/v2/diary/{entry_id}"),
+    ("/nested/inner/diary/1", "/nested/inner/diary/{entry_id}"),
+    ("/sub/v1/diary/1", "/sub/v1/diary/{entry_id}"),
+    # Slashes inside a value, encoded or not, must not shift the prefix
+    ("/api/files/a/b/c", "/api/files/{name}"),
+    ("/api/files/a%2Fb", "/api/files/{name}"),
+    ("/sub/v1/files/x/y", "/sub/v1/files/{name}"),
+])
+def test_route_label_is_the_full_template(labels, path, label):
+    assert labels(path) == label
+
+
+def test_unmatched_requests_share_one_label():
+    assert route_label({"route": None, "path": "/nowhere"}) == "unmatched"
+
+
+def test_requests_are_labelled_with_the_full_template(client, auth_headers):
+    client.get("/api/diary/65f0c0ffee0000000000beef", headers=auth_headers)
+
+    assert ("GET", "/api/diary/{entry_id}", 404) in REQUEST_SECONDS._series
+    assert ("POST", "/api/signup", 200) in REQUEST_SECONDS._series
+    assert 'route="/signup"' not in client.get("/metrics").text
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from services.mood_rollups import (
+    MOODS, ROLLUPS, RECENT_PER_DAY, bucket_start, get_mood_analytics, record_mood, record_moods_batch, rebuild_rollups,
+)
+
+pytestmark = pytest.mark.anyio
+
+DAY = datetime(2026, 3, 2, 8, 0)
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["echosense_test"]
+
+
+async def rollups(db, user_id) -> dict:
+    # $inc only creates the moods that occurred, so missing counts are zero
+    return {
+        doc["day"]: {**{mood: doc.get(mood, 0) for mood in MOODS}, "recent": doc["recent"]}
+        async for doc in db[ROLLUPS].find({"user_id": user_id})
+    }
+
+
+async def test_record_mood_increments_the_day(db):
+    user = ObjectId()
+    for i, sentiment in enumerate(["happy", "sad", "happy", "angry"]):
+        await record_mood(db, user, sentiment, DAY + timedelta(minutes=i))
+
+    day = (await rollups(db, user))["2026-03-02"]
+    assert (day["happy"], day["sad"], day["neutral"]) == (2, 1, 1)
+    assert [item["s"] for item in day["recent"]] == ["happy", "sad", "happy", "angry"]
+
+
+async def test_batch_groups_by_user_and_day_and_caps_recent(db):
+    a, b = ObjectId(), ObjectId()
+    entries = [(a, DAY + timedelta(minutes=i), "happy") for i in range(RECENT_PER_DAY + 2)]
+    entries += [(a, DAY + timedelta(days=1), "sad"), (b, DAY, "neutral")]
+    await record_moods_batch(db, entries)
+
+    days = await rollups(db, a)
+    assert days["2026-03-02"]["happy"] == RECENT_PER_DAY + 2
+    assert len(days["2026-03-02"]["recent"]) == RECENT_PER_DAY
+    assert days["2026-03-03"]["sad"] == 1
+    assert (await rollups(db, b))["2026-03-02"]["neutral"] == 1
+
+
+async def test_rebuild_matches_diary_entries(db):
+    user, other = ObjectId(), ObjectId()
+    entries = [(DAY, "happy"), (DAY + timedelta(hours=1), "sad"), (DAY + timedelta(days=2), "neutral")]
+    await db["diary_entries"].insert_many([{"user_id": user, "timestamp": t, "sentiment": s, "text": "x"} for t, s in entries])
+    await record_moods_batch(db, [(user, t, s) for t, s in entries])
+    expected = await rollups(db, user)
+
+    # Drift: a lost increment, a day whose entries were deleted, and another user's data
+    await db[ROLLUPS].update_one({"user_id": user, "day": "2026-03-02"}, {"$inc": {"sad": -1}})
+    await record_mood(db, user, "happy", DAY - timedelta(days=5))
+    await record_mood(db, other, "happy", DAY)
+
+    assert await rebuild_rollups(db, user) == 2
+    assert await rollups(db, user) == expected
+    assert list(await rollups(db, other)) == ["2026-03-02"]
+
+
+async def test_rebuild_everyone_in_small_batches(db):
+    users = [ObjectId() for _ in range(3)]
+    await db["diary_entries"].insert_many([
+        {"user_id": u, "timestamp": DAY + timedelta(days=d), "sentiment": "happy", "text": "x"}
+        for u in users for d in range(2)
+    ])
+    assert await rebuild_rollups(db, batch_size=4) == 6
+    assert await db[ROLLUPS].count_documents({}) == 6
+
+
+async def test_week_and_month_buckets(db):
+    user = ObjectId()
+    # 2026-03-04 is a Wednesday: its week starts on Monday 03-02, before the range does
+    for day, sentiment in [("03", "sad"), ("04", "happy"), ("08", "sad"), ("09", "happy"), ("31", "neutral")]:
+        await record_mood(db, user, sentiment, datetime(2026, 3, int(day), 12))
+    await record_mood(db, user, "happy", datetime(2026, 4, 1, 12))
+
+    weeks = await get_mood_analytics(db, user, "2026-03-04", "2026-03-31", "week")
+    assert [(b["start"], b["happy"], b["sad"], b["total"]) for b in weeks] == [
+        ("2026-03-02", 1, 1, 2),
+        ("2026-03-09", 1, 0, 1),
+        ("2026-03-30", 0, 0, 1),
+    ]
+    assert weeks[0]["avg_score"] == 0 and weeks[1]["avg_score"] == 1
+
+    months = await get_mood_analytics(db, user, "2026-03-04", "2026-04-30", "month")
+    assert [(b["start"], b["total"]) for b in months] == [("2026-03-01", 4), ("2026-04-01", 1)]
+
+    days = await get_mood_analytics(db, user, "2026-03-08", "2026-03-09")
+    assert [b["start"] for b in days] == ["2026-03-08", "2026-03-09"]
+
+
+def test_week_starts_on_monday_across_month_and_year():
+    assert bucket_start("2026-03-01", "week") == "2026-02-23"
+    assert bucket_start("2027-01-01", "week") == "2026-12-28"
+    assert bucket_start("2026-03-02", "week") == "2026-03-02"
+    assert bucket_start("2026-02-28", "month") == "2026-02-01"
+
+
+@pytest.mark.parametrize("query, status", [
+    ("period=custom&start=2026-03-01&end=2026-03-31&granularity=week", 200),
+    ("period=custom&start=2026-03-01", 400),
+    ("period=custom&start=2026-03-02&end=2026-03-01", 400),
+    ("period=custom&start=2020-01-01&end=2026-03-01", 400),
+    ("period=custom&start=2026-03-01&end=2026-03-31&granularity=hour", 422),
+])
+def test_mood_board_custom_range_validation(client, auth_headers, query, status):
+    response = client.get(f"/api/mood-board?{query}", headers=auth_headers)
+    assert response.status_code == status
+    if status == 200:
+        assert (response.json()["start"], response.json()["end"]) == ("2026-03-01", "2026-03-31")
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def import_entries(client, headers, timestamps):
+    body = {"entries": [{"content": f"entry {i}", "timestamp": ts} for i, ts in enumerate(timestamps)]}
+    assert client.post("/api/diary/bulk", json=body, headers=headers).status_code == 200
+
+
+def all_pages(client, headers, limit):
+    texts, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/diary", params=params, headers=headers).json()
+        texts += [item["text"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return texts
+
+
+def test_cursor_round_trip():
+    doc = {"timestamp": datetime(2026, 3, 1, 10, 0, 0, 123000), "_id": ObjectId()}
+    assert decode_cursor(encode_cursor(doc)) == (doc["timestamp"], doc["_id"])
+    with pytest.raises(HTTPException):
+        decode_cursor("not-a-cursor")
+
+
+def test_pages_are_newest_first_without_gaps_or_repeats(client, auth_headers):
+    # Two entries share a timestamp: _id breaks the tie across the page boundary
+    import_entries(client, auth_headers, ["2026-03-01T10:00:00", "2026-03-02T10:00:00", "2026-03-02T10:00:00",
+                                          "2026-03-03T10:00:00", "2026-03-04T10:00:00"])
+
+    texts = all_pages(client, auth_headers, limit=2)
+    assert sorted(texts) == [f"entry {i}" for i in range(5)]
+    assert texts[0] == "entry 4" and texts[-1] == "entry 0"
+    assert all_pages(client, auth_headers, limit=100) == texts
+
+
+def test_invalid_cursor_is_a_400(client, auth_headers):
+    assert client.get("/api/diary", params={"cursor": "bogus"}, headers=auth_headers).status_code == 400
+
+
+def test_unchanged_page_is_a_304_until_an_entry_is_added(client, auth_headers):
+    import_entries(client, auth_headers, ["2026-03-01T10:00:00"])
+    first = client.get("/api/diary", headers=auth_headers)
+    etag = first.headers["ETag"]
+
+    again = client.get("/api/diary", headers={**auth_headers, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.content == b""
+
+    import_entries(client, auth_headers, ["2026-03-02T10:00:00"])
+    changed = client.get("/api/diary", headers={**auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()["items"]) == 2
+
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from services.admission import AIGate, LocalBuckets, RateLimiter, TokenBucket
+
+pytestmark = pytest.mark.anyio
+
+
+def test_bucket_allows_the_burst_then_reports_the_wait():
+    bucket = TokenBucket(rate=2, burst=3, now=0.0)
+    assert [bucket.take(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Empty: one token comes back after 1 / rate seconds
+    assert bucket.take(0.0) == pytest.approx(0.5)
+
+
+def test_bucket_refills_with_time_up_to_the_burst():
+    bucket = TokenBucket(rate=2, burst=3, now=0.0)
+    for _ in range(3):
+        bucket.take(0.0)
+
+    assert bucket.take(0.5) == 0.0
+    assert bucket.take(0.5) > 0
+    assert bucket.take(100.0) == 0.0
+    assert bucket.tokens == pytest.approx(2)
+
+
+def test_weighted_take_over_the_burst_needs_a_full_bucket_and_leaves_debt():
+    bucket = TokenBucket(rate=2, burst=3, now=0.0)
+    assert bucket.take(0.0, cost=2) == 0.0
+    assert bucket.take(0.0, cost=2) == pytest.approx(0.5)
+
+    assert bucket.take(10.0, cost=7) == 0.0
+    assert bucket.tokens == pytest.approx(-4)
+    # The debt is repaid before even a single token is available
+    assert bucket.take(10.0) == pytest.approx(2.5)
+
+
+async def test_local_buckets_are_per_key():
+    buckets = LocalBuckets(rate=0.001, burst=1)
+    assert await buckets.take("user:a") == 0.0
+    assert await buckets.take("user:a") > 0
+    assert await buckets.take("user:b") == 0.0
+
+
+async def test_local_buckets_drop_the_least_recently_used_key():
+    buckets = LocalBuckets(rate=0.001, burst=1, max_keys=2)
+    await buckets.take("a")
+    await buckets.take("b")
+    await buckets.take("a")
+    await buckets.take("c")
+    assert list(buckets._buckets) == ["a", "c"]
+
+
+async def test_limiter_rejects_with_retry_after():
+    limiter = RateLimiter(per_user=LocalBuckets(rate=0.5, burst=1))
+    await limiter.check("u1")
+
+    with pytest.raises(HTTPException) as rejected:
+        await limiter.check("u1")
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers == {"Retry-After": "2"}
+
+
+async def test_user_over_the_limit_does_not_drain_the_global_bucket():
+    global_bucket = LocalBuckets(rate=0.001, burst=2)
+    limiter = RateLimiter(per_user=LocalBuckets(rate=0.001, burst=1), global_bucket=global_bucket)
+    await limiter.check("noisy")
+    for _ in range(3):
+        with pytest.raises(HTTPException):
+            await limiter.check("noisy")
+
+    await limiter.check("quiet")
+    with pytest.raises(HTTPException) as rejected:
+        await limiter.check("third")
+    assert rejected.value.detail == "The service is busy, please retry shortly"
+
+
+async def test_gate_times_out_a_waiter_and_keeps_its_permits():
+    gate = AIGate(max_concurrency=1, max_queue=10, shed_wait=1, queue_timeout=0.01)
+    async with gate.slot():
+        with pytest.raises(HTTPException) as rejected:
+            async with gate.slot():
+                pass
+    assert rejected.value.status_code == 503
+    assert gate.stats() == {"in_flight": 0, "capacity": 1, "queued": 0, "queue_delay_seconds": 0.0}
+
+    async with gate.slot():
+        assert gate.in_flight == 1
+
+
+async def test_waiter_cancelled_as_its_permit_arrives_hands_it_on():
+    gate = AIGate(max_concurrency=1, max_queue=10, shed_wait=1, queue_timeout=10)
+
+    async def wait_for_slot():
+        async with gate.slot():
+            pass
+
+    held = gate.slot()
+    await held.__aenter__()
+    waiter = asyncio.create_task(wait_for_slot())
+    await asyncio.sleep(0)
+
+    # The permit goes to the waiter, which is cancelled before it gets to run
+    await held.__aexit__(None, None, None)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    async with asyncio.timeout(1):
+        async with gate.slot():
+            assert gate.in_flight == 1
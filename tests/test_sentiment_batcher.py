@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services import sentiment_service
+from services.sentiment_service import MicroBatcher
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingEngine:
+    name = "fake"
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def analyze_batch(self, texts):
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("model crashed")
+        self.batches.append(list(texts))
+        return ["happy" if "good" in t else "sad" for t in texts]
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = RecordingEngine()
+    monkeypatch.setattr(sentiment_service, "get_engine", lambda: engine)
+    return engine
+
+
+async def test_concurrent_texts_are_scored_in_one_batch(engine):
+    batcher = MicroBatcher(max_batch=32, max_wait=0.01)
+    labels = await asyncio.gather(*[batcher.submit(t) for t in ("good day", "bad day", "good news")])
+
+    assert labels == ["happy", "sad", "happy"]
+    assert engine.batches == [["good day", "bad day", "good news"]]
+    await batcher.close()
+
+
+async def test_full_batch_runs_without_waiting_for_the_timer(engine):
+    batcher = MicroBatcher(max_batch=2, max_wait=60)
+    labels = await asyncio.wait_for(asyncio.gather(batcher.submit("good"), batcher.submit("bad")), 5)
+    assert labels == ["happy", "sad"]
+    await batcher.close()
+
+
+async def test_engine_error_reaches_every_caller(monkeypatch):
+    monkeypatch.setattr(sentiment_service, "get_engine", lambda: RecordingEngine(fail=True))
+    batcher = MicroBatcher(max_batch=32, max_wait=0.001)
+    results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    await batcher.close()
+
+
+async def test_running_batch_is_held_and_drained_on_close(engine):
+    engine.release.clear()
+    batcher = MicroBatcher(max_batch=32, max_wait=0.001)
+    pending = asyncio.ensure_future(batcher.submit("good"))
+    await asyncio.sleep(0.05)
+    assert len(batcher._tasks) == 1
+
+    engine.release.set()
+    await batcher.close()
+    assert pending.done() and pending.result() == "happy"
+    assert not batcher._tasks
+
+
+async def test_close_scores_texts_still_waiting_for_the_timer(engine):
+    batcher = MicroBatcher(max_batch=32, max_wait=60)
+    pending = asyncio.ensure_future(batcher.submit("bad"))
+    await asyncio.sleep(0)
+    await batcher.close()
+    assert pending.result() == "sad"
+
+
+async def test_engine_loads_once_off_the_event_loop(monkeypatch):
+    loads = []
+
+    class SlowEngine(RecordingEngine):
+        name = "transformer"
+
+        def __init__(self):
+            super().__init__()
+            time.sleep(0.2)
+            loads.append(self)
+
+        def warm_up(self):
+            self.analyze_batch(["warm up"])
+
+    monkeypatch.setattr(sentiment_service, "_engine", None)
+    monkeypatch.setattr(sentiment_service.settings, "SENTIMENT_ENGINE", "transformer")
+    monkeypatch.setattr(sentiment_service, "TransformerEngine", SlowEngine)
+    monkeypatch.setattr(sentiment_service, "_batcher", MicroBatcher(max_batch=32, max_wait=0.001))
+
+    started = time.perf_counter()
+    ticks = asyncio.ensure_future(asyncio.sleep(0.01))
+    requests = asyncio.gather(sentiment_service.warm_up_sentiment(),
+                              *[sentiment_service.analyze_sentiment_async("good day") for _ in range(5)])
+    await ticks
+    # The loop kept running while the model loaded
+    assert time.perf_counter() - started < 0.15
+
+    results = await requests
+    assert results[1:] == ["happy"] * 5
+    assert len(loads) == 1
+    await sentiment_service._batcher.close()
@@ -0,0 +1,32 @@
+import pytest
+
+from serve import worker_env
+from utils.config import settings
+
+
+@pytest.fixture(autouse=True)
+def no_overrides(monkeypatch):
+    for name in ("AI_JOB_WORKERS", "AI_MAX_CONCURRENCY", "MONGO_MAX_POOL_SIZE"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_totals_are_split_across_workers(monkeypatch):
+    monkeypatch.setattr(settings, "AI_JOB_WORKERS", 4)
+    monkeypatch.setattr(settings, "AI_MAX_CONCURRENCY", 16)
+    monkeypatch.setattr(settings, "MONGO_POOL_BUDGET", 100)
+    env = worker_env(workers=8, cpus=8)
+
+    assert env["AI_JOB_WORKERS"] == "1"
+    assert env["AI_MAX_CONCURRENCY"] == "2"
+    assert env["MONGO_MAX_POOL_SIZE"] == "12"
+    assert worker_env(workers=2, cpus=8)["AI_JOB_WORKERS"] == "2"
+
+
+def test_disabled_job_workers_stay_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "AI_JOB_WORKERS", 0)
+    assert worker_env(workers=4, cpus=4)["AI_JOB_WORKERS"] == "0"
+
+
+def test_explicit_per_worker_values_win(monkeypatch):
+    monkeypatch.setenv("AI_JOB_WORKERS", "3")
+    assert "AI_JOB_WORKERS" not in worker_env(workers=4, cpus=4)
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+class Counted:
+    """
+    A slow computation that counts how often it really runs.
+    """
+
+    def __init__(self, result="value", delay=0.01):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.result
+
+    async def chunks(self):
+        self.calls += 1
+        for word in ("one ", "two ", "three"):
+            await asyncio.sleep(self.delay)
+            yield word
+
+
+async def collect(stream) -> str:
+    return "".join([chunk async for chunk in stream])
+
+
+async def test_concurrent_callers_share_one_call():
+    flights, fn = SingleFlight(), Counted()
+    results = await asyncio.gather(*[flights.do("key", fn) for _ in range(10)])
+
+    assert results == ["value"] * 10
+    assert fn.calls == 1
+    assert flights.stats() == {"leaders": 1, "coalesced": 9, "window_hits": 0, "in_flight": 0}
+
+
+async def test_different_keys_do_not_share():
+    flights, fn = SingleFlight(), Counted()
+    await asyncio.gather(flights.do("a", fn), flights.do("b", fn))
+    assert fn.calls == 2
+
+
+async def test_window_serves_repeats_and_discard_forgets_them():
+    flights, fn = SingleFlight(window=60), Counted()
+    await flights.do("key", fn)
+    await flights.do("key", fn)
+    assert fn.calls == 1
+    assert flights.window_hits == 1
+
+    flights.discard(lambda key: key == "key")
+    await flights.do("key", fn)
+    assert fn.calls == 2
+
+
+async def test_failure_is_shared_but_not_remembered():
+    flights = SingleFlight(window=60)
+    calls = 0
+
+    async def boom():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model down")
+
+    results = await asyncio.gather(flights.do("key", boom), flights.do("key", boom), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls == 1
+
+    with pytest.raises(RuntimeError):
+        await flights.do("key", boom)
+    assert calls == 2
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_call():
+    flights, fn = SingleFlight(), Counted(delay=0.05)
+    first = asyncio.ensure_future(flights.do("key", fn))
+    second = asyncio.ensure_future(flights.do("key", fn))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == "value"
+    assert fn.calls == 1
+
+
+async def test_stream_subscribers_all_get_every_chunk():
+    flights, fn = SingleFlight(), Counted()
+    early = asyncio.ensure_future(collect(flights.stream("key", fn.chunks)))
+    await asyncio.sleep(0.015)
+    # Joins after the first chunk: replays it, then follows the producer
+    late = await collect(flights.stream("key", fn.chunks))
+
+    assert await early == late == "one two three"
+    assert fn.calls == 1
+
+
+async def test_stream_keeps_going_when_the_first_subscriber_leaves():
+    flights, fn = SingleFlight(), Counted()
+    first = flights.stream("key", fn.chunks)
+    assert await first.__anext__() == "one "
+    second = asyncio.ensure_future(collect(flights.stream("key", fn.chunks)))
+    await first.aclose()
+
+    assert await second == "one two three"
+    assert fn.calls == 1
+
+
+async def test_disabled_runs_every_call():
+    flights, fn = SingleFlight(enabled=False), Counted()
+    await asyncio.gather(flights.do("key", fn), flights.do("key", fn))
+    assert fn.calls == 2
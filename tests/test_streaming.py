@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from routers.chat import stream_chat
+from routers.diary import stream_diary_entry
+from schemas import ChatMessageRequest, DiaryCreateRequest
+from services import ai_jobs
+from services.write_buffer import write_buffer
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["echosense_test"]
+
+
+async def frames(response, count: int) -> list:
+    """
+    Reads `count` SSE frames, then disconnects like a closed browser tab.
+    """
+    body = response.body_iterator
+    received = [await body.__anext__() for _ in range(count)]
+    await body.aclose()
+    return received
+
+
+async def test_chat_stream_completes_and_stores_the_turn(db):
+    user = {"_id": ObjectId()}
+    response = await stream_chat(ChatMessageRequest(message="Today was a good day"), db=db, current_user=user)
+    received = [frame async for frame in response.body_iterator]
+    await write_buffer.flush()
+
+    assert received[-1].startswith("event: done")
+    turn = await db["moods"].find_one({"user_id": user["_id"]})
+    assert turn["bot_response"].startswith("I hear you.")
+
+
+async def test_chat_stream_disconnect_keeps_the_partial_turn(db):
+    user = {"_id": ObjectId()}
+    response = await stream_chat(ChatMessageRequest(message="Today was a good day"), db=db, current_user=user)
+    received = await frames(response, 3)
+    await write_buffer.flush()
+
+    deltas = [json.loads(frame.split("data: ", 1)[1])["delta"] for frame in received[1:]]
+    turn = await db["moods"].find_one({"user_id": user["_id"]})
+    assert turn["bot_response"] == "".join(deltas)
+
+
+async def test_diary_stream_disconnect_before_the_reply_queues_it(db):
+    user = {"_id": ObjectId()}
+    response = await stream_diary_entry(DiaryCreateRequest(content="Long walk, feeling calm."), db=db, current_user=user)
+    await frames(response, 1)
+
+    entry = await db["diary_entries"].find_one({"user_id": user["_id"]})
+    assert entry["text"] == "Long walk, feeling calm."
+    assert entry["reply_status"] == "pending"
+    assert await db[ai_jobs.JOBS].find_one({"_id": entry["_id"]}) is not None
+
+
+async def test_diary_stream_disconnect_mid_reply_keeps_the_partial_reply(db):
+    user = {"_id": ObjectId()}
+    response = await stream_diary_entry(DiaryCreateRequest(content="Long walk, feeling calm."), db=db, current_user=user)
+    received = await frames(response, 2)
+
+    entry = await db["diary_entries"].find_one({"user_id": user["_id"]})
+    assert entry["gemini_response"] == json.loads(received[1].split("data: ", 1)[1])["delta"]
+    assert entry.get("reply_status") is None
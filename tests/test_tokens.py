@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from utils.tokens import TokenService, load_backend
+
+
+def service(keys, max_entries=100):
+    return TokenService(dict(keys), "HS256", load_backend("jose"), max_entries)
+
+
+def test_rotation_keeps_old_tokens_valid_until_the_key_is_dropped():
+    old = service({"a": "secret-a"})
+    token = old.issue({"user_id": "u1"}, timedelta(minutes=5))
+
+    rotated = service({"b": "secret-b", "a": "secret-a"})
+    assert rotated.verify(token)["user_id"] == "u1"
+    assert rotated.signing_kid == "b"
+
+    retired = service({"b": "secret-b"})
+    assert retired.verify(token) is None
+
+
+def test_cached_token_is_dropped_when_its_key_is_retired():
+    tokens = service({"b": "secret-b", "a": "secret-a"})
+    token = service({"a": "secret-a"}).issue({"user_id": "u1"}, timedelta(minutes=5))
+    assert tokens.verify(token) is not None
+    assert tokens.verify(token) is not None
+    assert tokens.hits == 1
+
+    del tokens.keys["a"]
+    assert tokens.verify(token) is None
+    assert token not in tokens._verified
+
+
+def test_token_types_are_not_interchangeable():
+    tokens = service({"a": "secret-a"})
+    access = tokens.issue({"user_id": "u1"}, timedelta(minutes=5))
+    refresh = tokens.issue({"user_id": "u1"}, timedelta(days=1), token_type="refresh")
+
+    assert tokens.verify(access)["typ"] == "access"
+    assert tokens.verify(refresh) is None
+    assert tokens.verify(access, token_type="refresh") is None
+    assert tokens.verify(refresh, token_type="refresh")["jti"]
+
+
+def test_expired_and_tampered_tokens_fail():
+    tokens = service({"a": "secret-a"})
+    assert tokens.verify(tokens.issue({"user_id": "u1"}, timedelta(seconds=-1))) is None
+    assert tokens.verify(service({"a": "other"}).issue({"user_id": "u1"}, timedelta(minutes=5))) is None
+    assert tokens.verify("not.a.token") is None
+
+
+def test_cache_is_bounded():
+    tokens = service({"a": "secret-a"}, max_entries=2)
+    for i in range(3):
+        tokens.verify(tokens.issue({"user_id": f"u{i}"}, timedelta(minutes=5)))
+    assert tokens.stats()["size"] == 2
+    assert tokens.evictions == 1
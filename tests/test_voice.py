@@ -0,0 +1,37 @@
+import pytest
+from fastapi import HTTPException
+from starlette.websockets import WebSocketDisconnect
+
+from services.admission import rate_limiter
+
+
+def test_live_diary_session_goes_through_admission(client, auth_headers, monkeypatch):
+    async def over_limit(user_id):
+        raise HTTPException(status_code=429, detail="Too many requests, please slow down", headers={"Retry-After": "7"})
+
+    monkeypatch.setattr(rate_limiter, "check", over_limit)
+    token = auth_headers["Authorization"].split()[1]
+    with client.websocket_connect(f"/api/voice/live?token={token}&diary=true") as ws:
+        assert ws.receive_json() == {"type": "error", "detail": "Too many requests, please slow down", "retry_after": 7}
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1013
+
+
+def test_live_transcription_without_diary_is_not_rate_limited(client, auth_headers, monkeypatch):
+    async def over_limit(user_id):
+        raise HTTPException(status_code=429, detail="Too many requests, please slow down")
+
+    monkeypatch.setattr(rate_limiter, "check", over_limit)
+    token = auth_headers["Authorization"].split()[1]
+    with client.websocket_connect(f"/api/voice/live?token={token}") as ws:
+        assert ws.receive_json() == {"type": "ready"}
+
+
+def test_live_session_refuses_other_sample_rates(client, auth_headers):
+    token = auth_headers["Authorization"].split()[1]
+    with client.websocket_connect(f"/api/voice/live?token={token}&sample_rate=44100") as ws:
+        assert ws.receive_json() == {"type": "error", "detail": "Send 16-bit mono PCM at 16000 Hz"}
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1003
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import AutoReconnect, BulkWriteError, DuplicateKeyError
+
+from services.write_buffer import UnconfirmedWrite, WriteBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+class FlakyDB:
+    """
+    Wraps a mongomock database; `fail(attempt, coll, docs)` runs before each
+    insert_many and may write part of the batch and/or raise.
+    """
+
+    def __init__(self, db, fail):
+        self.db = db
+        self.fail = fail
+        self.attempts = 0
+
+    def get_collection(self, name, write_concern=None):
+        outer = self
+        real = self.db.get_collection(name)
+
+        class Collection:
+            def __init__(self):
+                self.name = name
+
+            def find(self, *args, **kwargs):
+                return real.find(*args, **kwargs)
+
+            async def insert_many(self, docs, ordered=True):
+                outer.attempts += 1
+                await outer.fail(outer.attempts, real, docs)
+                return await real.insert_many(docs, ordered=ordered)
+
+        return Collection()
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["echosense_test"]
+
+
+async def test_concurrent_inserts_share_one_batch(db):
+    buffer = WriteBuffer(flush_interval=0.01, max_batch=100, max_pending=1000)
+    docs = await asyncio.gather(*[buffer.insert(db, "moods", {"i": i}, wait=True) for i in range(20)])
+
+    assert buffer.batches == 1
+    assert await db["moods"].count_documents({}) == 20
+    assert all("_id" in doc for doc in docs)
+
+
+async def test_max_batch_flushes_without_waiting_for_the_timer(db):
+    buffer = WriteBuffer(flush_interval=60, max_batch=5, max_pending=1000)
+    await asyncio.wait_for(asyncio.gather(*[buffer.insert(db, "moods", {"i": i}, wait=True) for i in range(10)]), 5)
+    assert buffer.batches == 2
+
+
+async def test_retry_after_partial_write_does_not_duplicate(db):
+    async def fail(attempt, coll, docs):
+        if attempt == 1:
+            await coll.insert_many(docs[:2])
+            raise AutoReconnect("connection reset")
+
+    flaky = FlakyDB(db, fail)
+    buffer = WriteBuffer(flush_interval=0.001, max_batch=100, max_pending=1000, retries=2)
+    await asyncio.gather(*[buffer.insert(flaky, "moods", {"i": i}, wait=True) for i in range(5)])
+
+    assert buffer.retried == 1
+    assert buffer.write_errors == 0
+    assert await db["moods"].count_documents({}) == 5
+
+
+async def test_duplicate_only_fails_its_own_document(db):
+    await db["diary_entries"].create_index("key", unique=True)
+    await db["diary_entries"].insert_one({"key": "taken"})
+    buffer = WriteBuffer(flush_interval=0.001, max_batch=100, max_pending=1000)
+
+    results = await asyncio.gather(
+        buffer.insert(db, "diary_entries", {"key": "taken"}, wait=True),
+        buffer.insert(db, "diary_entries", {"key": "new"}, wait=True),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[0], DuplicateKeyError)
+    assert results[1]["key"] == "new"
+    assert await db["diary_entries"].count_documents({}) == 2
+
+
+async def test_write_concern_error_reports_stored_documents_as_unconfirmed(db):
+    async def fail(attempt, coll, docs):
+        await coll.insert_many(docs)
+        raise BulkWriteError({"writeErrors": [], "writeConcernErrors": [{"code": 64, "errmsg": "waiting for replication timed out"}]})
+
+    written = []
+
+    async def after_write(db, docs):
+        written.extend(docs)
+
+    buffer = WriteBuffer(flush_interval=0.001, max_batch=100, max_pending=1000, after_write={"diary_entries": after_write})
+    flaky = FlakyDB(db, fail)
+    results = await asyncio.gather(
+        *[buffer.insert(flaky, "diary_entries", {"i": i}, wait=True) for i in range(3)],
+        buffer.insert(flaky, "diary_entries", {"i": 3}),
+        return_exceptions=True,
+    )
+
+    unconfirmed = results[:3]
+    assert all(isinstance(r, UnconfirmedWrite) for r in unconfirmed)
+    assert [r.doc["i"] for r in unconfirmed] == [0, 1, 2]
+    assert buffer.write_concern_errors == 4
+    assert (buffer.written, buffer.write_errors, buffer.dropped) == (4, 0, 0)
+    # The documents are stored, so the rollup hook still sees them
+    assert [doc["i"] for doc in written] == [0, 1, 2, 3]
+
+
+async def test_flush_writes_fire_and_forget_inserts(db):
+    buffer = WriteBuffer(flush_interval=60, max_batch=100, max_pending=1000)
+    for i in range(3):
+        await buffer.insert(db, "moods", {"i": i})
+    assert await db["moods"].count_documents({}) == 0
+
+    await buffer.flush()
+    assert await db["moods"].count_documents({}) == 3
+    assert buffer.queued == 0
+
+
+async def test_disabled_buffer_writes_each_document(db):
+    buffer = WriteBuffer(flush_interval=60, max_batch=100, max_pending=1000, enabled=False)
+    await buffer.insert(db, "moods", {"i": 1})
+    assert await db["moods"].count_documents({}) == 1
+    assert buffer.batches == 1
@@ -12,6 +12,17 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "devsecret_change_me_in_production")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+
+    # JWT keys ("kid:secret,..."; first one signs) / backend (jose | pyjwt) / verified-token cache
+    JWT_KEYS: str = os.getenv("JWT_KEYS", "")
+    JWT_BACKEND: str = os.getenv("JWT_BACKEND", "jose").lower()
+    TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 10000))
+
+    # Password hashing (bcrypt work factor + process pool backpressure)
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
     
     # CORS
     _raw_origins = os.getenv(
@@ -24,8 +35,128 @@ class Settings:
     # Default MongoDB URL (local)
     MONGODB_URL: str = os.getenv("DATABASE_URL", "mongodb://localhost:27017")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "echosense")
+    DB_ENSURE_INDEXES: bool = os.getenv("DB_ENSURE_INDEXES", "True").lower() == "true"
+    DB_VERIFY_QUERY_PLANS: bool = os.getenv("DB_VERIFY_QUERY_PLANS", "False").lower() == "true"
+    # Connections per process; serve.py splits MONGO_POOL_BUDGET across its workers
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_POOL_BUDGET: int = int(os.getenv("MONGO_POOL_BUDGET", 100))
+
+    # Write-behind batching of chat/diary/voice inserts (services/write_buffer.py)
+    WRITE_BUFFER_ENABLED: bool = os.getenv("WRITE_BUFFER_ENABLED", "True").lower() == "true"
+    WRITE_BUFFER_FLUSH_MS: float = float(os.getenv("WRITE_BUFFER_FLUSH_MS", 10))
+    WRITE_BUFFER_MAX_BATCH: int = int(os.getenv("WRITE_BUFFER_MAX_BATCH", 200))
+    WRITE_BUFFER_MAX_PENDING: int = int(os.getenv("WRITE_BUFFER_MAX_PENDING", 10000))
+    WRITE_BUFFER_RETRIES: int = int(os.getenv("WRITE_BUFFER_RETRIES", 3))
+    WRITE_CONCERN_CHAT: str = os.getenv("WRITE_CONCERN_CHAT", "1")
+    WRITE_CONCERN_JOURNAL: str = os.getenv("WRITE_CONCERN_JOURNAL", "majority")
+
+    # Production serving (serve.py)
+    SERVE_HOST: str = os.getenv("SERVE_HOST", "0.0.0.0")
+    SERVE_PORT: int = int(os.getenv("PORT", 8000))
+    SERVE_WORKERS: int = int(os.getenv("SERVE_WORKERS", 0))  # 0 = one per available CPU
+    SERVE_GRACEFUL_TIMEOUT: float = float(os.getenv("SERVE_GRACEFUL_TIMEOUT", 30))
+
+    # Hot endpoints serialize with compiled serializers + orjson instead of response_model validation
+    FAST_SERIALIZATION: bool = os.getenv("FAST_SERIALIZATION", "True").lower() == "true"
+
+    # Startup: warm heavy resources in the background (readiness waits for them)
+    STARTUP_BACKGROUND_WARMUP: bool = os.getenv("STARTUP_BACKGROUND_WARMUP", "True").lower() == "true"
+    STARTUP_RETRY_INTERVAL: float = float(os.getenv("STARTUP_RETRY_INTERVAL", "5"))
     
     # AI Service
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-001")
+    GEMINI_API_BASE: str = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+
+    # Prompt engine: output budgets (maxOutputTokens) per endpoint and sampling temperature
+    AI_OUTPUT_TOKENS_CHAT: int = int(os.getenv("AI_OUTPUT_TOKENS_CHAT", 200))
+    AI_OUTPUT_TOKENS_DIARY: int = int(os.getenv("AI_OUTPUT_TOKENS_DIARY", 300))
+    AI_TEMPERATURE: float = float(os.getenv("AI_TEMPERATURE", 0.7))
+
+    # AI client pool / resilience
+    AI_MAX_CONCURRENCY: int = int(os.getenv("AI_MAX_CONCURRENCY", 32))
+    AI_MAX_CONNECTIONS: int = int(os.getenv("AI_MAX_CONNECTIONS", 64))
+    AI_TIMEOUT: float = float(os.getenv("AI_TIMEOUT", 15))
+    AI_CONNECT_TIMEOUT: float = float(os.getenv("AI_CONNECT_TIMEOUT", 5))
+    AI_MAX_RETRIES: int = int(os.getenv("AI_MAX_RETRIES", 2))
+    AI_RETRY_BACKOFF: float = float(os.getenv("AI_RETRY_BACKOFF", 0.5))
+
+    # Admission control for AI-backed endpoints (rates of 0 disable a limit)
+    RATE_LIMIT_USER_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", 20))
+    RATE_LIMIT_USER_BURST: float = float(os.getenv("RATE_LIMIT_USER_BURST", 5))
+    RATE_LIMIT_GLOBAL_PER_SECOND: float = float(os.getenv("RATE_LIMIT_GLOBAL_PER_SECOND", 50))
+    RATE_LIMIT_GLOBAL_BURST: float = float(os.getenv("RATE_LIMIT_GLOBAL_BURST", 100))
+    RATE_LIMIT_MONGO: bool = os.getenv("RATE_LIMIT_MONGO", "False").lower() == "true"
+    AI_MAX_QUEUE: int = int(os.getenv("AI_MAX_QUEUE", 200))
+    AI_SHED_QUEUE_WAIT: float = float(os.getenv("AI_SHED_QUEUE_WAIT", 2))
+    AI_QUEUE_TIMEOUT: float = float(os.getenv("AI_QUEUE_TIMEOUT", 10))
+
+    # Request coalescing: identical concurrent AI calls / mood-board reads share one
+    # computation, and its result is reused for COALESCE_WINDOW seconds afterwards
+    COALESCE_ENABLED: bool = os.getenv("COALESCE_ENABLED", "True").lower() == "true"
+    COALESCE_WINDOW: float = float(os.getenv("COALESCE_WINDOW", 1.0))
+
+    # Sentiment engine (vader | transformer)
+    SENTIMENT_ENGINE: str = os.getenv("SENTIMENT_ENGINE", "vader").lower()
+    SENTIMENT_MODEL: str = os.getenv("SENTIMENT_MODEL", "distilbert-base-uncased-finetuned-sst-2-english")
+    SENTIMENT_MODEL_CACHE: str = os.getenv("SENTIMENT_MODEL_CACHE", "") or None
+    SENTIMENT_MODEL_LOCAL_ONLY: bool = os.getenv("SENTIMENT_MODEL_LOCAL_ONLY", "False").lower() == "true"
+    SENTIMENT_TORCH_THREADS: int = int(os.getenv("SENTIMENT_TORCH_THREADS", os.cpu_count() or 1))
+    SENTIMENT_NEUTRAL_THRESHOLD: float = float(os.getenv("SENTIMENT_NEUTRAL_THRESHOLD", 0.75))
+    SENTIMENT_MAX_BATCH: int = int(os.getenv("SENTIMENT_MAX_BATCH", 32))
+    SENTIMENT_BATCH_WAIT_MS: float = float(os.getenv("SENTIMENT_BATCH_WAIT_MS", 5))
+
+    # Batch sentiment scoring / bulk diary import
+    SENTIMENT_BATCH_WORKERS: int = int(os.getenv("SENTIMENT_BATCH_WORKERS", os.cpu_count() or 2))
+    SENTIMENT_BATCH_PARALLEL_MIN: int = int(os.getenv("SENTIMENT_BATCH_PARALLEL_MIN", 200))
+    DIARY_BULK_MAX_ENTRIES: int = int(os.getenv("DIARY_BULK_MAX_ENTRIES", 5000))
+    DIARY_BULK_ENTRIES_PER_TOKEN: int = int(os.getenv("DIARY_BULK_ENTRIES_PER_TOKEN", 100))
+
+    # Mood analytics (longest custom range for GET /mood-board, in days)
+    MOOD_ANALYTICS_MAX_DAYS: int = int(os.getenv("MOOD_ANALYTICS_MAX_DAYS", 1830))
+
+    # Background AI reply jobs
+    DIARY_ASYNC_REPLIES: bool = os.getenv("DIARY_ASYNC_REPLIES", "False").lower() == "true"
+    DIARY_REPLY_WAIT_SECONDS: float = float(os.getenv("DIARY_REPLY_WAIT_SECONDS", 30))
+    AI_JOB_WORKERS: int = int(os.getenv("AI_JOB_WORKERS", 4))
+    AI_JOB_MAX_ATTEMPTS: int = int(os.getenv("AI_JOB_MAX_ATTEMPTS", 3))
+    AI_JOB_LEASE_SECONDS: int = int(os.getenv("AI_JOB_LEASE_SECONDS", 60))
+    AI_JOB_POLL_INTERVAL: float = float(os.getenv("AI_JOB_POLL_INTERVAL", 1))
+    AI_JOB_SWEEP_INTERVAL: float = float(os.getenv("AI_JOB_SWEEP_INTERVAL", 60))
+
+    # Speech-to-text (google | sphinx | fake)
+    VOICE_RECOGNIZER: str = os.getenv("VOICE_RECOGNIZER", "google").lower()
+    VOICE_WORKERS: int = int(os.getenv("VOICE_WORKERS", 8))
+    VOICE_MAX_UPLOAD_BYTES: int = int(os.getenv("VOICE_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+    VOICE_SILENCE_RMS: float = float(os.getenv("VOICE_SILENCE_RMS", 300))
+    VOICE_MIN_SILENCE_MS: int = int(os.getenv("VOICE_MIN_SILENCE_MS", 500))
+    VOICE_MAX_SEGMENT_SECONDS: float = float(os.getenv("VOICE_MAX_SEGMENT_SECONDS", 30))
+    VOICE_PARTIAL_INTERVAL_MS: int = int(os.getenv("VOICE_PARTIAL_INTERVAL_MS", 1000))
+    VOICE_LIVE_MAX_SECONDS: int = int(os.getenv("VOICE_LIVE_MAX_SECONDS", 300))
+
+    # Authenticated-user cache
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", 30))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+
+    # Chat conversation memory
+    CHAT_MEMORY_TURNS: int = int(os.getenv("CHAT_MEMORY_TURNS", 6))
+    CHAT_MEMORY_LOAD_LIMIT: int = int(os.getenv("CHAT_MEMORY_LOAD_LIMIT", 50))
+    CHAT_MEMORY_MAX_USERS: int = int(os.getenv("CHAT_MEMORY_MAX_USERS", 5000))
+    CHAT_MEMORY_TTL: int = int(os.getenv("CHAT_MEMORY_TTL", 1800))
+    CHAT_CONTEXT_TOKENS: int = int(os.getenv("CHAT_CONTEXT_TOKENS", 1200))
+    CHAT_SUMMARY_MAX_TOKENS: int = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", 300))
+    CHAT_SUMMARY_MODEL: bool = os.getenv("CHAT_SUMMARY_MODEL", "False").lower() == "true"
+
+    # AI completion cache
+    AI_CACHE_ENABLED: bool = os.getenv("AI_CACHE_ENABLED", "True").lower() == "true"
+    AI_CACHE_TTL: int = int(os.getenv("AI_CACHE_TTL", 3600))
+    AI_CACHE_MAX_ENTRIES: int = int(os.getenv("AI_CACHE_MAX_ENTRIES", 1024))
+    AI_CACHE_MAX_PROMPT_CHARS: int = int(os.getenv("AI_CACHE_MAX_PROMPT_CHARS", 200))
+    AI_CACHE_MONGO: bool = os.getenv("AI_CACHE_MONGO", "False").lower() == "true"
+
+    # Offline fake model (no network, emits canned chunks)
+    GEMINI_FAKE_MODEL: bool = os.getenv("GEMINI_FAKE_MODEL", "False").lower() == "true"
+    GEMINI_FAKE_CHUNK_DELAY_MS: int = int(os.getenv("GEMINI_FAKE_CHUNK_DELAY_MS", 50))
 
 settings = Settings()
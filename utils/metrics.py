@@ -0,0 +1,335 @@
+# backend/utils/metrics.py
+"""
+Prometheus-style metrics without a client library.
+
+Counters and histograms are kept in plain dicts keyed by label tuples and
+rendered in the text exposition format by GET /metrics. Recording is a
+bisect plus a few adds under an uncontended lock (well under a microsecond),
+so the request middleware stays far below the 50 µs budget
+(see benchmarks/bench_metrics_overhead.py).
+
+Point-in-time values (cache hit rates, pool depths) are not stored: stats
+callables are registered with `register_stats` and read at scrape time.
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Mount, compile_path
+
+PREFIX = "echosense_"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        return repr(value) if value == value and value not in (float("inf"), float("-inf")) else "NaN"
+    return str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Gauge(Counter):
+    def dec(self, labels: Tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, labels: Tuple = ()):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, labels)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in one stage of a handler", ("stage",))
+MONGO_COMMAND_SECONDS = Histogram("mongo_command_duration_seconds", "MongoDB command latency", ("command",))
+MONGO_COMMAND_FAILURES = Counter("mongo_command_failures_total", "Failed MongoDB commands", ("command",))
+ADMISSION_REJECTED = Counter("admission_rejected_total", "AI requests turned away by rate limits or load shedding", ("reason",))
+AI_QUEUE_WAIT_SECONDS = Histogram("ai_queue_wait_seconds", "Time model calls waited for a concurrency slot")
+AI_CALL_SECONDS = Histogram("ai_call_duration_seconds", "Model call latency by prompt endpoint", ("endpoint",))
+AI_CALLS = Counter("ai_calls_total", "Model calls by prompt endpoint and outcome (ok, truncated, error)", ("endpoint", "outcome"))
+AI_TOKENS = Counter("ai_tokens_total", "Prompt and output tokens by prompt endpoint", ("endpoint", "kind"))
+
+METRICS = [
+    REQUEST_SECONDS, REQUESTS_IN_FLIGHT, STAGE_SECONDS, MONGO_COMMAND_SECONDS, MONGO_COMMAND_FAILURES,
+    ADMISSION_REJECTED, AI_QUEUE_WAIT_SECONDS, AI_CALL_SECONDS, AI_CALLS, AI_TOKENS,
+]
+_stats: Dict[str, Callable[[], dict]] = {}
+
+def register_stats(name: str, collect: Callable[[], dict]):
+    """
+    Exposes the numeric values of `collect()` as gauges named echosense_<name>_<key>.
+    """
+    _stats[name] = collect
+
+def collect_stats() -> Dict[str, dict]:
+    return {name: collect() for name, collect in _stats.items()}
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, values in collect_stats().items():
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f"{PREFIX}{name}_{key}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+@contextmanager
+def stage(name: str):
+    """
+    Times a block of a handler: `with stage("sentiment"): ...`
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, (name,))
+
+# -----------------------------
+# ASGI middleware
+# -----------------------------
+# app -> {id(route): [(full template, regex)]}, built on first use
+_route_templates = weakref.WeakKeyDictionary()
+
+def _collect_templates(routes, prefix: str, templates: dict):
+    for route in routes:
+        included = getattr(route, "include_context", None)
+        if included is not None:
+            # Newer FastAPI keeps included routers nested instead of copying their routes
+            _collect_templates(route.original_router.routes, prefix + included.prefix, templates)
+        elif not isinstance(route, Mount) and getattr(route, "path_format", None):
+            template = prefix + route.path_format
+            templates.setdefault(id(route), []).append((template, compile_path(template)[0]))
+
+def _templates_for(app, route) -> list:
+    if app is None:
+        return []
+    templates = _route_templates.get(app)
+    if templates is None or id(route) not in templates:
+        templates = {}
+        _collect_templates(getattr(app, "routes", ()), "", templates)
+        _route_templates[app] = templates
+    return templates.get(id(route), [])
+
+def route_label(scope) -> str:
+    """
+    Full route template of the request ("/api/diary/{entry_id}"); templates
+    rather than paths keep the label set bounded.
+
+    The matched route only knows its own router's template, so its
+    include_router prefixes are looked up from the app's routing tree, and
+    mounts contribute the root_path they set. A router included under
+    several prefixes is told apart by which template matches the path.
+    """
+    route = scope.get("route")
+    if not getattr(route, "path_format", None):
+        return "unmatched"
+    root_path = scope.get("root_path", "")
+    candidates = _templates_for(scope.get("app"), route)
+    if not candidates:
+        return root_path + route.path_format
+    if len(candidates) > 1:
+        path = scope["path"][len(root_path):] if scope["path"].startswith(root_path) else scope["path"]
+        for template, regex in candidates:
+            if regex.match(path):
+                return root_path + template
+    return root_path + candidates[0][0]
+
+
+class MetricsMiddleware:
+    """
+    Records latency per (method, route template, status). Plain ASGI rather than
+    BaseHTTPMiddleware, which would add a task and a memory stream per request.
+    Streaming responses are timed until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_SECONDS.observe(time.perf_counter() - start, (scope["method"], route_label(scope), status))
+
+# -----------------------------
+# MongoDB driver listeners
+# -----------------------------
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, (event.command_name,))
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, (event.command_name,))
+        MONGO_COMMAND_FAILURES.inc((event.command_name,))
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool counters; pymongo has no public API for live pool state.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_seconds = 0.0
+        self.pool_clears = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        self.checkouts += 1
+        self.checkout_wait_seconds += getattr(event, "duration", 0.0) or 0.0
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def stats(self) -> dict:
+        return {
+            "connections_open": self.open,
+            "connections_checked_out": self.checked_out,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "checkout_wait_seconds": round(self.checkout_wait_seconds, 6),
+            "pool_clears": self.pool_clears,
+        }
+
+# -----------------------------
+# Thread pools
+# -----------------------------
+def thread_pool_stats() -> dict:
+    """
+    anyio's default limiter (used by sync endpoints/dependencies and run_in_threadpool).
+    Must be called from the event loop.
+    """
+    from anyio.to_thread import current_default_thread_limiter
+
+    limiter = current_default_thread_limiter()
+    return {
+        "busy": limiter.borrowed_tokens,
+        "capacity": limiter.total_tokens,
+        "queued": limiter.statistics().tasks_waiting,
+    }
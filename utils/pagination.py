@@ -0,0 +1,95 @@
+# backend/utils/pagination.py
+import base64
+import hashlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Request, Response
+from pymongo import DESCENDING
+
+from utils.serialization import fast_response
+
+# Newest first; `_id` breaks ties between entries with the same timestamp
+PAGE_SORT = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+
+def encode_cursor(doc: dict) -> str:
+    raw = f"{doc['timestamp'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, oid = raw.split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(oid)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def history_filter(
+    user_id,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    **equals,
+) -> dict:
+    """
+    Builds a filter that the (user_id, [equals...], timestamp, _id) index serves
+    as a single bounded range scan: date range, then "strictly after the cursor".
+    """
+    query = {"user_id": user_id}
+    query.update({field: value for field, value in equals.items() if value is not None})
+
+    timestamp = {}
+    if since is not None:
+        timestamp["$gte"] = since
+    if until is not None:
+        timestamp["$lt"] = until
+    if timestamp:
+        query["timestamp"] = timestamp
+
+    if cursor:
+        ts, oid = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"timestamp": {"$lt": ts}},
+            {"timestamp": ts, "_id": {"$lt": oid}},
+        ]}]}
+    return query
+
+async def fetch_page(collection, query: dict, projection: dict, limit: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    Keyset pagination: reads limit + 1 documents along the index to learn whether
+    there is a next page. Cost depends on the page size, not on how deep the page is.
+    """
+    docs = await collection.find(query, projection).sort(PAGE_SORT).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+def page_etag(items: List[dict], next_cursor: Optional[str]) -> str:
+    # Hash of the page exactly as stored, so a reply filled in later changes the tag
+    digest = hashlib.sha1(bson.encode({"items": items, "next": next_cursor})).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+async def history_page(request: Request, response: Response, collection, query: dict, projection: dict, limit: int, model=None):
+    """
+    Fetches one page and handles the ETag round-trip: 304 when the client's
+    If-None-Match still matches, otherwise the page with its ETag
+    (serialized directly as `model` when given).
+    """
+    items, next_cursor = await fetch_page(collection, query, projection, limit)
+    etag = page_etag(items, next_cursor)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    page = {"items": items, "next_cursor": next_cursor}
+    if model is None:
+        return page
+    return fast_response(model, page, headers)
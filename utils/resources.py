@@ -0,0 +1,143 @@
+# backend/utils/resources.py
+"""
+Startup resource registry.
+
+Heavy dependencies (the MongoDB connection, the sentiment engine, the AI HTTP
+client, the speech recognizer) are not touched at import time. Each one
+registers a warm-up coroutine here; the app lifespan starts them all in the
+background and serves requests right away, while /health/ready answers 503
+until every required resource is up. A required warm-up that fails is retried
+every STARTUP_RETRY_INTERVAL seconds, so readiness recovers on its own once
+e.g. MongoDB becomes reachable. Anything not yet warm still initializes
+lazily on first use, so an early request is slower, never broken.
+"""
+import asyncio
+import importlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING, WARMING, READY, FAILED = "pending", "warming", "ready", "failed"
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+class Resource:
+    __slots__ = ("name", "warm_up", "required", "state", "error", "attempts", "seconds")
+
+    def __init__(self, name: str, warm_up: Callable[[], Awaitable], required: bool):
+        self.name = name
+        self.warm_up = warm_up
+        self.required = required
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.seconds: Optional[float] = None
+
+
+class ResourceRegistry:
+    def __init__(self):
+        self._resources: Dict[str, Resource] = {}
+        self._tasks = set()
+        self._started: Optional[float] = None
+        self.import_seconds: Optional[float] = None
+        self.ready_seconds: Optional[float] = None
+
+    def register(self, name: str, warm_up: Callable[[], Awaitable], required: bool = True):
+        """
+        Optional resources are warmed and reported but don't hold back readiness.
+        """
+        self._resources[name] = Resource(name, warm_up, required)
+
+    async def start(self, background: bool = True, retry_interval: float = 5.0):
+        """
+        Starts every warm-up concurrently. With background=False, waits for the
+        first attempt of each before returning.
+        """
+        self._started = time.perf_counter()
+        first_attempts = []
+        for resource in self._resources.values():
+            attempted = asyncio.Event()
+            first_attempts.append(attempted)
+            task = asyncio.ensure_future(self._warm(resource, retry_interval, attempted))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if not background:
+            await asyncio.gather(*(attempted.wait() for attempted in first_attempts))
+
+    async def _warm(self, resource: Resource, retry_interval: float, attempted: asyncio.Event):
+        while True:
+            resource.state = WARMING
+            resource.attempts += 1
+            started = time.perf_counter()
+            try:
+                await resource.warm_up()
+            except Exception as e:
+                resource.state = FAILED
+                resource.error = str(e) or type(e).__name__
+                logger.warning(f"Warm-up of '{resource.name}' failed (attempt {resource.attempts}): {resource.error}")
+                attempted.set()
+                if not resource.required or retry_interval <= 0:
+                    return
+                await asyncio.sleep(retry_interval)
+                continue
+            resource.state = READY
+            resource.error = None
+            resource.seconds = round(time.perf_counter() - started, 4)
+            logger.info(f"'{resource.name}' ready in {resource.seconds * 1000:.0f} ms")
+            if self.ready_seconds is None and self.ready():
+                self.ready_seconds = round(time.perf_counter() - self._started, 4)
+            attempted.set()
+            return
+
+    async def stop(self):
+        """
+        Cancels warm-ups that are still running or waiting to retry.
+        """
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def ready(self) -> bool:
+        return all(r.state == READY for r in self._resources.values() if r.required)
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "state": r.state,
+                "required": r.required,
+                "attempts": r.attempts,
+                "seconds": r.seconds,
+                "error": r.error,
+            }
+            for name, r in self._resources.items()
+        }
+
+    def stats(self) -> dict:
+        stats = {
+            "ready": int(self.ready()),
+            "import_seconds": self.import_seconds,
+            "ready_seconds": self.ready_seconds,
+        }
+        for name, r in self._resources.items():
+            stats[f"{name}_seconds"] = r.seconds
+        return stats
+
+
+resources = ResourceRegistry()
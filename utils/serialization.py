@@ -0,0 +1,123 @@
+# backend/utils/serialization.py
+"""
+Fast JSON responses for hot endpoints.
+
+Returning a dict from an endpoint with `response_model` makes FastAPI
+validate it into the Pydantic model (running the PyObjectId BeforeValidators),
+dump it back to plain data, walk it through jsonable_encoder and only then
+encode it. Our handlers already build documents of a known shape, so
+`fast_response` skips all that:
+
+- a serializer compiled once per response model picks exactly the model's
+  fields (so nothing extra, like a password hash, ever leaks), fills defaults,
+  writes aliases (`_id`) and turns ObjectIds into strings;
+- orjson encodes the result, datetimes included, in one pass (stdlib json
+  when orjson isn't installed).
+
+The output is the same JSON the validated path produces
+(benchmarks/bench_serialization.py checks this). The documents are trusted,
+not validated: a missing required field is still an error, a wrong type is
+not. `response_model` stays on the routes for the OpenAPI schema, and
+FAST_SERIALIZATION=false falls back to the validated path.
+"""
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from inspect import isclass
+from typing import Annotated, Any, Callable, Dict, List, Optional, Union, get_args, get_origin
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, BeforeValidator
+
+from utils.config import settings
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# -----------------------------
+# Compiled serializers
+# -----------------------------
+def _converter(annotation, metadata=()) -> Optional[Callable]:
+    """
+    What a field's value needs before encoding, or None when it passes through as is.
+    """
+    if any(isinstance(m, BeforeValidator) and m.func is str for m in metadata):
+        return str
+    origin = get_origin(annotation)
+    if origin is Annotated:
+        inner, *extra = get_args(annotation)
+        return _converter(inner, extra)
+    if origin is Union:
+        # Optional[X]: None is never converted, so only X matters
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return _converter(args[0]) if len(args) == 1 else None
+    if origin in (list, List):
+        item = _converter(get_args(annotation)[0])
+        return None if item is None else (lambda values: [item(v) for v in values])
+    if isclass(annotation) and issubclass(annotation, BaseModel):
+        return serializer_for(annotation)
+    if annotation is float:
+        return float
+    return None
+
+@lru_cache(maxsize=None)
+def serializer_for(model) -> Callable[[dict], dict]:
+    """
+    doc -> the dict FastAPI would send for `model` (by alias, only declared fields).
+    """
+    fields = []
+    for name, field in model.model_fields.items():
+        fields.append((field.alias or name, name, _converter(field.annotation, field.metadata), field))
+
+    def serialize(doc: dict) -> dict:
+        out = {}
+        for key, name, convert, field in fields:
+            if key in doc:
+                value = doc[key]
+            elif name in doc:
+                value = doc[name]
+            elif field.default_factory is not None:
+                value = field.default_factory()
+            elif field.is_required():
+                raise ValueError(f"{model.__name__}.{name} is missing")
+            else:
+                value = field.default
+            if convert is not None and value is not None:
+                value = convert(value)
+            out[key] = value
+        return out
+
+    return serialize
+
+def fast_response(model, content: dict, headers: Optional[Dict[str, str]] = None):
+    """
+    `content` serialized as `model` without re-validation. With FAST_SERIALIZATION
+    off, returns `content` for FastAPI's response_model path instead.
+    """
+    if not settings.FAST_SERIALIZATION:
+        return content
+    return FastJSONResponse(serializer_for(model)(content), headers=headers)
@@ -0,0 +1,184 @@
+# backend/utils/singleflight.py
+"""
+Request coalescing ("single flight").
+
+Concurrent callers asking for the same key share one computation: the first
+caller starts it and everyone else awaits the same result. A finished result is
+also served for a short window afterwards, so rapid repeats (reopened tabs,
+client retries, double clicks) don't start the work again. `discard` drops both
+the in-flight computation and the remembered result, e.g. after the user
+writes data the result was computed from.
+
+Streams get the same treatment: one producer, every subscriber gets every
+chunk from the start (late joiners replay what was already produced).
+"""
+import asyncio
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class _Broadcast:
+    """
+    Chunks of one producer, readable by any number of subscribers.
+    """
+
+    def __init__(self):
+        self.chunks: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def push(self, chunk):
+        self.chunks.append(chunk)
+        self._wake()
+
+    def close(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator:
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    def __init__(self, window: float = 0.0, max_entries: int = 10000, enabled: bool = True):
+        self.window = window
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._inflight: Dict[Hashable, object] = {}
+        # key -> (expires_at, result), insertion ordered
+        self._recent: Dict[Hashable, tuple] = {}
+        # Strong references so running producers aren't garbage collected
+        self._tasks = set()
+        self.leaders = 0
+        self.coalesced = 0
+        self.window_hits = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """
+        Returns fn()'s result, sharing it with concurrent callers of the same key.
+        A caller being cancelled doesn't cancel the shared computation.
+        """
+        if not self.enabled:
+            return await fn()
+
+        found = self._remembered(key)
+        if found is not None:
+            return found[0]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._start(key, task)
+            task.add_done_callback(lambda t: self._task_done(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, make_stream: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """
+        Yields the chunks of make_stream(), shared with concurrent callers of the same key.
+        """
+        if not self.enabled:
+            async for chunk in make_stream():
+                yield chunk
+            return
+
+        found = self._remembered(key)
+        if found is not None:
+            broadcast = found[0]
+        else:
+            broadcast = self._inflight.get(key)
+            if broadcast is None:
+                self.leaders += 1
+                broadcast = _Broadcast()
+                task = asyncio.ensure_future(self._pump(key, broadcast, make_stream()))
+                self._start(key, broadcast)
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            else:
+                self.coalesced += 1
+
+        async for chunk in broadcast.subscribe():
+            yield chunk
+
+    async def _pump(self, key, broadcast: _Broadcast, source: AsyncIterator):
+        # Runs as its own task, so the first subscriber disconnecting doesn't end it for the rest
+        try:
+            async for chunk in source:
+                broadcast.push(chunk)
+        except Exception as e:
+            broadcast.close(e)
+            self._finish(key, broadcast, None)
+            return
+        broadcast.close()
+        self._finish(key, broadcast, (broadcast,))
+
+    def _task_done(self, key, task: asyncio.Future):
+        # Reading exception() also marks it retrieved when nobody awaited the task
+        failed = task.cancelled() or task.exception() is not None
+        self._finish(key, task, None if failed else (task.result(),))
+
+    def _start(self, key, flight):
+        self._inflight[key] = flight
+        if isinstance(flight, asyncio.Future):
+            self._tasks.add(flight)
+            flight.add_done_callback(self._tasks.discard)
+
+    def _finish(self, key, flight, result: Optional[tuple]):
+        # A discard() while running means the result may be stale: don't remember it
+        if self._inflight.get(key) is not flight:
+            return
+        del self._inflight[key]
+        if result is not None and self.window > 0:
+            self._recent[key] = (time.monotonic() + self.window, result[0])
+            if len(self._recent) > self.max_entries:
+                self._prune()
+
+    def _remembered(self, key) -> Optional[tuple]:
+        item = self._recent.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self._recent[key]
+            return None
+        self.window_hits += 1
+        return (item[1],)
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._recent.items() if expires_at < now]:
+            del self._recent[key]
+        while len(self._recent) > self.max_entries:
+            del self._recent[next(iter(self._recent))]
+
+    def discard(self, match: Callable[[Hashable], bool]):
+        """
+        Forgets in-flight and remembered results whose key matches; the next caller recomputes.
+        """
+        for store in (self._inflight, self._recent):
+            for key in [k for k in store if match(k)]:
+                del store[key]
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "window_hits": self.window_hits,
+            "in_flight": len(self._inflight),
+        }
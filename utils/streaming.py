@@ -0,0 +1,29 @@
+# backend/utils/streaming.py
+import json
+from typing import Any, Awaitable, Optional
+
+import anyio
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop reverse proxies (nginx/render) from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """
+    Formats a single Server-Sent Event frame with a JSON payload.
+    """
+    frame = ""
+    if event:
+        frame += f"event: {event}\n"
+    frame += f"data: {json.dumps(data, default=str)}\n\n"
+    return frame
+
+async def shielded(awaitable: Awaitable):
+    """
+    Awaits even while the response is being cancelled (the client went away),
+    so a stream can still store what it already produced.
+    """
+    with anyio.CancelScope(shield=True):
+        return await awaitable
@@ -0,0 +1,207 @@
+# backend/utils/tokens.py
+"""
+JWT issuing and verification.
+
+Keys come from JWT_KEYS="kid1:secret1,kid2:secret2". The first key signs new
+tokens and every listed key verifies (picked by the token's `kid` header), so
+a rotation is: put the new key first, keep the old one until the tokens it
+signed have expired, then drop it -- nobody is logged out. Without JWT_KEYS,
+SECRET_KEY is the only key. Tokens from before kids existed carry no `kid`
+and are checked against each key in turn.
+
+Verified tokens are remembered in a bounded LRU until their own `exp`, so a
+client repeating the same bearer token skips signature checking and claim
+parsing. The cache is keyed by the whole token string, never by a part of it,
+and entries stop being served the moment the token expires or the key that
+verified it is retired.
+
+Refresh tokens also carry a `jti`; whether one is still spendable is tracked
+server-side (services/refresh_sessions.py), not here.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+from utils.config import settings
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+class _PyJWTBackend:
+    name = "pyjwt"
+
+    def __init__(self):
+        import jwt
+
+        self._jwt = jwt
+        self.error = jwt.PyJWTError
+
+    def encode(self, claims: dict, key: str, algorithm: str, kid: str) -> str:
+        return self._jwt.encode(claims, key, algorithm=algorithm, headers={"kid": kid})
+
+    def header(self, token: str) -> dict:
+        return self._jwt.get_unverified_header(token)
+
+    def decode(self, token: str, key: str, algorithm: str) -> dict:
+        return self._jwt.decode(token, key, algorithms=[algorithm])
+
+
+class _JoseBackend:
+    name = "jose"
+
+    def __init__(self):
+        from jose import JWTError, jwt
+
+        self._jwt = jwt
+        self.error = JWTError
+
+    def encode(self, claims: dict, key: str, algorithm: str, kid: str) -> str:
+        return self._jwt.encode(claims, key, algorithm=algorithm, headers={"kid": kid})
+
+    def header(self, token: str) -> dict:
+        return self._jwt.get_unverified_header(token)
+
+    def decode(self, token: str, key: str, algorithm: str) -> dict:
+        return self._jwt.decode(token, key, algorithms=[algorithm])
+
+
+def load_backend(name: str = settings.JWT_BACKEND):
+    """
+    "jose" (python-jose) or "pyjwt". Both produce interchangeable HS256 tokens;
+    benchmarks/bench_token_verification.py shows which decodes faster on the
+    installed versions.
+    """
+    if name == "pyjwt":
+        return _PyJWTBackend()
+    if name != "jose":
+        raise ValueError(f"Unknown JWT_BACKEND: {name}")
+    return _JoseBackend()
+
+def parse_keys(raw: str, fallback: str) -> Dict[str, str]:
+    """
+    "kid1:secret1,kid2:secret2" -> ordered {kid: secret}; the first entry signs.
+    """
+    keys = {}
+    for item in raw.split(","):
+        kid, sep, secret = item.strip().partition(":")
+        if not sep or not kid or not secret:
+            if item.strip():
+                raise ValueError("JWT_KEYS entries must look like kid:secret")
+            continue
+        keys[kid] = secret
+    return keys or {"default": fallback}
+
+
+# -----------------------------
+# Token service
+# -----------------------------
+class TokenService:
+    def __init__(self, keys: Dict[str, str], algorithm: str, backend, max_entries: int):
+        self.keys = keys
+        self.signing_kid = next(iter(keys))
+        self.algorithm = algorithm
+        self.backend = backend
+        self.max_entries = max_entries
+        # token -> (claims, exp as unix time, kid of the key that verified it)
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.evictions = 0
+
+    def issue(self, claims: dict, expires_delta: timedelta, token_type: str = "access") -> str:
+        to_encode = dict(claims)
+        to_encode["exp"] = int(time.time() + expires_delta.total_seconds())
+        to_encode["typ"] = token_type
+        if token_type != "access":
+            to_encode.setdefault("jti", uuid.uuid4().hex)
+        return self.backend.encode(to_encode, self.keys[self.signing_kid], self.algorithm, self.signing_kid)
+
+    def verify(self, token: str, token_type: str = "access") -> Optional[dict]:
+        """
+        Verified claims, or None for a bad, expired or wrong-type token.
+        The returned dict is shared with the cache and must not be mutated.
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._verified.get(token)
+            if cached is not None:
+                # A retired key takes its tokens with it, cached or not
+                if cached[1] > now and cached[2] in self.keys:
+                    self._verified.move_to_end(token)
+                    self.hits += 1
+                    return self._typed(cached[0], token_type)
+                del self._verified[token]
+            self.misses += 1
+
+        decoded = self._decode(token)
+        if decoded is None:
+            self.failures += 1
+            return None
+
+        claims, kid = decoded
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            with self._lock:
+                self._verified[token] = (claims, exp, kid)
+                while len(self._verified) > self.max_entries:
+                    self._verified.popitem(last=False)
+                    self.evictions += 1
+        return self._typed(claims, token_type)
+
+    @staticmethod
+    def _typed(claims: dict, token_type: str) -> Optional[dict]:
+        # Tokens issued before `typ` existed are access tokens
+        return claims if claims.get("typ", "access") == token_type else None
+
+    def _decode(self, token: str) -> Optional[Tuple[dict, str]]:
+        """
+        (claims, kid of the verifying key), or None.
+        """
+        try:
+            kid = self.backend.header(token).get("kid")
+        except self.backend.error:
+            return None
+        if kid is not None:
+            if kid not in self.keys:
+                return None
+            candidates = [kid]
+        else:
+            candidates = list(self.keys)
+
+        for candidate in candidates:
+            try:
+                return self.backend.decode(token, self.keys[candidate], self.algorithm), candidate
+            except self.backend.error:
+                continue
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._verified.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "failures": self.failures,
+            "evictions": self.evictions,
+            "size": len(self._verified),
+            "keys": len(self.keys),
+            "backend": self.backend.name,
+        }
+
+
+token_service = TokenService(
+    parse_keys(settings.JWT_KEYS, settings.SECRET_KEY),
+    settings.ALGORITHM,
+    load_backend(),
+    settings.TOKEN_CACHE_MAX_ENTRIES,
+)